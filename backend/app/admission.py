@@ -0,0 +1,230 @@
+"""
+Admission control and load shedding per route class
+
+Every route belongs to a class: cheap "point" reads and writes of one song,
+"scan" routes that read many rows (lists, search, stats), and "bulk" routes
+that stream or rewrite large parts of the library. Each class admits a
+limited number of concurrent requests and queues a limited number more;
+a request arriving to a full queue, or still queued at its deadline, is
+answered at once with 503 and `Retry-After`. Scans can therefore occupy
+only part of the worker threads and connections, and point reads keep
+their latency while scans queue or are shed.
+
+An admitted request carries its class's deadline. SQLite checks it from a
+progress handler while a statement runs and interrupts statements still
+running past it, and the request is answered with 503 as well.
+"""
+from collections import deque
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from typing import Deque, Dict, Optional, Sequence, Tuple
+import asyncio
+import threading
+import time
+
+from .config import settings
+from .metrics import Counter, registry
+
+# SQLite virtual machine instructions between deadline checks
+PROGRESS_OPCODES = 10000
+
+# Route class per (method, route template); routes not listed are "point".
+# Routes mapped to None are never limited, so probes keep answering under load.
+ROUTE_CLASSES: Dict[Tuple[str, str], Optional[str]] = {
+    ("GET", "/api/songs"): "scan",
+    ("POST", "/api/songs/batch-get"): "scan",
+    ("GET", "/api/search"): "scan",
+    ("GET", "/api/stats"): "scan",
+    ("GET", "/api/changes"): "scan",
+    ("GET", "/api/artists"): "scan",
+    ("GET", "/api/albums"): "scan",
+    ("GET", "/api/genres"): "scan",
+    ("GET", "/api/artists/{artist}/songs"): "scan",
+    ("GET", "/api/genres/{genre}/songs"): "scan",
+    ("GET", "/api/songs/export"): "bulk",
+    ("POST", "/api/songs/bulk"): "bulk",
+    ("PATCH", "/api/songs/batch"): "bulk",
+    ("POST", "/api/songs/batch-delete"): "bulk",
+    ("POST", "/api/admin/suggest/rebuild"): "bulk",
+    ("POST", "/api/admin/changes/compact"): "bulk",
+    ("GET", "/health"): None,
+    ("GET", "/metrics"): None,
+}
+
+http_requests_shed = registry.register(Counter(
+    "http_requests_shed_total", "Requests answered with 503 by admission control, by route class and reason.",
+    ("route_class", "reason")))
+
+# Monotonic time by which the current request's statements must finish;
+# worker threads inherit it through the copied context.
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class AdmissionLimit:
+    """Concurrency limit with a bounded FIFO wait queue
+
+    Waiters are futures of whichever event loop they were created on, and a
+    released slot is handed to the next waiter on its own loop, so one limit
+    can be shared by every loop and thread serving requests.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, deadline: Optional[float] = None):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.deadline = deadline  # seconds, from arrival; None for no deadline
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a slot, queueing for up to `timeout` seconds; False if the queue is full or the wait times out"""
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                return True
+            if len(self._waiters) >= self.queue:
+                return False
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            with self._lock:
+                queued = waiter in self._waiters
+                if queued:
+                    self._waiters.remove(waiter)
+            # Granted just as we gave up: the slot is ours to give back
+            if not queued and waiter.done() and not waiter.cancelled():
+                self.release()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            return False
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            # The slot passes straight to the next waiter
+            waiter = self._waiters.popleft()
+        waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+
+    def _grant(self, waiter: asyncio.Future) -> None:
+        if waiter.done():  # it timed out or was cancelled meanwhile
+            self.release()
+        else:
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "queued": len(self._waiters),
+                "concurrency": self.concurrency,
+                "queue": self.queue,
+                "deadline_ms": self.deadline * 1000 if self.deadline else None,
+            }
+
+
+def build_limits(limits: Dict[str, Tuple[int, int, float]]) -> Dict[str, AdmissionLimit]:
+    """AdmissionLimits from (concurrency, queue, deadline in ms or 0) per route class"""
+    return {
+        name: AdmissionLimit(name, concurrency, queue, deadline_ms / 1000 if deadline_ms else None)
+        for name, (concurrency, queue, deadline_ms) in limits.items()
+    }
+
+
+admission_limits = build_limits(settings.admission_limits)
+
+
+def route_class(routes: Sequence, scope) -> Tuple[Optional[str], object]:
+    """(class, route) of the route `scope` would be dispatched to; class None for unlimited or unmatched requests"""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            method = "GET" if scope["method"] == "HEAD" else scope["method"]
+            return ROUTE_CLASSES.get((method, route.path), "point"), route
+    return None, None
+
+
+def deadline_exceeded() -> bool:
+    deadline = current_deadline.get()
+    return deadline is not None and time.monotonic() > deadline
+
+
+def enforce_deadlines(engine: Engine, opcodes: int = PROGRESS_OPCODES) -> None:
+    """Interrupt SQLite statements still running past the current request's deadline"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    # On checkout rather than connect, to cover connections pooled before this call
+    @event.listens_for(engine, "checkout")
+    def set_progress_handler(dbapi_connection, connection_record, connection_proxy):
+        if not connection_record.info.get("deadlines"):
+            # A non-zero return aborts the statement with "interrupted"
+            dbapi_connection.set_progress_handler(deadline_exceeded, opcodes)
+            connection_record.info["deadlines"] = True
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests per route class and enforcing their deadlines"""
+
+    def __init__(self, app, routes: Sequence, limits: Optional[Dict[str, AdmissionLimit]] = None,
+                 retry_after: int = settings.admission_retry_after):
+        self.app = app
+        self.routes = routes
+        self.limits = admission_limits if limits is None else limits
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.admission_control:
+            return await self.app(scope, receive, send)
+        name, route = route_class(self.routes, scope)
+        limit = self.limits.get(name)
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        arrived = time.monotonic()
+        deadline = arrived + limit.deadline if limit.deadline else None
+        if not await limit.acquire(limit.deadline):
+            scope["route"] = route  # labels the 503 in the request metrics
+            reason = "queue_full" if deadline is None or time.monotonic() < deadline else "queue_timeout"
+            return await self.shed(scope, receive, send, name, reason)
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        token = current_deadline.set(deadline)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # An interrupted statement surfaces as whatever error the handler let through
+            if response_started or deadline is None or time.monotonic() < deadline:
+                raise
+            await self.shed(scope, receive, send, name, "deadline")
+        finally:
+            current_deadline.reset(token)
+            limit.release()
+
+    async def shed(self, scope, receive, send, name: str, reason: str) -> None:
+        http_requests_shed.inc(name, reason)
+        detail = "Request deadline exceeded" if reason == "deadline" else "Server busy"
+        response = JSONResponse(
+            {"detail": f"{detail}; retry later", "route_class": name},
+            status_code=503, headers={"Retry-After": str(self.retry_after)},
+        )
+        await response(scope, receive, send)
+
+
+def admission_stats() -> Dict[str, dict]:
+    return {name: limit.stats() for name, limit in admission_limits.items()}
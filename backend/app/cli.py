@@ -0,0 +1,103 @@
+"""
+Maintenance commands for the Music Library database
+
+Usage (from the backend directory):
+    python -m app.cli reindex-search
+    python -m app.cli rebuild-stats
+    python -m app.cli compact-changes [--days N]
+    python -m app.cli scan [ROOT ...] [--full] [--workers N]
+"""
+import argparse
+
+from .config import settings
+from .database import SessionLocal, engine
+from .models import Base
+from .services.change_service import ChangeService
+from .services.scan_service import ScanService
+from .services.search_service import SearchService
+from .services.stats_service import StatsService
+
+
+def reindex_search(args) -> None:
+    """Rebuild the full-text search index from the songs table"""
+    db = SessionLocal()
+    try:
+        count = SearchService(db).reindex()
+    finally:
+        db.close()
+    print(f"Reindexed {count} songs")
+
+
+def rebuild_stats(args) -> None:
+    """Recompute the artist, album, and genre entities and the library statistics from the songs table"""
+    db = SessionLocal()
+    try:
+        stats = StatsService(db).rebuild()
+    finally:
+        db.close()
+    print(f"Rebuilt stats for {stats.total_songs} songs")
+
+
+def compact_changes(args) -> None:
+    """Prune old delete tombstones from the change log"""
+    db = SessionLocal()
+    try:
+        pruned = ChangeService(db).compact(args.days)
+    finally:
+        db.close()
+    print(f"Pruned {pruned} tombstones")
+
+
+def scan(args) -> None:
+    """Add, update, and remove songs from the audio files under music directories"""
+    roots = args.roots or settings.scan_roots
+    if not roots:
+        raise SystemExit("No directories given and SCAN_ROOTS is not set")
+    db = SessionLocal()
+    try:
+        report = ScanService(db).scan(roots, full=args.full, workers=args.workers)
+    finally:
+        db.close()
+    print(
+        f"Scanned {report.files} files: {report.added} added, {report.updated} updated, "
+        f"{report.removed} removed, {report.unchanged} unchanged, {report.failed} failed"
+    )
+    for error in report.errors:
+        print(f"  {error.path}: {error.error}")
+
+
+COMMANDS = {
+    "reindex-search": reindex_search,
+    "rebuild-stats": rebuild_stats,
+    "compact-changes": compact_changes,
+    "scan": scan,
+}
+
+# Extra arguments per command, as add_argument() parameters
+ARGUMENTS = {
+    "compact-changes": [
+        ("--days", {"type": float, "default": None, "help": "Tombstone retention (default: CHANGES_TOMBSTONE_RETENTION_DAYS)"}),
+    ],
+    "scan": [
+        ("roots", {"nargs": "*", "metavar": "ROOT", "help": "Music directories (default: SCAN_ROOTS)"}),
+        ("--full", {"action": "store_true", "help": "Reread the tags of unchanged files too"}),
+        ("--workers", {"type": int, "default": None, "help": "Tag-reading processes (default: SCAN_WORKERS or one per CPU)"}),
+    ],
+}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, command in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=command.__doc__)
+        for flag, options in ARGUMENTS.get(name, []):
+            subparser.add_argument(flag, **options)
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    COMMANDS[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Application settings, read from environment variables or a `.env` file
+
+Field names map to upper-case environment variables, e.g. `DATABASE_URL`,
+`DB_PROFILE=production`, `DB_POOL_SIZE=10` or `SQLITE_MMAP_SIZE=0`.
+"""
+from functools import lru_cache
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Dict, List, Literal, Optional, Tuple, Union
+
+# SQLite connection pragmas per profile. "production" enables WAL so readers
+# never block behind the single writer, relaxes fsync to once per checkpoint
+# (safe with WAL), and gives each connection a larger page cache and mmap.
+DB_PROFILES: Dict[str, Dict[str, Union[int, str]]] = {
+    "default": {
+        "busy_timeout": 5000,
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,       # KiB, i.e. 64 MB per connection
+        "mmap_size": 268435456,     # 256 MB
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Database
+    database_url: str = "sqlite:///./database.db"
+    db_profile: Literal["default", "production"] = "default"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_echo: bool = False
+
+    # Individual pragmas; when set they override the profile's value
+    sqlite_journal_mode: Optional[str] = None
+    sqlite_synchronous: Optional[str] = None
+    sqlite_cache_size: Optional[int] = None
+    sqlite_mmap_size: Optional[int] = None
+    sqlite_busy_timeout: Optional[int] = None
+    sqlite_temp_store: Optional[str] = None
+
+    # Worker threads for blocking route handlers; defaults to the pool capacity
+    threadpool_size: Optional[int] = None
+
+    # Group commit: single-song creates and updates arriving within the window
+    # (milliseconds) share one transaction, up to group_commit_max_batch writes
+    group_commit: bool = False
+    group_commit_window_ms: float = 2
+    group_commit_max_batch: int = 64
+
+    # Admission control per route class (see app.admission): concurrent
+    # requests, queued requests, and a deadline in milliseconds from arrival
+    # (0 for none) past which queued requests are shed and running statements
+    # interrupted. Shed requests get 503 with Retry-After in seconds.
+    admission_control: bool = True
+    admission_point_concurrency: int = 64
+    admission_point_queue: int = 256
+    admission_point_deadline_ms: float = 2000
+    admission_scan_concurrency: int = 4
+    admission_scan_queue: int = 16
+    admission_scan_deadline_ms: float = 10000
+    admission_bulk_concurrency: int = 2
+    admission_bulk_queue: int = 4
+    admission_bulk_deadline_ms: float = 0
+    admission_retry_after: int = 1
+
+    # Read cache
+    cache_max_entries: int = 1024
+    cache_max_items: int = 100000
+    cache_ttl: float = 300
+
+    # Profiling: header or sampled requests, and slow-query plan capture
+    profile_header: str = "X-Profile"
+    profile_sample_rate: float = 0.0
+    profile_slow_request_ms: float = 500
+    profile_buffer_size: int = 50
+    slow_query_ms: float = 100
+
+    # Background jobs: threads for I/O-bound kinds, processes for CPU-bound ones
+    # (0 runs those in threads too); uploads for background imports are staged
+    # in job_upload_dir, the system temporary directory by default
+    job_thread_workers: int = 2
+    job_process_workers: int = 1
+    job_upload_dir: Optional[str] = None
+
+    # Library scanner: directories scanned by the scan-library job (a JSON list
+    # in SCAN_ROOTS) and tag-reading processes, by default one per CPU
+    scan_roots: List[str] = []
+    scan_workers: Optional[int] = None
+
+    # Artwork store: originals and thumbnails of artwork_url images, fetched
+    # once and evicted least recently served first beyond artwork_cache_bytes
+    artwork_dir: str = "./artwork"
+    artwork_cache_bytes: int = 512 * 1024 * 1024
+    artwork_max_bytes: int = 10 * 1024 * 1024  # largest image fetched
+    artwork_fetch_timeout: float = 10
+    artwork_allow_private_hosts: bool = False
+    artwork_workers: int = 2
+
+    # Change log: delete tombstones older than this are pruned by compaction
+    changes_tombstone_retention_days: float = 30
+
+    # Cache-Control per conditional route
+    cache_control_songs: str = "private, no-cache"
+    cache_control_song: str = "private, no-cache"
+    cache_control_stats: str = "private, no-cache"
+    cache_control_search: str = "private, no-cache"
+    cache_control_library: str = "private, no-cache"
+    cache_control_artwork: str = "public, no-cache"
+    # Artwork requested as ?v=<ETag value> names one image's content, so it never goes stale
+    cache_control_artwork_versioned: str = "public, max-age=31536000, immutable"
+
+    @property
+    def sqlite_pragmas(self) -> Dict[str, Union[int, str]]:
+        """Profile pragmas merged with any individually configured ones"""
+        pragmas = dict(DB_PROFILES[self.db_profile])
+        for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout", "temp_store"):
+            value = getattr(self, f"sqlite_{name}")
+            if value is not None:
+                pragmas[name] = value
+        return pragmas
+
+    @property
+    def admission_limits(self) -> Dict[str, Tuple[int, int, float]]:
+        """(concurrency, queue, deadline_ms) per route class"""
+        return {
+            name: (
+                getattr(self, f"admission_{name}_concurrency"),
+                getattr(self, f"admission_{name}_queue"),
+                getattr(self, f"admission_{name}_deadline_ms"),
+            )
+            for name in ("point", "scan", "bulk")
+        }
+
+    @property
+    def db_pool_capacity(self) -> int:
+        return self.db_pool_size + self.db_max_overflow
+
+    @property
+    def worker_threads(self) -> int:
+        return self.threadpool_size or self.db_pool_capacity
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+settings = get_settings()
@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from typing import Dict, Union
+
+from .config import Settings, settings
+from .metrics import TimedQueuePool
+
+DATABASE_URL = settings.database_url
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Union[int, str]]) -> None:
+    """Run `PRAGMA name = value` on every new DBAPI connection of `engine`"""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(config: Settings = settings) -> Engine:
+    """Create an engine with the pool sizing and SQLite pragmas from `config`"""
+    url = config.database_url
+    options = {"echo": config.db_echo}
+    is_sqlite = url.startswith("sqlite")
+    if is_sqlite:
+        options["connect_args"] = {"check_same_thread": False}
+    if not (is_sqlite and (url in ("sqlite://", "sqlite:///") or ":memory:" in url)):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+            pool_timeout=config.db_pool_timeout,
+            pool_recycle=config.db_pool_recycle,
+            pool_pre_ping=not is_sqlite,
+        )
+    engine = create_engine(url, **options)
+    if is_sqlite:
+        apply_sqlite_pragmas(engine, config.sqlite_pragmas)
+    return engine
+
+
+# The one engine shared by the app, the services, and the CLI
+engine = create_db_engine()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_db():
+    """Dependency to get database session"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
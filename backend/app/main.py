@@ -1,11 +1,16 @@
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine
-import os
+from fastapi.responses import PlainTextResponse
 
+from .admission import AdmissionMiddleware, enforce_deadlines
+from .config import settings
+from .database import SessionLocal, engine
+from .metrics import CallbackGauge, MetricsMiddleware, instrument_engine, registry, watch_pool
+from .profiling import ProfilingMiddleware, instrument_engine as instrument_engine_profiling
 from .models import Base
-from .routes import songs_router
-from .services.song_service import DATABASE_URL
+from .routes import songs_router, library_router, jobs_router, admin_router
+from .services import JobService, job_runner, song_writer, suggest_index
 
 # Create FastAPI app
 app = FastAPI(
@@ -16,6 +21,10 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Per-route-class concurrency limits, inside CORS and metrics so that shed
+# requests are counted and carry CORS headers
+app.add_middleware(AdmissionMiddleware, routes=app.router.routes)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,15 +32,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "ETag", "Retry-After"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Include routers
 app.include_router(songs_router)
+app.include_router(library_router)
+app.include_router(jobs_router)
+app.include_router(admin_router)
 
 # Create database tables
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 Base.metadata.create_all(bind=engine)
 
+# Per-request SQL accounting and pool metrics for /metrics
+instrument_engine(engine)
+watch_pool(engine)
+
+# Statement capture for profiled requests and EXPLAIN of slow queries
+instrument_engine_profiling(engine)
+
+# Interrupt statements of requests past their admission deadline
+enforce_deadlines(engine)
+
+# Typeahead index size, to size workers: every worker holds its own copy
+registry.register(CallbackGauge(
+    "suggest_index_terms", "Distinct titles, artists, and albums in the typeahead index.",
+    lambda: suggest_index.stats()["terms"]))
+registry.register(CallbackGauge(
+    "suggest_index_bytes", "Approximate memory used by the typeahead index.",
+    lambda: suggest_index.stats()["approximate_bytes"]))
+registry.register(CallbackGauge(
+    "background_jobs_active", "Background jobs queued or running in this process's pools.",
+    job_runner.active))
+
+# Route handlers that touch the database are plain `def` functions, so FastAPI
+# runs them in a worker thread pool instead of on the event loop. By default
+# the pool matches the connection pool capacity, so a worker thread never
+# waits on a connection checkout.
+@app.on_event("startup")
+async def configure_threadpool():
+    """Size the worker thread pool that runs blocking route handlers"""
+    to_thread.current_default_thread_limiter().total_tokens = settings.worker_threads
+
+@app.on_event("startup")
+def build_suggest_index():
+    """Load the typeahead index from the songs table"""
+    db = SessionLocal()
+    try:
+        suggest_index.rebuild(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def recover_jobs():
+    """Fail jobs left unfinished by a process that is no longer running"""
+    db = SessionLocal()
+    try:
+        JobService(db).fail_interrupted()
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_job_runner():
+    """Stop the job pools; jobs not started yet stay queued and are failed on the next start"""
+    job_runner.shutdown()
+
+@app.on_event("shutdown")
+def stop_song_writer():
+    """Commit queued group-commit writes and stop the writer thread"""
+    song_writer.shutdown()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -46,6 +118,11 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,3 +1,20 @@
 from .song import Song, SongBase, SongCreate, SongUpdate, SongResponse, Base
+from .library import Artist, Album, Genre, ArtistResponse, AlbumResponse, GenreResponse
+from .search import SearchResult
+from .facets import FacetCount, Facets, SongPage, SearchPage
+from .stats import LibraryStats, LibraryStatsResponse
+from .version import LibraryVersion
+from .changes import SongChange, ChangeLogState, ChangesResponse
+from .jobs import Job, JobCreate, JobResponse
+from .scan import ScannedFile, ScanReport
+from .artwork import Artwork
+from . import migrations  # registers the schema upgrade hook
 
-__all__ = ["Song", "SongBase", "SongCreate", "SongUpdate", "SongResponse", "Base"]
+__all__ = [
+    "Song", "SongBase", "SongCreate", "SongUpdate", "SongResponse", "SearchResult",
+    "FacetCount", "Facets", "SongPage", "SearchPage",
+    "Artist", "Album", "Genre", "ArtistResponse", "AlbumResponse", "GenreResponse",
+    "LibraryStats", "LibraryStatsResponse", "LibraryVersion",
+    "SongChange", "ChangeLogState", "ChangesResponse", "Job", "JobCreate", "JobResponse",
+    "ScannedFile", "ScanReport", "Artwork", "Base",
+]
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy.sql import func
+
+from .song import Base
+
+# Which stored image each artwork URL resolved to. Images live on disk in
+# the artwork store, addressed by the SHA-256 of the original bytes, so
+# songs sharing a cover share its files. A row outlives its files when the
+# store evicts them; the next request fetches the image again.
+
+class Artwork(Base):
+    __tablename__ = "artwork"
+
+    url = Column(String, primary_key=True)
+    digest = Column(String)  # None while the last fetch failed
+    error = Column(Text)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal
+
+from .song import SongUpdate
+
+# Largest number of ids one batch request may name
+MAX_BATCH_IDS = 5000
+
+# Pydantic models for API
+class BatchIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_IDS)
+
+class BatchUpdate(BatchIds):
+    changes: SongUpdate  # applied to every song in `ids`
+
+class BatchOutcome(BaseModel):
+    id: int
+    status: Literal["updated", "deleted", "not_found"]
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    not_found: int
+    results: List[BatchOutcome]  # one per distinct id, in request order
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List
+
+# Pydantic models for API
+class BulkImportError(BaseModel):
+    row: int  # 1-based data row (NDJSON line, or CSV record after the header)
+    error: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError] = []
+    errors_truncated: bool = False
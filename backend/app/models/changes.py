@@ -0,0 +1,69 @@
+from sqlalchemy import Boolean, Column, DateTime, Integer, event, text
+from sqlalchemy.sql import func
+from pydantic import BaseModel
+from typing import List, Optional
+
+from .song import Base, SongResponse
+from .version import TRACKED_COLUMNS
+
+# Change log for incremental sync. Triggers record every insert, update, and
+# delete of a song with a sequence number from an AUTOINCREMENT key, which
+# never goes backwards or reuses a value. Only a song's latest change is
+# kept, so a client catching up reads each changed song once.
+
+class SongChange(Base):
+    __tablename__ = "song_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    song_id = Column(Integer, nullable=False, unique=True)
+    deleted = Column(Boolean, nullable=False, server_default="0")  # tombstone
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class ChangeLogState(Base):
+    """Single-row table (id = 1): tombstones up to `compacted_through` have been pruned"""
+    __tablename__ = "change_log_state"
+
+    id = Column(Integer, primary_key=True)
+    compacted_through = Column(Integer, nullable=False, server_default="0")
+
+def _record(row: str, deleted: int) -> str:
+    return f"""
+        DELETE FROM song_changes WHERE song_id = {row}.id;
+        INSERT INTO song_changes (song_id, deleted) VALUES ({row}.id, {deleted});
+    """
+
+CHANGE_TRIGGERS = {
+    "songs_changes_ai": f"AFTER INSERT ON songs BEGIN {_record('new', 0)} END",
+    "songs_changes_au": f"AFTER UPDATE OF {TRACKED_COLUMNS} ON songs BEGIN {_record('new', 0)} END",
+    "songs_changes_ad": f"AFTER DELETE ON songs BEGIN {_record('old', 1)} END",
+}
+
+def create_change_triggers(target, connection, **kw):
+    """(Re)install the change log triggers after `create_all`, seeding a fresh log"""
+    if connection.dialect.name != "sqlite":
+        return
+
+    for name, body in CHANGE_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+    created = connection.execute(text("INSERT OR IGNORE INTO change_log_state (id) VALUES (1)")).rowcount
+    if created:
+        # Songs that predate the log are recorded as changed now.
+        connection.execute(text(
+            "INSERT OR IGNORE INTO song_changes (song_id, deleted) SELECT id, 0 FROM songs ORDER BY id"
+        ))
+
+event.listen(Base.metadata, "after_create", create_change_triggers)
+
+# Pydantic models for API
+class ChangeEntry(BaseModel):
+    seq: int
+    id: int
+    deleted: bool
+    song: Optional[SongResponse] = None  # absent for tombstones
+
+class ChangesResponse(BaseModel):
+    changes: List[ChangeEntry]
+    next_since: int  # pass as `since` on the next call
+    has_more: bool
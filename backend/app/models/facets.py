@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import List, Union
+
+from .song import SongResponse
+from .search import SearchResult
+
+# Duration facet buckets as (label, lower bound, upper bound) in seconds;
+# the last bucket has no upper bound.
+DURATION_BUCKETS = (
+    ("0-120", 0, 120),
+    ("120-240", 120, 240),
+    ("240-360", 240, 360),
+    ("360-600", 360, 600),
+    ("600+", 600, None),
+)
+
+FACET_NAMES = ("genre", "decade", "artist", "duration")
+
+# Pydantic models for API
+class FacetCount(BaseModel):
+    value: Union[int, str]
+    count: int
+
+class Facets(BaseModel):
+    genre: List[FacetCount] = []
+    decade: List[FacetCount] = []
+    artist: List[FacetCount] = []
+    duration: List[FacetCount] = []
+
+class SongPage(BaseModel):
+    """A page of songs with facet counts over every song matching the filters"""
+    items: List[SongResponse]
+    facets: Facets
+
+class SearchPage(BaseModel):
+    """A page of search results with facet counts over every match"""
+    items: List[SearchResult]
+    facets: Facets
@@ -0,0 +1,56 @@
+from sqlalchemy import JSON, Boolean, Column, DateTime, Float, Integer, String, Text
+from sqlalchemy.sql import func
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+
+from .song import Base
+
+# Long-running library operations run as background jobs. The row is the
+# single source of truth for a job's state, progress, and result, so a job
+# running in a worker process reports through the database the same way a
+# thread does, and finished jobs survive a restart.
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, server_default="queued", index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    progress = Column(Float, nullable=False, server_default="0")  # 0 to 1
+    message = Column(String)
+    result = Column(JSON)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, nullable=False, server_default="0")
+    owner_pid = Column(Integer)  # API process that queued it; its pool runs the job
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+# Pydantic models for API
+JobKind = Literal["reindex-search", "rebuild-stats", "rebuild-suggest", "compact-changes", "scan-library", "cache-artwork"]
+
+class JobCreate(BaseModel):
+    kind: JobKind
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: JobStatus
+    params: Dict[str, Any]
+    progress: float
+    message: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
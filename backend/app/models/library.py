@@ -0,0 +1,180 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, event, text
+from pydantic import BaseModel
+
+from .song import Base
+
+# First-class artists, albums, and genres. Songs keep their name columns and
+# reference the entities by foreign key; triggers on `songs` create entities
+# on first use, keep their song counts and total durations current in the
+# same transaction as the write, and delete them when their last song goes.
+
+class Artist(Base):
+    __tablename__ = "artists"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    song_count = Column(Integer, nullable=False, server_default="0", index=True)
+    total_duration = Column(Integer, nullable=False, server_default="0")
+
+class Album(Base):
+    __tablename__ = "albums"
+
+    id = Column(Integer, primary_key=True)
+    artist_id = Column(Integer, ForeignKey("artists.id"), nullable=False)
+    name = Column(String, nullable=False)
+    song_count = Column(Integer, nullable=False, server_default="0", index=True)
+    total_duration = Column(Integer, nullable=False, server_default="0")
+
+    __table_args__ = (UniqueConstraint("artist_id", "name", name="uq_albums_artist_id_name"),)
+
+class Genre(Base):
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+    song_count = Column(Integer, nullable=False, server_default="0", index=True)
+    total_duration = Column(Integer, nullable=False, server_default="0")
+
+ENTITY_TABLES = {"artist": "artists", "album": "albums", "genre": "genres"}
+
+_album_id = """(
+    SELECT albums.id FROM albums JOIN artists ON artists.id = albums.artist_id
+    WHERE artists.name = {row}.artist AND albums.name = {row}.album
+)"""
+
+def _attach(row: str) -> str:
+    """Statements counting song `row` into its entities, creating them as needed"""
+    return f"""
+        INSERT INTO artists (name, song_count, total_duration)
+        VALUES ({row}.artist, 1, coalesce({row}.duration, 0))
+        ON CONFLICT (name) DO UPDATE SET
+            song_count = song_count + 1,
+            total_duration = total_duration + excluded.total_duration;
+        INSERT INTO genres (name, song_count, total_duration)
+        SELECT {row}.genre, 1, coalesce({row}.duration, 0)
+        WHERE coalesce({row}.genre, '') <> ''
+        ON CONFLICT (name) DO UPDATE SET
+            song_count = song_count + 1,
+            total_duration = total_duration + excluded.total_duration;
+        INSERT INTO albums (artist_id, name, song_count, total_duration)
+        SELECT (SELECT id FROM artists WHERE name = {row}.artist), {row}.album, 1, coalesce({row}.duration, 0)
+        WHERE coalesce({row}.album, '') <> ''
+        ON CONFLICT (artist_id, name) DO UPDATE SET
+            song_count = song_count + 1,
+            total_duration = total_duration + excluded.total_duration;
+        UPDATE songs SET
+            artist_id = (SELECT id FROM artists WHERE name = {row}.artist),
+            genre_id = (SELECT id FROM genres WHERE name = {row}.genre),
+            album_id = {_album_id.format(row=row)}
+        WHERE id = {row}.id;
+    """
+
+def _detach(row: str) -> str:
+    """Statements removing song `row` from its entities, dropping emptied ones"""
+    statements = [
+        f"""
+        UPDATE {table} SET
+            song_count = song_count - 1,
+            total_duration = total_duration - coalesce({row}.duration, 0)
+        WHERE id = {row}.{kind}_id;
+        """
+        for kind, table in ENTITY_TABLES.items()
+    ] + [
+        f"DELETE FROM {table} WHERE id = {row}.{kind}_id AND song_count <= 0;"
+        for kind, table in (("album", "albums"), ("artist", "artists"), ("genre", "genres"))
+    ]
+    return "".join(statements)
+
+ENTITY_TRIGGERS = {
+    "songs_entities_ai": f"AFTER INSERT ON songs BEGIN {_attach('new')} END",
+    "songs_entities_ad": f"AFTER DELETE ON songs BEGIN {_detach('old')} END",
+    # Only fires on the name and duration columns, so the id assignment
+    # inside _attach never re-triggers it. Attaching first keeps an entity
+    # alive when the song stays with it.
+    "songs_entities_au": f"AFTER UPDATE OF artist, album, genre, duration ON songs BEGIN {_attach('new')} {_detach('old')} END",
+}
+for kind, table in ENTITY_TABLES.items():
+    ENTITY_TRIGGERS[f"{table}_ai"] = (
+        f"AFTER INSERT ON {table} BEGIN UPDATE library_stats SET {kind}_count = {kind}_count + 1 WHERE id = 1; END"
+    )
+    ENTITY_TRIGGERS[f"{table}_ad"] = (
+        f"AFTER DELETE ON {table} BEGIN UPDATE library_stats SET {kind}_count = {kind}_count - 1 WHERE id = 1; END"
+    )
+
+# Recompute every entity, count, and song reference from the name columns.
+ENTITY_REBUILD = [
+    "UPDATE songs SET artist_id = NULL, album_id = NULL, genre_id = NULL",
+    "DELETE FROM albums",
+    "DELETE FROM artists",
+    "DELETE FROM genres",
+    """
+    INSERT INTO artists (name, song_count, total_duration)
+    SELECT artist, count(*), coalesce(sum(duration), 0) FROM songs GROUP BY artist
+    """,
+    """
+    INSERT INTO genres (name, song_count, total_duration)
+    SELECT genre, count(*), coalesce(sum(duration), 0) FROM songs
+    WHERE coalesce(genre, '') <> '' GROUP BY genre
+    """,
+    """
+    INSERT INTO albums (artist_id, name, song_count, total_duration)
+    SELECT artists.id, songs.album, count(*), coalesce(sum(songs.duration), 0)
+    FROM songs JOIN artists ON artists.name = songs.artist
+    WHERE coalesce(songs.album, '') <> '' GROUP BY artists.id, songs.album
+    """,
+    f"""
+    UPDATE songs SET
+        artist_id = (SELECT id FROM artists WHERE name = songs.artist),
+        genre_id = (SELECT id FROM genres WHERE name = songs.genre),
+        album_id = {_album_id.format(row="songs")}
+    """,
+    """
+    UPDATE library_stats SET
+        artist_count = (SELECT count(*) FROM artists),
+        album_count = (SELECT count(*) FROM albums),
+        genre_count = (SELECT count(*) FROM genres)
+    WHERE id = 1
+    """,
+    # The id reassignment above is not a versioned write, but the listings may have changed.
+    "UPDATE library_version SET version = version + 1 WHERE id = 1",
+]
+
+def create_entity_triggers(target, connection, **kw):
+    """(Re)install the entity triggers after `create_all`, backfilling unlinked songs
+
+    Triggers are dropped and recreated so their bodies always match this
+    module; the whole `create_all` runs in one transaction. The distinct
+    counts are written only if the stats row exists; otherwise the stats
+    backfill computes them from the entity tables.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    for name, body in ENTITY_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+    unlinked = connection.execute(text("SELECT 1 FROM songs WHERE artist_id IS NULL LIMIT 1")).first()
+    if unlinked:
+        for statement in ENTITY_REBUILD:
+            connection.execute(text(statement))
+
+event.listen(Base.metadata, "after_create", create_entity_triggers)
+
+# Pydantic models for API
+class EntityResponse(BaseModel):
+    id: int
+    name: str
+    song_count: int
+    total_duration: int
+
+    class Config:
+        from_attributes = True
+
+class ArtistResponse(EntityResponse):
+    pass
+
+class GenreResponse(EntityResponse):
+    pass
+
+class AlbumResponse(EntityResponse):
+    artist_id: int
@@ -0,0 +1,62 @@
+from sqlalchemy import Table, event, text
+from sqlalchemy.engine import Connection
+from typing import List
+
+from .song import Base, Song, SHADOW_KEYS, normalize_key
+
+# `create_all` only creates missing tables. This brings tables that already
+# exist up to date: missing columns are added (and backfilled where they are
+# derived from other columns), missing indexes are created, and tables that
+# have been superseded are dropped. It runs before every other after_create
+# hook, so those can rely on the current columns.
+
+BACKFILL_BATCH = 5000
+
+# Per-name counts from before artists, albums, and genres were entities.
+RETIRED_TABLES = ("stat_counts",)
+
+def add_missing_columns(connection: Connection, table: Table) -> List[str]:
+    """ALTER TABLE ... ADD COLUMN for every model column the table lacks"""
+    existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table.name})"))}
+    added = []
+    for column in table.columns:
+        if column.name not in existing:
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(column.name)
+    return added
+
+def backfill_song_keys(connection: Connection) -> None:
+    """Compute the normalized shadow keys for every existing song"""
+    sources = list(SHADOW_KEYS.values())
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(f"SELECT id, {', '.join(sources)} FROM songs WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BACKFILL_BATCH},
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            text(f"UPDATE songs SET {', '.join(f'{key} = :{key}' for key in SHADOW_KEYS)} WHERE id = :id"),
+            [
+                {"id": row[0], **{key: normalize_key(value) for key, value in zip(SHADOW_KEYS, row[1:])}}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1][0]
+
+def upgrade_schema(target, connection, **kw):
+    """Add columns and indexes introduced after a database was created"""
+    if connection.dialect.name != "sqlite":
+        return
+
+    added = add_missing_columns(connection, Song.__table__)
+    if set(SHADOW_KEYS) & set(added):
+        backfill_song_keys(connection)
+    for index in Song.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    for table in RETIRED_TABLES:
+        connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+event.listen(Base.metadata, "after_create", upgrade_schema, insert=True)
@@ -0,0 +1,36 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Text
+from sqlalchemy.sql import func
+from pydantic import BaseModel
+from typing import List
+
+from .song import Base
+
+# What the library scanner saw of each audio file, so a rescan reads tags
+# only for files whose size or modification time changed, and notices files
+# that are gone. Songs are matched to files by `songs.file_path`.
+
+class ScannedFile(Base):
+    __tablename__ = "scanned_files"
+
+    path = Column(String, primary_key=True)
+    root = Column(String, nullable=False, index=True)  # scan root the file was found under
+    mtime_ns = Column(BigInteger, nullable=False)
+    size = Column(Integer, nullable=False)
+    error = Column(Text)  # why the tags could not be read, if they could not
+    scanned_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Pydantic models for API
+class ScanError(BaseModel):
+    path: str
+    error: str
+
+class ScanReport(BaseModel):
+    roots: List[str]
+    files: int = 0       # audio files found
+    unchanged: int = 0   # skipped: same size and modification time as last scan
+    added: int = 0
+    updated: int = 0
+    removed: int = 0     # songs deleted because their file is gone
+    failed: int = 0
+    errors: List[ScanError] = []
+    errors_truncated: bool = False
@@ -0,0 +1,93 @@
+from sqlalchemy import event, text
+from pydantic import BaseModel
+from typing import Optional
+
+from .song import Base, SongResponse
+
+# Full-text index over the searchable song columns. It is an external-content
+# FTS5 table: the text lives only in `songs`, the index stores tokens and
+# triggers keep both in sync inside the same transaction as the write.
+SEARCH_TABLE = "songs_fts"
+SEARCH_COLUMNS = ("title", "artist", "album", "genre")
+
+# BM25 column weights, in SEARCH_COLUMNS order: a title hit outranks an
+# artist hit, which outranks album and genre hits.
+SEARCH_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+# Trigram index for typo-tolerant search over titles and artists. The
+# trigram tokenizer in this SQLite version cannot fold accents, so both are
+# indexed by their normalized shadow keys.
+FUZZY_TABLE = "songs_trigram"
+FUZZY_COLUMNS = ("title_key", "artist_key")
+
+def _sync_triggers(table: str, columns) -> list:
+    """Triggers keeping external-content FTS5 `table` in sync with `songs`"""
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON songs BEGIN
+            INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON songs BEGIN
+            INSERT INTO {table}({table}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF {names} ON songs BEGIN
+            INSERT INTO {table}({table}, rowid, {names}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table}(rowid, {names}) VALUES (new.id, {new_values});
+        END
+        """,
+    ]
+
+# Each index: its columns, FTS5 options, and sync triggers
+SEARCH_INDEXES = {
+    SEARCH_TABLE: (SEARCH_COLUMNS, "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"),
+    FUZZY_TABLE: (FUZZY_COLUMNS, "tokenize='trigram'"),
+}
+
+
+def create_search_index(target, connection, **kw):
+    """Create the FTS5 tables and their sync triggers after `create_all`.
+
+    Runs on every `create_all`, so existing databases pick up an index on
+    the next startup; the first time a table is created it is backfilled
+    from `songs`. A table indexing other columns than its entry here is
+    dropped with its triggers and created anew.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    for table, (columns, options) in SEARCH_INDEXES.items():
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": table},
+        ).first()
+        indexed = tuple(row[1] for row in connection.execute(text(f"PRAGMA table_info({table})")))
+        if exists and indexed != tuple(columns):
+            for suffix in ("ai", "ad", "au"):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_{suffix}"))
+            connection.execute(text(f"DROP TABLE {table}"))
+            exists = None
+        if not exists:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {table} USING fts5("
+                f"{', '.join(columns)}, content='songs', content_rowid='id', {options})"
+            ))
+        for statement in _sync_triggers(table, columns):
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+
+
+event.listen(Base.metadata, "after_create", create_search_index)
+
+
+# Pydantic models for API
+class SearchResult(SongResponse):
+    score: float
+    snippet: Optional[str] = None
@@ -1,12 +1,26 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+import unicodedata
 
 Base = declarative_base()
 
+def normalize_key(value: Optional[str]) -> Optional[str]:
+    """Lookup key for a name: accents stripped, casefolded, whitespace collapsed"""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+def _key_default(source: str):
+    """Column default computing a shadow key from `source`, for ORM and Core inserts alike"""
+    return lambda context: normalize_key(context.get_current_parameters().get(source))
+
 class Song(Base):
     __tablename__ = "songs"
     
@@ -17,11 +31,40 @@ class Song(Base):
     genre = Column(String, index=True)
     year = Column(Integer)
     duration = Column(Integer)  # Duration in seconds
-    file_path = Column(String)
+    file_path = Column(String, index=True)  # matched by the library scanner
     artwork_url = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Normalized shadows of artist/genre so case- and accent-insensitive
+    # exact and prefix lookups are index seeks, and of the title for the
+    # trigram index. Inserts fill them through the column defaults, ORM
+    # updates through the validators below; Core UPDATEs must set them with
+    # `normalized_keys()`.
+    artist_key = Column(String, index=True, default=_key_default("artist"))
+    genre_key = Column(String, index=True, default=_key_default("genre"))
+    title_key = Column(String, default=_key_default("title"))
+
+    # References to the artist, album, and genre entities named above. They
+    # are assigned by the triggers in `library`, never by application code.
+    artist_id = Column(Integer, ForeignKey("artists.id"), index=True)
+    album_id = Column(Integer, ForeignKey("albums.id"), index=True)
+    genre_id = Column(Integer, ForeignKey("genres.id"), index=True)
+
+    @validates("title", "artist", "genre")
+    def _sync_key(self, field, value):
+        setattr(self, f"{field}_key", normalize_key(value))
+        return value
+
+SHADOW_KEYS = {"artist_key": "artist", "genre_key": "genre", "title_key": "title"}
+
+# Columns written only by triggers, as a consequence of another write
+ENTITY_REFERENCES = ("artist_id", "album_id", "genre_id")
+
+def normalized_keys(values: dict) -> dict:
+    """Shadow key values for a dict of column updates"""
+    return {key: normalize_key(values[source]) for key, source in SHADOW_KEYS.items() if source in values}
+
 # Pydantic models for API
 class SongBase(BaseModel):
     title: str
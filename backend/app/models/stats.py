@@ -0,0 +1,97 @@
+from sqlalchemy import Column, Integer, event, text
+from pydantic import BaseModel
+from typing import List, Optional
+
+from .song import Base
+
+# Library-wide aggregates, maintained by triggers on `songs` so every write
+# updates them in its own transaction and reads never touch the songs table.
+
+class LibraryStats(Base):
+    """Single-row table (id = 1) of library totals"""
+    __tablename__ = "library_stats"
+
+    id = Column(Integer, primary_key=True)
+    song_count = Column(Integer, nullable=False, server_default="0")
+    artist_count = Column(Integer, nullable=False, server_default="0")
+    album_count = Column(Integer, nullable=False, server_default="0")
+    genre_count = Column(Integer, nullable=False, server_default="0")
+    total_duration = Column(Integer, nullable=False, server_default="0")
+    duration_count = Column(Integer, nullable=False, server_default="0")
+    year_total = Column(Integer, nullable=False, server_default="0")
+    year_count = Column(Integer, nullable=False, server_default="0")
+
+def _add(row: str) -> str:
+    """Statement counting the `new`/`old` song `row` into the totals"""
+    sign = "+" if row == "new" else "-"
+    return f"""
+        UPDATE library_stats SET
+            song_count = song_count {sign} 1,
+            total_duration = total_duration {sign} coalesce({row}.duration, 0),
+            duration_count = duration_count {sign} ({row}.duration IS NOT NULL),
+            year_total = year_total {sign} coalesce({row}.year, 0),
+            year_count = year_count {sign} ({row}.year IS NOT NULL)
+        WHERE id = 1;
+    """
+
+# The distinct artist, album, and genre counts are kept by the entity table
+# triggers in `library`.
+STATS_TRIGGERS = {
+    "songs_stats_ai": f"AFTER INSERT ON songs BEGIN {_add('new')} END",
+    "songs_stats_ad": f"AFTER DELETE ON songs BEGIN {_add('old')} END",
+    "songs_stats_au": f"AFTER UPDATE OF duration, year ON songs BEGIN {_add('old')} {_add('new')} END",
+}
+
+# Recompute every total from scratch; used for backfill and recovery.
+STATS_REBUILD = [
+    """
+    UPDATE library_stats SET
+        song_count = (SELECT count(*) FROM songs),
+        total_duration = (SELECT coalesce(sum(duration), 0) FROM songs),
+        duration_count = (SELECT count(duration) FROM songs),
+        year_total = (SELECT coalesce(sum(year), 0) FROM songs),
+        year_count = (SELECT count(year) FROM songs),
+        artist_count = (SELECT count(*) FROM artists),
+        album_count = (SELECT count(*) FROM albums),
+        genre_count = (SELECT count(*) FROM genres)
+    WHERE id = 1
+    """
+]
+
+def create_stats_triggers(target, connection, **kw):
+    """(Re)install the stats triggers after `create_all`, backfilling a fresh stats table"""
+    if connection.dialect.name != "sqlite":
+        return
+
+    for name, body in STATS_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+    created = connection.execute(text("INSERT OR IGNORE INTO library_stats (id) VALUES (1)")).rowcount
+    if created:
+        for statement in STATS_REBUILD:
+            connection.execute(text(statement))
+
+event.listen(Base.metadata, "after_create", create_stats_triggers)
+
+# Pydantic models for API
+class StatCountResponse(BaseModel):
+    name: str
+    count: int
+
+class RecentSong(BaseModel):
+    id: int
+    title: str
+    artist: str
+
+class LibraryStatsResponse(BaseModel):
+    total_songs: int
+    total_artists: int
+    total_albums: int
+    total_genres: int
+    total_duration: int
+    average_song_duration: int
+    average_year: Optional[int] = None
+    top_artist: Optional[StatCountResponse] = None
+    top_genre: Optional[StatCountResponse] = None
+    top_genres: List[StatCountResponse] = []
+    recent_additions: List[RecentSong] = []
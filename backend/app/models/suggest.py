@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Literal
+
+# Pydantic models for API
+class Suggestion(BaseModel):
+    text: str
+    type: Literal["title", "artist", "album"]
+    count: int  # songs with this title, by this artist, or on this album
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, event, text
+
+from .song import Base, Song, ENTITY_REFERENCES
+
+# Library-wide change counter. Triggers bump it on every insert, update, and
+# delete of a song, whichever code path or process made the write, so it can
+# tag cached reads and derive validators for conditional requests.
+
+class LibraryVersion(Base):
+    """Single-row table (id = 1) holding the library change counter"""
+    __tablename__ = "library_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, server_default="0")
+
+# Updates count only when they touch a stored column, so the entity
+# triggers assigning `ENTITY_REFERENCES` do not bump the version twice.
+TRACKED_COLUMNS = ", ".join(
+    column.name for column in Song.__table__.columns if column.name not in ENTITY_REFERENCES
+)
+
+VERSION_TRIGGERS = {
+    f"songs_version_a{suffix}": f"""
+    AFTER {operation} ON songs BEGIN
+        UPDATE library_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for suffix, operation in (("i", "INSERT"), ("u", f"UPDATE OF {TRACKED_COLUMNS}"), ("d", "DELETE"))
+}
+
+def create_version_triggers(target, connection, **kw):
+    """Install the change counter row and (re)install its triggers after `create_all`"""
+    if connection.dialect.name != "sqlite":
+        return
+
+    connection.execute(text("INSERT OR IGNORE INTO library_version (id, version) VALUES (1, 0)"))
+    for name, body in VERSION_TRIGGERS.items():
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        connection.execute(text(f"CREATE TRIGGER {name} {body}"))
+
+event.listen(Base.metadata, "after_create", create_version_triggers)
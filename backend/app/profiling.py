@@ -0,0 +1,239 @@
+"""
+On-demand request profiling and slow-query plan capture
+
+A request is profiled when it carries the profiling header (`X-Profile: 1`
+by default) or is picked by `PROFILE_SAMPLE_RATE`. Every SQL statement it
+issues is recorded, and a sync handler runs under cProfile in the worker
+thread that executes it. Async handlers are not profiled: the event loop
+thread interleaves them with every other coroutine, whose work would be
+blamed on them. Profiled requests that asked for it or ran
+longer than `PROFILE_SLOW_REQUEST_MS` are kept in a bounded ring buffer,
+and responses name the kept profile in `X-Profile-Id` when it is known to
+be kept by the time the response starts.
+
+Independently, any statement slower than `SLOW_QUERY_MS` is kept in a
+second ring buffer, with its `EXPLAIN QUERY PLAN` when it is a query.
+"""
+from collections import deque
+from contextvars import ContextVar
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+import cProfile
+import functools
+import io
+import itertools
+import pstats
+import random
+import sys
+import threading
+import time
+
+from .config import settings
+
+PROFILE_TOP_FUNCTIONS = 40
+
+
+class RequestProfile:
+    """Everything captured while serving one profiled request"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, method: str, path: str, requested: bool):
+        self.id = next(self._ids)
+        self.method = method
+        self.path = path
+        self.requested = requested
+        self.route: Optional[str] = None
+        self.status: Optional[int] = None
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.statements: List[Dict[str, Any]] = []
+        self.profile: Optional[str] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "sql_statements": len(self.statements),
+            "sql_ms": round(sum(statement["duration_ms"] for statement in self.statements), 3),
+            "requested": self.requested,
+        }
+
+    def detail(self) -> Dict[str, Any]:
+        return {**self.summary(), "statements": self.statements, "profile": self.profile}
+
+
+class RingBuffer:
+    """Thread-safe bounded buffer of the most recent items"""
+
+    def __init__(self, size: int):
+        self._items: Deque[Any] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def append(self, item: Any) -> None:
+        with self._lock:
+            self._items.append(item)
+
+    def items(self) -> List[Any]:
+        with self._lock:
+            return list(reversed(self._items))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+recent_profiles = RingBuffer(settings.profile_buffer_size)
+slow_queries = RingBuffer(settings.profile_buffer_size)
+
+
+def get_profile(profile_id: int) -> Optional[RequestProfile]:
+    return next((profile for profile in recent_profiles.items() if profile.id == profile_id), None)
+
+
+def _run_profiled(profile: RequestProfile, call, *args, **kwargs):
+    if sys.getprofile() is not None:  # another profiler owns this thread
+        return call(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(call, *args, **kwargs)
+    finally:
+        profile.profile = _format_profile(profiler)
+
+
+def _format_profile(profiler: cProfile.Profile) -> str:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return output.getvalue()
+
+
+class ProfilingRoute(APIRoute):
+    """APIRoute whose sync endpoint runs under cProfile when the request is being profiled
+
+    The endpoint is profiled inside the worker thread that runs it, so the
+    stack shows the handler's own work rather than the event loop. Async
+    endpoints are left as they are.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        # include_router() rebuilds routes from already wrapped endpoints.
+        if not getattr(endpoint, "_profiling_wrapper", False):
+            endpoint = self.wrap(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def wrap(endpoint):
+        if asyncio.iscoroutinefunction(endpoint):
+            return endpoint
+
+        @functools.wraps(endpoint)
+        def wrapped(*args, **kw):
+            profile = current_profile.get()
+            if profile is None:
+                return endpoint(*args, **kw)
+            return _run_profiled(profile, endpoint, *args, **kw)
+        wrapped._profiling_wrapper = True
+        return wrapped
+
+
+def explain(cursor, statement: str, parameters) -> List[str]:
+    """EXPLAIN QUERY PLAN for `statement`, run on the same DBAPI connection"""
+    plan_cursor = cursor.connection.cursor()
+    try:
+        plan_cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        return [row[-1] for row in plan_cursor.fetchall()]
+    except Exception as exc:  # the plan is diagnostic only; never fail the query
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        plan_cursor.close()
+
+
+def instrument_engine(engine: Engine, slow_query_ms: Optional[float] = None) -> None:
+    """Record statements for profiled requests and capture plans of slow queries"""
+    threshold = settings.slow_query_ms if slow_query_ms is None else slow_query_ms
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["profile_start"].pop()) * 1000
+        profile = current_profile.get()
+        slow = duration_ms >= threshold
+        if profile is None and not slow:
+            return
+
+        record = {"statement": statement, "duration_ms": round(duration_ms, 3)}
+        if slow:
+            record["parameters"] = repr(parameters)[:500]
+            if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                record["plan"] = explain(cursor, statement, parameters)
+            slow_queries.append({
+                **record,
+                "at": time.time(),
+                "request": f"{profile.method} {profile.path}" if profile else None,
+            })
+        if profile is not None:
+            profile.statements.append(record)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("profile_start"):
+            connection.info["profile_start"].pop()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware deciding which requests to profile and keeping the slow ones"""
+
+    def __init__(self, app, header: str = settings.profile_header, sample_rate: float = settings.profile_sample_rate,
+                 slow_request_ms: float = settings.profile_slow_request_ms):
+        self.app = app
+        self.header = header.lower().encode("latin-1")
+        self.sample_rate = sample_rate
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        requested = any(name == self.header and value not in (b"", b"0") for name, value in scope["headers"])
+        if not requested and not (self.sample_rate and random.random() < self.sample_rate):
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], requested)
+        started = time.perf_counter()
+        kept = requested
+
+        async def send_wrapper(message):
+            nonlocal kept
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                # Only a profile certain to be kept is named in the response:
+                # a sampled one must already be slow when the response starts
+                kept = kept or (time.perf_counter() - started) * 1000 >= self.slow_request_ms
+                if kept:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", str(profile.id).encode())
+                    ]
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            current_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", None)
+            if kept or profile.duration_ms >= self.slow_request_ms:
+                recent_profiles.append(profile)
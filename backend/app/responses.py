@@ -0,0 +1,54 @@
+"""
+Fast JSON responses for list endpoints
+
+Rows selected as plain tuples are turned into dicts and encoded in one call,
+skipping per-row Pydantic validation. orjson is used when it is installed;
+otherwise the standard library encoder produces the same JSON, more slowly.
+"""
+from datetime import date, datetime
+from fastapi import Response
+from typing import Any, Iterable, List, Sequence
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode `content` as compact UTF-8 JSON, datetimes in ISO 8601"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def rows_to_dicts(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_json(content: Any, response: Response) -> FastJSONResponse:
+    """FastJSONResponse carrying the headers a handler set on its injected `response`
+
+    FastAPI only applies those headers to responses it builds itself.
+    """
+    fast = FastJSONResponse(content)
+    for name, value in response.headers.items():
+        if name not in ("content-length", "content-type"):
+            fast.headers[name] = value
+    return fast
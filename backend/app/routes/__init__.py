@@ -1,3 +1,6 @@
 from .songs import router as songs_router
+from .library import router as library_router
+from .jobs import router as jobs_router
+from .admin import router as admin_router
 
-__all__ = ["songs_router"]
+__all__ = ["songs_router", "library_router", "jobs_router", "admin_router"]
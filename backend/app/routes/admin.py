@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..admission import admission_stats
+from ..profiling import ProfilingRoute, get_profile, recent_profiles, slow_queries
+from ..services import ChangeService, artwork_store, get_db, song_cache, song_writer, suggest_index
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], route_class=ProfilingRoute)
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Get read cache size, hit/miss counters, and limits"""
+    return song_cache.stats()
+
+@router.get("/suggest")
+async def get_suggest_stats():
+    """Get the typeahead index size and approximate memory use"""
+    return suggest_index.stats()
+
+@router.post("/suggest/rebuild")
+def rebuild_suggest_index(db: Session = Depends(get_db)):
+    """Reload the typeahead index, e.g. after writes made by another process"""
+    suggest_index.rebuild(db)
+    return suggest_index.stats()
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Get active and queued requests and the configured limits per route class"""
+    return admission_stats()
+
+@router.get("/writes")
+async def get_write_stats():
+    """Get group-commit batch counts and the mean number of writes per transaction"""
+    return song_writer.stats()
+
+@router.get("/artwork")
+def get_artwork_stats():
+    """Get the artwork store size and eviction count"""
+    return artwork_store.stats()
+
+@router.post("/changes/compact")
+def compact_changes(db: Session = Depends(get_db)):
+    """Prune delete tombstones older than the retention period from the change log"""
+    change_service = ChangeService(db)
+    pruned = change_service.compact()
+    return {"pruned": pruned, "compacted_through": change_service.compacted_through()}
+
+@router.get("/profiles")
+async def list_profiles():
+    """Recent profiled requests, newest first"""
+    return [profile.summary() for profile in recent_profiles.items()]
+
+@router.get("/profiles/{profile_id}")
+async def get_profile_detail(profile_id: int):
+    """Call-stack profile and SQL statements of one profiled request"""
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.detail()
+
+@router.get("/slow-queries")
+async def list_slow_queries():
+    """Recent statements over the slow-query threshold, with their query plans"""
+    return slow_queries.items()
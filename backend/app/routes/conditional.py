@@ -0,0 +1,127 @@
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import BinaryIO, Iterator, Optional, Tuple
+import hashlib
+import os
+import re
+
+from ..config import settings
+from ..services import get_db
+from ..services.cache import get_library_version
+
+# Cache-Control sent with each conditional route, set per route with
+# CACHE_CONTROL_<ROUTE> (e.g. CACHE_CONTROL_STATS="public, max-age=30").
+# The default lets clients store responses but revalidate them every time,
+# which costs a 304 with no body while the library is unchanged.
+CONDITIONAL_ROUTES = ("songs", "song", "stats", "search", "library")
+CACHE_CONTROL = {route: getattr(settings, f"cache_control_{route}") for route in CONDITIONAL_ROUTES}
+
+
+def make_etag(route: str, version: int, request: Request) -> str:
+    """Strong ETag for a route's response at a library version
+
+    Every write bumps the library version, so the tag changes whenever the
+    response could. Row `updated_at` values only have one-second resolution
+    and would miss a second update within the same second.
+    """
+    params = sorted(request.query_params.multi_items())
+    key = f"{route}|{version}|{request.url.path}|{params!r}"
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+def conditional(route: str):
+    """Dependency answering `If-None-Match` with 304 before the handler runs
+
+    Only the library version is read, so a matching request never runs the
+    route's query or serializes its body.
+    """
+    cache_control = CACHE_CONTROL[route]
+
+    def check(request: Request, response: Response, db: Session = Depends(get_db)) -> str:
+        etag = make_etag(route, get_library_version(db), request)
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return etag
+
+    return check
+
+
+def byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single `Range: bytes=...` header
+
+    Returns None for a header to ignore (another unit, several ranges, or
+    bad syntax), and raises ValueError for a range past the end.
+    """
+    unit, _, spec = header.partition("=")
+    match = re.fullmatch(r"\s*(\d*)-(\d*)\s*", spec)
+    if unit.strip().lower() != "bytes" or match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:  # suffix: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and start > int(last):
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end")
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+# Bytes read per body chunk when streaming a file
+FILE_CHUNK = 64 * 1024
+
+
+def read_chunks(file: BinaryIO) -> Iterator[bytes]:
+    with file:
+        while True:
+            chunk = file.read(FILE_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def file_response(request: Request, file: BinaryIO, media_type: str, etag: str, cache_control: str) -> Response:
+    """Serve an open file under a strong ETag: 304 for a matching If-None-Match, 206 for a single byte range
+
+    A Range is honoured only if If-Range is absent or names the current
+    ETag, so a client resuming a download never splices two versions.
+    The response reads the file it was given rather than its path, so the
+    file may be replaced or deleted meanwhile; the file is closed once sent.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    size = os.fstat(file.fileno()).st_size
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        file.close()
+        return Response(status_code=304, headers=headers)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            span = byte_range(range_header, size)
+        except ValueError:
+            file.close()
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if span is not None:
+            start, end = span
+            with file:
+                file.seek(start)
+                content = file.read(end - start + 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            return Response(content, status_code=206, headers=headers, media_type=media_type)
+    file.seek(0)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(read_chunks(file), media_type=media_type, headers=headers)
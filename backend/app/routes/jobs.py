@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..models import JobCreate, JobResponse
+from ..models.jobs import FINISHED_STATUSES, JobStatus
+from ..profiling import ProfilingRoute
+from ..services import JobService, get_db, job_runner
+
+router = APIRouter(prefix="/api", tags=["jobs"], route_class=ProfilingRoute)
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+def create_job(job: JobCreate, db: Session = Depends(get_db)):
+    """Queue a maintenance job; poll GET /api/jobs/{id} for progress and the result"""
+    try:
+        return job_runner.submit(db, job.kind, job.params)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+@router.get("/jobs", response_model=List[JobResponse])
+def list_jobs(
+    status: Optional[JobStatus] = Query(None, description="Only jobs in this state"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Recent jobs, newest first"""
+    return JobService(db).list(status=status, limit=limit)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get a job's state, progress, and result"""
+    job = JobService(db).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(job_id: int, db: Session = Depends(get_db)):
+    """Cancel a job
+
+    A queued job is cancelled at once; a running one stops at its next
+    progress report, keeping any work it already committed.
+    """
+    job_service = JobService(db)
+    job = job_service.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job_service.cancel(job_id)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from ..models import ArtistResponse, AlbumResponse, GenreResponse
+from ..profiling import ProfilingRoute
+from ..services import LibraryService, get_db
+from ..services.library_service import EntitySort
+from .conditional import conditional
+
+router = APIRouter(prefix="/api", tags=["library"], route_class=ProfilingRoute)
+
+SORT_DESCRIPTION = "Order by name, or by song count or total duration, largest first"
+
+@router.get("/artists", response_model=List[ArtistResponse])
+def get_artists(
+    sort: EntitySort = Query("name", description=SORT_DESCRIPTION),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    etag: str = Depends(conditional("library"))
+):
+    """List artists with their song counts and total durations"""
+    return LibraryService(db).get_artists(sort=sort, skip=skip, limit=limit)
+
+@router.get("/albums", response_model=List[AlbumResponse])
+def get_albums(
+    sort: EntitySort = Query("name", description=SORT_DESCRIPTION),
+    artist_id: Optional[int] = Query(None, description="Only albums by this artist"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    etag: str = Depends(conditional("library"))
+):
+    """List albums with their song counts and total durations"""
+    return LibraryService(db).get_albums(sort=sort, skip=skip, limit=limit, artist_id=artist_id)
+
+@router.get("/genres", response_model=List[GenreResponse])
+def get_genres(
+    sort: EntitySort = Query("name", description=SORT_DESCRIPTION),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    etag: str = Depends(conditional("library"))
+):
+    """List genres with their song counts and total durations"""
+    return LibraryService(db).get_genres(sort=sort, skip=skip, limit=limit)
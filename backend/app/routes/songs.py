@@ -1,162 +1,364 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from typing import List, Literal, Optional, Tuple, Union
+import time
 
-from ..models import SongCreate, SongUpdate, SongResponse
-from ..services import SongService, get_db
+from ..config import settings
+from ..models import SongCreate, SongUpdate, SongResponse, SearchResult, LibraryStatsResponse
+from ..models.batch import BatchIds, BatchOutcome, BatchResponse, BatchUpdate
+from ..models.bulk import BulkImportResponse
+from ..models.changes import ChangesResponse
+from ..models.facets import SongPage, SearchPage
+from ..models.jobs import JobResponse
+from ..models.suggest import Suggestion
+from ..profiling import ProfilingRoute
+from ..responses import FastJSONResponse, fast_json, rows_to_dicts
+from ..services import ArtworkService, CachedSongService, ChangeService, StatsService, get_db, job_runner, song_writer, suggest_index
+from ..services.artwork import ArtworkSize, ArtworkUnavailable, image_type
+from ..services.change_service import ResyncRequired
+from ..services.export_service import ExportService, EXPORT_MEDIA_TYPES
+from ..services.import_service import ImportService, iter_lines, iter_ndjson_records, iter_csv_records, stage_upload
+from ..services.pagination import encode_cursor, decode_cursor
+from ..services.search_service import SearchMode
+from ..services.song_service import MatchMode, SONG_FIELDS, SongFilter
+from .conditional import conditional, file_response
 
-router = APIRouter(prefix="/api", tags=["songs"])
+router = APIRouter(prefix="/api", tags=["songs"], route_class=ProfilingRoute)
 
-@router.get("/songs", response_model=List[SongResponse])
-async def get_songs(
-    skip: int = Query(0, ge=0, description="Number of songs to skip"),
+def song_filter(
+    artist: Optional[str] = Query(None, description="Only songs by this artist, ignoring case and accents"),
+    genre: Optional[str] = Query(None, description="Only songs in this genre, ignoring case and accents"),
+    decade: Optional[int] = Query(None, multiple_of=10, description="Only songs from this decade, e.g. 1990"),
+) -> SongFilter:
+    return SongFilter(artist=artist, genre=genre, decade=decade)
+
+def song_fields(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,title,artist; id is always included"),
+) -> Tuple[str, ...]:
+    """Fields to select, pushed down into the SELECT column list"""
+    if fields is None:
+        return SONG_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in SONG_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ("id",) + tuple(dict.fromkeys(field for field in requested if field != "id"))
+
+FACETS_DESCRIPTION = "Return {items, facets} with genre, decade, artist, and duration counts over all matches"
+
+@router.get("/songs", response_model=Union[List[SongResponse], SongPage])
+def get_songs(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of songs to skip (ignored when cursor is given)"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of songs to return"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's Link header"),
+    filter: SongFilter = Depends(song_filter),
+    fields: Tuple[str, ...] = Depends(song_fields),
+    facets: bool = Query(False, description=FACETS_DESCRIPTION),
+    facet_artists: int = Query(10, ge=1, le=100, description="Number of top artists in the artist facet"),
+    db: Session = Depends(get_db),
+    etag: str = Depends(conditional("songs"))
+):
+    """Get songs with pagination, optionally filtered and with facet counts
+
+    Full pages carry a `Link: <...>; rel="next"` header whose URL continues
+    after the last song returned. Following it walks the catalog with keyset
+    pagination, which costs the same for every page and does not skip or
+    repeat rows when songs are added concurrently.
+
+    Songs are selected as plain column tuples and encoded directly, without
+    building a model per row.
+    """
+    after_id = None
+    if cursor is not None:
+        try:
+            after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    song_service = CachedSongService(db)
+    rows = song_service.get_song_rows(fields, skip=skip, limit=limit, after_id=after_id, filter=filter)
+    if len(rows) == limit:
+        next_url = request.url.remove_query_params("skip").include_query_params(
+            cursor=encode_cursor(rows[-1][fields.index("id")]), limit=limit
+        )
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    songs = rows_to_dicts(fields, rows)
+    if facets:
+        song_facets = song_service.get_song_facets(filter, top_artists=facet_artists)
+        return fast_json({"items": songs, "facets": song_facets.model_dump()}, response)
+    return fast_json(songs, response)
+
+@router.get("/songs/export")
+def export_songs(
+    format: Literal["ndjson", "csv", "json"] = Query("ndjson", description="Output format"),
+    artist: Optional[str] = Query(None, description="Only songs by this artist, ignoring case and accents"),
+    genre: Optional[str] = Query(None, description="Only songs in this genre, ignoring case and accents"),
+    year: Optional[int] = Query(None, description="Only songs from this year"),
+    db: Session = Depends(get_db)
+):
+    """Stream the whole catalog, or a filtered part of it, with constant memory"""
+    export_service = ExportService(db)
+    return StreamingResponse(
+        export_service.export(format, artist=artist, genre=genre, year=year),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="songs.{format}"'},
+    )
+
+@router.post("/songs/batch-get")
+def batch_get_songs(
+    batch: BatchIds,
+    fields: Tuple[str, ...] = Depends(song_fields),
     db: Session = Depends(get_db)
 ):
-    """Get all songs with pagination"""
-    song_service = SongService(db)
-    songs = song_service.get_songs(skip=skip, limit=limit)
-    return songs
+    """Get many songs by id in one request
+
+    Returns `{"songs": [...], "not_found": [...]}`, both in request order.
+    """
+    ids = list(dict.fromkeys(batch.ids))
+    rows = CachedSongService(db).get_song_rows_by_ids(ids, fields)
+    position = fields.index("id")
+    found = {row[position]: row for row in rows}
+    return FastJSONResponse({
+        "songs": rows_to_dicts(fields, [found[song_id] for song_id in ids if song_id in found]),
+        "not_found": [song_id for song_id in ids if song_id not in found],
+    })
+
+@router.patch("/songs/batch", response_model=BatchResponse)
+def batch_update_songs(batch: BatchUpdate, db: Session = Depends(get_db)):
+    """Apply the same changes to many songs in one transaction"""
+    try:
+        updated = CachedSongService(db).update_songs(batch.ids, batch.changes)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return batch_response(batch.ids, updated, "updated")
+
+@router.post("/songs/batch-delete", response_model=BatchResponse)
+def batch_delete_songs(batch: BatchIds, db: Session = Depends(get_db)):
+    """Delete many songs in one transaction"""
+    deleted = CachedSongService(db).delete_songs(batch.ids)
+    return batch_response(batch.ids, deleted, "deleted")
+
+def batch_response(ids: List[int], succeeded: List[int], status: str) -> BatchResponse:
+    done = set(succeeded)
+    results = [
+        BatchOutcome(id=song_id, status=status if song_id in done else "not_found")
+        for song_id in dict.fromkeys(ids)
+    ]
+    return BatchResponse(succeeded=len(done), not_found=len(results) - len(done), results=results)
 
 @router.get("/songs/{song_id}", response_model=SongResponse)
-async def get_song(song_id: int, db: Session = Depends(get_db)):
+def get_song(song_id: int, db: Session = Depends(get_db), etag: str = Depends(conditional("song"))):
     """Get a specific song by ID"""
-    song_service = SongService(db)
+    song_service = CachedSongService(db)
     song = song_service.get_song(song_id)
     if not song:
         raise HTTPException(status_code=404, detail="Song not found")
     return song
 
-@router.get("/stats", response_model=dict)
-async def get_library_stats(db: Session = Depends(get_db)):
-    """Get comprehensive library statistics"""
-    song_service = SongService(db)
-    songs = song_service.get_songs(skip=0, limit=10000)  # Get all songs for stats
-    
-    if not songs:
-        return {
-            "total_songs": 0,
-            "total_artists": 0,
-            "total_albums": 0,
-            "total_genres": 0,
-            "total_duration": 0,
-            "average_song_duration": 0,
-            "top_artist": None,
-            "top_genre": None,
-            "recent_additions": []
-        }
-    
-    # Calculate basic stats
-    artists = set(song.artist for song in songs)
-    albums = set(song.album for song in songs if song.album)
-    genres = set(song.genre for song in songs if song.genre)
-    
-    total_duration = sum(song.duration for song in songs if song.duration)
-    avg_duration = total_duration // len(songs) if songs else 0
-    
-    # Find top artist
-    from collections import Counter
-    artist_counts = Counter(song.artist for song in songs)
-    top_artist = artist_counts.most_common(1)[0] if artist_counts else None
-    
-    # Find top genre
-    genre_counts = Counter(song.genre for song in songs if song.genre)
-    top_genre = genre_counts.most_common(1)[0] if genre_counts else None
-    
-    # Get recent additions (last 5)
-    recent_songs = sorted(songs, key=lambda x: x.created_at, reverse=True)[:5]
-    
-    return {
-        "total_songs": len(songs),
-        "total_artists": len(artists),
-        "total_albums": len(albums), 
-        "total_genres": len(genres),
-        "total_duration": total_duration,
-        "average_song_duration": avg_duration,
-        "top_artist": {"name": top_artist[0], "count": top_artist[1]} if top_artist else None,
-        "top_genre": {"name": top_genre[0], "count": top_genre[1]} if top_genre else None,
-        "recent_additions": [{"id": song.id, "title": song.title, "artist": song.artist} for song in recent_songs]
-    }
+@router.get("/songs/{song_id}/artwork", response_class=Response, responses={200: {"content": {"image/jpeg": {}}}})
+def get_song_artwork(
+    song_id: int,
+    request: Request,
+    size: ArtworkSize = Query("medium", description="small, medium, or large thumbnail (128, 300, or 600 px), or original"),
+    v: Optional[str] = Query(None, description="Version from a previous response's ETag, for a long-lived cached URL"),
+    db: Session = Depends(get_db)
+):
+    """Song artwork from the local store, fetched from `artwork_url` on first use
+
+    Served with a strong ETag and byte range support, and revalidated on
+    every use since the song's artwork_url may change. A request whose `v`
+    is the current ETag value (without quotes) may be cached for a year; a
+    stale `v` gets the current image, revalidated as usual. A 502 means the
+    artwork URL could not be fetched or is not an image.
+    """
+    song = CachedSongService(db).get_song(song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+    if not song.artwork_url:
+        raise HTTPException(status_code=404, detail="Song has no artwork")
+    # A file evicted between resolving and opening it is fetched or regenerated once more
+    for _ in range(2):
+        try:
+            path, digest, served = ArtworkService(db).resolve(song.artwork_url, size)
+            file = open(path, "rb")
+            break
+        except ArtworkUnavailable as exc:
+            raise HTTPException(status_code=502, detail=str(exc))
+        except FileNotFoundError:
+            continue
+    else:
+        raise HTTPException(status_code=502, detail="Artwork was evicted while being served; retry later")
+    media_type = image_type(file.read(16))
+    version = f"{digest[:32]}-{served}"
+    cache_control = settings.cache_control_artwork_versioned if v == version else settings.cache_control_artwork
+    return file_response(request, file, media_type, f'"{version}"', cache_control)
+
+@router.get("/stats", response_model=LibraryStatsResponse)
+def get_library_stats(db: Session = Depends(get_db), etag: str = Depends(conditional("stats"))):
+    """Get library statistics from the maintained aggregate counters"""
+    stats_service = StatsService(db)
+    return stats_service.get_stats()
 
 @router.post("/songs", response_model=SongResponse, status_code=201)
-async def create_song(song: SongCreate, db: Session = Depends(get_db)):
-    """Create a new song"""
-    song_service = SongService(db)
+def create_song(song: SongCreate, db: Session = Depends(get_db)):
+    """Create a new song
+
+    With GROUP_COMMIT, concurrent creates and updates share one transaction.
+    """
+    if settings.group_commit:
+        return song_writer.create_song(db, song)
+    song_service = CachedSongService(db)
     return song_service.create_song(song)
 
+@router.post("/songs/bulk", response_model=Union[BulkImportResponse, JobResponse])
+async def bulk_import_songs(
+    request: Request,
+    response: Response,
+    format: Optional[Literal["ndjson", "csv"]] = Query(None, description="Body format; defaults from Content-Type (text/csv or NDJSON)"),
+    batch_size: int = Query(1000, ge=1, le=10000, description="Rows inserted per transaction"),
+    max_errors: int = Query(1000, ge=0, le=100000, description="Maximum number of row errors to report"),
+    background: bool = Query(False, description="Stage the body and import it as a job; returns 202 with the job"),
+    db: Session = Depends(get_db)
+):
+    """Import songs from a streamed NDJSON or CSV body
+
+    Rows are validated one by one and inserted in batches; invalid rows are
+    reported and skipped without aborting the rest of the import. With
+    `background`, the report becomes the job's result.
+    """
+    if format is None:
+        format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    if background:
+        path = await stage_upload(request.stream(), settings.job_upload_dir)
+        params = {"path": path, "format": format, "batch_size": batch_size, "max_errors": max_errors}
+        job = await run_in_threadpool(job_runner.submit, db, "import", params)
+        response.status_code = 202
+        return JobResponse.model_validate(job)
+    parse = iter_csv_records if format == "csv" else iter_ndjson_records
+    import_service = ImportService(db)
+    return await import_service.import_records(
+        parse(iter_lines(request.stream())), batch_size=batch_size, max_errors=max_errors
+    )
+
 @router.put("/songs/{song_id}", response_model=SongResponse)
-async def update_song(song_id: int, song_update: SongUpdate, db: Session = Depends(get_db)):
-    """Update an existing song"""
-    song_service = SongService(db)
-    updated_song = song_service.update_song(song_id, song_update)
+def update_song(song_id: int, song_update: SongUpdate, db: Session = Depends(get_db)):
+    """Update an existing song
+
+    With GROUP_COMMIT, concurrent creates and updates share one transaction.
+    """
+    try:
+        if settings.group_commit:
+            updated_song = song_writer.update_song(db, song_id, song_update)
+        else:
+            updated_song = CachedSongService(db).update_song(song_id, song_update)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     if not updated_song:
         raise HTTPException(status_code=404, detail="Song not found")
     return updated_song
 
 @router.delete("/songs/{song_id}", status_code=204)
-async def delete_song(song_id: int, db: Session = Depends(get_db)):
+def delete_song(song_id: int, db: Session = Depends(get_db)):
     """Delete a song"""
-    song_service = SongService(db)
+    song_service = CachedSongService(db)
     if not song_service.delete_song(song_id):
         raise HTTPException(status_code=404, detail="Song not found")
 
-@router.get("/search", response_model=List[SongResponse])
-async def search_songs(
-    q: str = Query(..., min_length=1, description="Search query"),
+@router.get("/search", response_model=Union[List[SearchResult], SearchPage])
+def search_songs(
+    q: str = Query(..., min_length=1, description="Search query; words match as prefixes, \"quoted text\" as a phrase"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of results to return"),
+    offset: int = Query(0, ge=0, description="Number of results to skip"),
+    mode: SearchMode = Query("fulltext", description="fulltext matches words; fuzzy tolerates typos in titles and artists"),
+    filter: SongFilter = Depends(song_filter),
+    facets: bool = Query(False, description=FACETS_DESCRIPTION),
+    facet_artists: int = Query(10, ge=1, le=100, description="Number of top artists in the artist facet"),
+    db: Session = Depends(get_db),
+    etag: str = Depends(conditional("search"))
+):
+    """Search songs, ranked by relevance
+
+    `fulltext` searches title, artist, album, and genre; `fuzzy` finds
+    titles and artists similar to a misspelled query, scored by trigram
+    similarity. Fuzzy search ranks only the best 200 trigram candidates:
+    its pages end there, an offset of 200 or more is rejected with 400, and
+    its facets count those candidates.
+    """
+    song_service = CachedSongService(db)
+    try:
+        results = song_service.search(q, limit=limit, offset=offset, filter=filter, mode=mode)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if facets:
+        facet_counts = song_service.search_facets(q, filter, top_artists=facet_artists, mode=mode)
+        return SearchPage(items=results, facets=facet_counts)
+    return results
+
+@router.get("/suggest", response_model=List[Suggestion])
+def suggest(
+    response: Response,
+    q: str = Query(..., min_length=1, description="What has been typed so far"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of suggestions"),
+    type: Optional[Literal["title", "artist", "album"]] = Query(None, description="Only suggest this kind of term"),
+):
+    """Typeahead suggestions from the in-memory prefix index
+
+    Served in the thread pool: the lookup never touches the database, but
+    an unmemoized one- or two-character prefix scans a large part of the
+    index and must not block the event loop.
+    """
+    started = time.perf_counter()
+    suggestions = suggest_index.suggest(q, limit=limit, type=type)
+    response.headers["Server-Timing"] = f"suggest;dur={(time.perf_counter() - started) * 1000:.3f}"
+    return suggestions
+
+@router.get("/changes", response_model=ChangesResponse)
+def get_changes(
+    since: int = Query(0, ge=0, description="next_since from the previous call; 0 for a full sync"),
+    limit: int = Query(1000, ge=1, le=10000, description="Maximum number of changes to return"),
     db: Session = Depends(get_db)
 ):
-    """Search songs by title, artist, album, or genre"""
-    song_service = SongService(db)
-    songs = song_service.search_songs(q)
-    return songs
+    """Songs created, updated, or deleted since a sync position
+
+    Each changed song appears once, with its current row or as a
+    tombstone. Call again with `next_since` while `has_more` is true. A 410
+    means tombstones the client has not seen were compacted away and it
+    must sync again from 0.
+    """
+    try:
+        changes, next_since, has_more = ChangeService(db).changes(since=since, limit=limit)
+    except ResyncRequired as exc:
+        raise HTTPException(status_code=410, detail=str(exc))
+    return FastJSONResponse({"changes": changes, "next_since": next_since, "has_more": has_more})
 
 @router.get("/artists/{artist}/songs", response_model=List[SongResponse])
-async def get_songs_by_artist(artist: str, db: Session = Depends(get_db)):
-    """Get all songs by a specific artist"""
-    song_service = SongService(db)
-    songs = song_service.get_songs_by_artist(artist)
-    return songs
+def get_songs_by_artist(
+    artist: str,
+    match: MatchMode = Query("contains", description="exact or prefix use the index; contains scans"),
+    skip: int = Query(0, ge=0, description="Number of songs to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of songs to return"),
+    fields: Tuple[str, ...] = Depends(song_fields),
+    db: Session = Depends(get_db)
+):
+    """Get songs by artist, ignoring case and accents"""
+    song_service = CachedSongService(db)
+    rows = song_service.get_song_rows_by_artist(artist, match=match, fields=fields, skip=skip, limit=limit)
+    return FastJSONResponse(rows_to_dicts(fields, rows))
 
 @router.get("/genres/{genre}/songs", response_model=List[SongResponse])
-async def get_songs_by_genre(genre: str, db: Session = Depends(get_db)):
-    """Get all songs by a specific genre"""
-    song_service = SongService(db)
-    songs = song_service.get_songs_by_genre(genre)
-    return songs
-
-@router.get("/stats")
-async def get_library_stats(db: Session = Depends(get_db)):
-    """Get library statistics"""
-    song_service = SongService(db)
-    
-    # Get basic counts
-    total_songs = len(song_service.get_songs())
-    
-    # Get all songs for detailed stats
-    all_songs = song_service.get_songs(limit=10000)  # Get all songs
-    
-    # Calculate statistics
-    total_duration = sum(song.duration for song in all_songs if song.duration)
-    unique_artists = len(set(song.artist for song in all_songs))
-    unique_albums = len(set(song.album for song in all_songs if song.album))
-    unique_genres = len(set(song.genre for song in all_songs if song.genre))
-    
-    # Calculate average year
-    songs_with_year = [song for song in all_songs if song.year]
-    avg_year = sum(song.year for song in songs_with_year) / len(songs_with_year) if songs_with_year else None
-    
-    # Calculate average duration
-    songs_with_duration = [song for song in all_songs if song.duration]
-    avg_duration = sum(song.duration for song in songs_with_duration) / len(songs_with_duration) if songs_with_duration else None
-    
-    return {
-        "total_songs": total_songs,
-        "total_duration": total_duration,
-        "unique_artists": unique_artists,
-        "unique_albums": unique_albums,
-        "unique_genres": unique_genres,
-        "average_year": round(avg_year) if avg_year else None,
-        "average_duration": round(avg_duration) if avg_duration else None,
-        "genres": list(set(song.genre for song in all_songs if song.genre))[:20]  # Top 20 genres
-    }
+def get_songs_by_genre(
+    genre: str,
+    match: MatchMode = Query("contains", description="exact or prefix use the index; contains scans"),
+    skip: int = Query(0, ge=0, description="Number of songs to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of songs to return"),
+    fields: Tuple[str, ...] = Depends(song_fields),
+    db: Session = Depends(get_db)
+):
+    """Get songs by genre, ignoring case and accents"""
+    song_service = CachedSongService(db)
+    rows = song_service.get_song_rows_by_genre(genre, match=match, fields=fields, skip=skip, limit=limit)
+    return FastJSONResponse(rows_to_dicts(fields, rows))
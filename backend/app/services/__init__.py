@@ -1,3 +1,15 @@
 from .song_service import SongService, get_db
+from .search_service import SearchService
+from .facet_service import FacetService
+from .stats_service import StatsService
+from .library_service import LibraryService
+from .change_service import ChangeService
+from .job_service import JobService, job_runner
+from .cache import CachedSongService, song_cache
+from .suggest import PrefixIndex, suggest_index
+from .artwork import ArtworkService, artwork_store
+from .group_commit import GroupCommitWriter, song_writer
 
-__all__ = ["SongService", "get_db"]
+__all__ = ["SongService", "SearchService", "FacetService", "StatsService", "LibraryService", "ChangeService", "CachedSongService", "song_cache",
+           "JobService", "job_runner", "PrefixIndex", "suggest_index", "ArtworkService", "artwork_store",
+           "GroupCommitWriter", "song_writer", "get_db"]
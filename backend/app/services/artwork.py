@@ -0,0 +1,424 @@
+"""
+Local artwork store
+
+Artwork URLs are fetched once; the original bytes are stored under their
+SHA-256 digest along with JPEG (or PNG, for transparent images) thumbnails
+in a few fixed sizes, generated in a thread pool: Pillow releases the GIL
+while decoding, resizing, and encoding. The store is bounded by a byte
+budget and evicts the least recently served files first, using file
+modification times, so every worker process sharing the directory shares
+the recency order. Thumbnails need Pillow; without it, every size is
+served as the original image.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import distinct, func, select, text
+from sqlalchemy.orm import Session
+from typing import TYPE_CHECKING, List, Literal, Optional, Protocol, Tuple, Union
+from urllib.parse import urljoin, urlparse
+import hashlib
+import http.client
+import io
+import ipaddress
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from ..config import settings
+from ..models.artwork import Artwork
+from ..models.song import Song
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency
+    Image = None
+
+if TYPE_CHECKING:
+    from .job_service import JobContext
+
+# Longest edge in pixels of each thumbnail size
+ARTWORK_SIZES = {"small": 128, "medium": 300, "large": 600}
+ArtworkSize = Literal["small", "medium", "large", "original"]
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+# Eviction brings the store down to this fraction of its budget, so it does
+# not run again on the very next write
+EVICTION_TARGET = 0.9
+
+# Files being written are named with this prefix until renamed into place;
+# eviction and the byte count leave them alone
+TEMP_PREFIX = ".tmp-"
+
+# A served file's modification time is refreshed at most this often (seconds)
+TOUCH_INTERVAL = 3600
+
+# Redirects followed per fetch, each to a host checked again
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Locks serializing fetches; a URL always maps to the same one
+URL_LOCK_STRIPES = 64
+
+# A failed fetch is not retried for this long (seconds)
+FAILED_FETCH_RETRY = 3600
+
+
+def image_type(head: bytes) -> Optional[str]:
+    """Media type of an image from its first bytes, or None if it is not one we serve"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return next((media_type for signature, media_type in IMAGE_SIGNATURES if head.startswith(signature)), None)
+
+
+class ArtworkUnavailable(ValueError):
+    """The artwork URL could not be fetched or is not an image"""
+
+
+class ArtworkSource(Protocol):
+    def fetch(self, url: str) -> bytes: ...
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection to an already resolved and checked address"""
+
+    def __init__(self, host: str, address: str, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPSConnection to an already resolved and checked address, verifying the certificate for `host`"""
+
+    def __init__(self, host: str, address: str, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class HttpSource:
+    """Fetches http(s) URLs, refusing hosts on private networks unless allowed
+
+    Redirects are followed by hand, so every hop's host is checked, and each
+    connection goes to the address that was checked: a redirect or a DNS
+    answer changing between the check and the connect cannot reach an
+    internal address.
+    """
+
+    def __init__(self, timeout: float = settings.artwork_fetch_timeout, max_bytes: int = settings.artwork_max_bytes,
+                 allow_private_hosts: bool = settings.artwork_allow_private_hosts):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.allow_private_hosts = allow_private_hosts
+
+    def fetch(self, url: str) -> bytes:
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urlparse(url)
+            if parsed.scheme not in ("http", "https") or not parsed.hostname:
+                raise ArtworkUnavailable("Artwork URL must be http or https")
+            https = parsed.scheme == "https"
+            try:
+                port = parsed.port or (443 if https else 80)
+                connection_class = _PinnedHTTPSConnection if https else _PinnedHTTPConnection
+                connection = connection_class(parsed.hostname, self._address(parsed.hostname, port),
+                                              port=port, timeout=self.timeout)
+                try:
+                    path = parsed.path or "/"
+                    connection.request("GET", f"{path}?{parsed.query}" if parsed.query else path,
+                                       headers={"User-Agent": "music-library-artwork"})
+                    response = connection.getresponse()
+                    if response.status in REDIRECT_STATUSES:
+                        location = response.getheader("Location")
+                        if not location:
+                            raise ArtworkUnavailable("Redirect without a Location")
+                        url = urljoin(url, location)
+                        continue
+                    if response.status != 200:
+                        raise ArtworkUnavailable(f"Fetch failed: HTTP {response.status}")
+                    data = response.read(self.max_bytes + 1)
+                finally:
+                    connection.close()
+            except (OSError, ValueError, http.client.HTTPException) as exc:
+                if isinstance(exc, ArtworkUnavailable):
+                    raise
+                raise ArtworkUnavailable(f"Fetch failed: {exc}") from exc
+            if len(data) > self.max_bytes:
+                raise ArtworkUnavailable(f"Artwork is larger than {self.max_bytes} bytes")
+            return data
+        raise ArtworkUnavailable(f"More than {MAX_REDIRECTS} redirects")
+
+    def _address(self, host: str, port: int) -> str:
+        """The address to connect to for `host`; raises ArtworkUnavailable if any of its addresses is refused"""
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+        if not self.allow_private_hosts:
+            for address in addresses:
+                if not self.allowed(host, ipaddress.ip_address(address.split("%")[0])):
+                    raise ArtworkUnavailable("Artwork host is not a public address")
+        return addresses[0]
+
+    def allowed(self, host: str, ip: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+        return ip.is_global
+
+
+class LocalFileSource:
+    """Reads the path of each artwork URL under `root`, e.g. a mirrored image directory or test fixtures"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def fetch(self, url: str) -> bytes:
+        path = os.path.abspath(os.path.join(self.root, urlparse(url).path.lstrip("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ArtworkUnavailable("Artwork path is outside the source directory")
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except OSError as exc:
+            raise ArtworkUnavailable(f"Fetch failed: {exc}") from exc
+
+
+def make_thumbnail(data: bytes, edge: int) -> bytes:
+    """Image scaled down to fit `edge` x `edge`: PNG if it has transparency, JPEG otherwise"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (edge, edge))  # JPEG: decode at a reduced scale
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((edge, edge))
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+            image.save(output, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(output, "JPEG", quality=85, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+class ArtworkStore:
+    """Content-addressed image files with a byte budget and least recently used eviction"""
+
+    def __init__(self, root: str = settings.artwork_dir, max_bytes: int = settings.artwork_cache_bytes,
+                 source: Optional[ArtworkSource] = None, workers: int = settings.artwork_workers):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.source: ArtworkSource = source or HttpSource()
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._url_locks = [threading.Lock() for _ in range(URL_LOCK_STRIPES)]
+        self._bytes: Optional[int] = None  # counted on first use
+        self.evictions = 0
+
+    def path(self, digest: str, size: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.{size}")
+
+    def _thumbnail_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="artwork")
+            return self._pool
+
+    def url_lock(self, url: str) -> threading.Lock:
+        """Lock serializing fetches of one URL within this process
+
+        Locks are striped, so memory stays fixed however many URLs are seen;
+        fetches of two URLs sharing a stripe merely take turns.
+        """
+        return self._url_locks[hash(url) % len(self._url_locks)]
+
+    def _find(self, digest: str, size: str) -> Optional[str]:
+        path = self.path(digest, size)
+        try:
+            modified = os.stat(path).st_mtime
+            if time.time() - modified > TOUCH_INTERVAL:
+                os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get(self, digest: str, size: str) -> Optional[Tuple[str, str]]:
+        """(path, size served) of a stored image, regenerating an evicted thumbnail from the original"""
+        if size != "original" and Image is not None:
+            path = self._find(digest, size)
+            if path:
+                return path, size
+        original = self._find(digest, "original")
+        if original is None:
+            return None
+        if size == "original" or Image is None:
+            return original, "original"
+        with open(original, "rb") as file:
+            self._write(self.path(digest, size), make_thumbnail(file.read(), ARTWORK_SIZES[size]))
+        self._evict_if_full()
+        return self.path(digest, size), size
+
+    def add(self, data: bytes) -> str:
+        """Store an image and its thumbnails; returns its digest. Raises ArtworkUnavailable if it is not an image"""
+        if image_type(data[:16]) is None:
+            raise ArtworkUnavailable("Artwork is not a JPEG, PNG, GIF, or WebP image")
+        digest = hashlib.sha256(data).hexdigest()
+        self._write(self.path(digest, "original"), data)
+        if Image is not None:
+            try:
+                thumbnails = list(self._thumbnail_pool().map(lambda edge: make_thumbnail(data, edge), ARTWORK_SIZES.values()))
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                os.remove(self.path(digest, "original"))
+                raise ArtworkUnavailable(f"Unreadable image: {exc}") from exc
+            for size, thumbnail in zip(ARTWORK_SIZES, thumbnails):
+                self._write(self.path(digest, size), thumbnail)
+        self._evict_if_full()
+        return digest
+
+    def _write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TEMP_PREFIX)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += len(data) - replaced
+
+    def _files(self) -> List[Tuple[float, int, str]]:
+        """(modified, bytes, path) of every stored file, leaving out files still being written"""
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith(TEMP_PREFIX):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._files())
+            return self._bytes
+
+    def _evict_if_full(self) -> None:
+        if self.total_bytes() > self.max_bytes:
+            self.evict()
+
+    def evict(self, target: Optional[int] = None) -> int:
+        """Delete least recently served files until the store fits `target` bytes; returns how many"""
+        target = int(self.max_bytes * EVICTION_TARGET) if target is None else target
+        files = sorted(self._files())
+        # Recounted from disk, which also picks up other processes' writes
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self._lock:
+            self._bytes = total
+            self.evictions += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "thumbnails": Image is not None,
+        }
+
+
+artwork_store = ArtworkStore()
+
+
+class ArtworkService:
+    def __init__(self, db: Session, store: ArtworkStore = artwork_store):
+        self.db = db
+        self.store = store
+
+    def resolve(self, url: str, size: str = "original") -> Tuple[str, str, str]:
+        """(path, digest, size served) of the artwork at `url`, fetching it if it is not stored
+
+        Raises ArtworkUnavailable when the fetch fails; a failure is
+        remembered and not retried for FAILED_FETCH_RETRY seconds.
+        """
+        found = self._stored(url, size)
+        if found:
+            return found
+        with self.store.url_lock(url):
+            found = self._stored(url, size)  # fetched while we waited
+            if found:
+                return found
+            failure = self.db.scalar(
+                select(Artwork.error).where(
+                    Artwork.url == url, Artwork.digest.is_(None),
+                    Artwork.fetched_at > func.datetime("now", f"-{FAILED_FETCH_RETRY} seconds"),
+                )
+            )
+            if failure:
+                raise ArtworkUnavailable(failure)
+            try:
+                digest = self.store.add(self.store.source.fetch(url))
+            except ArtworkUnavailable as exc:
+                self._record(url, None, str(exc))
+                raise
+            self._record(url, digest, None)
+            found = self.store.get(digest, size)
+            if found is None:
+                raise FileNotFoundError(f"Artwork {digest} was evicted as soon as it was stored")
+            return found[0], digest, found[1]
+
+    def _stored(self, url: str, size: str) -> Optional[Tuple[str, str, str]]:
+        digest = self.db.scalar(select(Artwork.digest).where(Artwork.url == url))
+        self.db.rollback()  # do not hold a read transaction across a fetch
+        if digest:
+            found = self.store.get(digest, size)
+            if found:
+                return found[0], digest, found[1]
+        return None
+
+    def _record(self, url: str, digest: Optional[str], error: Optional[str]) -> None:
+        self.db.execute(
+            text("""
+                INSERT INTO artwork (url, digest, error) VALUES (:url, :digest, :error)
+                ON CONFLICT (url) DO UPDATE SET
+                    digest = excluded.digest, error = excluded.error, fetched_at = CURRENT_TIMESTAMP
+            """),
+            {"url": url, "digest": digest, "error": error},
+        )
+        self.db.commit()
+
+    def prefetch(self, job: Optional["JobContext"] = None) -> dict:
+        """Fetch the artwork of every song whose artwork URL has not been stored yet"""
+        urls = self.db.scalars(
+            select(distinct(Song.artwork_url))
+            .outerjoin(Artwork, Artwork.url == Song.artwork_url)
+            .where(Song.artwork_url.is_not(None), Song.artwork_url != "", Artwork.digest.is_(None))
+        ).all()
+        self.db.rollback()
+        fetched = failed = 0
+        for done, url in enumerate(urls, 1):
+            try:
+                self.resolve(url)
+                fetched += 1
+            except ArtworkUnavailable:
+                failed += 1
+            if job is not None:
+                job.progress(done / len(urls), f"Fetched {done} of {len(urls)} artwork URLs")
+        return {"urls": len(urls), "fetched": fetched, "failed": failed}
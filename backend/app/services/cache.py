@@ -0,0 +1,231 @@
+from collections import OrderedDict
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+from ..config import settings
+from ..models.song import SongResponse
+from ..models.facets import Facets
+from ..models.search import SearchResult
+from ..models.version import LibraryVersion
+from .song_service import MatchMode, NO_FILTER, SONG_FIELDS, SongFilter, SongService
+from .search_service import SearchMode, SearchService
+
+
+def get_library_version(db: Session) -> int:
+    """Current value of the trigger-maintained library change counter"""
+    version = db.query(LibraryVersion.version).filter(LibraryVersion.id == 1).scalar()
+    return version or 0
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count, total items, and age
+
+    A list value weighs one item per element, anything else weighs one, so
+    a handful of `limit=1000` pages cannot crowd out memory unnoticed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.cache_max_entries,
+        max_items: int = settings.cache_max_items,
+        ttl: float = settings.cache_ttl,
+    ):
+        self.max_entries = max_entries
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._items = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _weight(value: Any) -> int:
+        return max(len(value), 1) if isinstance(value, list) else 1
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        weight = self._weight(value)
+        if weight > self.max_items:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, weight, value)
+            self._items += weight
+            while len(self._entries) > self.max_entries or self._items > self.max_items:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches `predicate`"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._items = 0
+
+    def _remove(self, key: Hashable) -> None:
+        self._items -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "items": self._items,
+                "max_entries": self.max_entries,
+                "max_items": self.max_items,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class VersionedCache(LRUCache):
+    """LRU cache whose entries are tagged with the library version they were read at
+
+    Every write bumps the version, so entries read before it are never
+    served again; they are purged the first time a newer version is seen.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def get_or_load(self, db: Session, key: Tuple, loader: Callable[[], Any]) -> Any:
+        # Read the version before the data: if a write lands in between, the
+        # entry holds data newer than its tag, never older.
+        version = get_library_version(db)
+        if version != self.version:
+            self.version = max(self.version, version)
+            self.discard(lambda cached_key: cached_key[0] < self.version)
+
+        versioned_key = (version,) + key
+        value = self.get(versioned_key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(versioned_key, value)
+        return value
+
+    def clear(self) -> None:
+        super().clear()
+        self.version = 0
+
+
+_MISSING = object()
+
+song_cache = VersionedCache()
+
+
+class CachedSongService(SongService):
+    """SongService whose reads are served from `song_cache` while the library is unchanged
+
+    Cached values are detached Pydantic models, never ORM instances, so
+    they can be shared safely between sessions and threads.
+    """
+
+    def __init__(self, db: Session, cache: VersionedCache = song_cache):
+        super().__init__(db)
+        self.cache = cache
+
+    def _songs(self, songs) -> List[SongResponse]:
+        return [SongResponse.model_validate(song) for song in songs]
+
+    def get_song(self, song_id: int) -> Optional[SongResponse]:
+        def load():
+            song = super(CachedSongService, self).get_song(song_id)
+            return SongResponse.model_validate(song) if song else None
+        return self.cache.get_or_load(self.db, ("song", song_id), load)
+
+    def get_songs(self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None,
+                  filter: SongFilter = NO_FILTER) -> List[SongResponse]:
+        return self.cache.get_or_load(
+            self.db, ("songs", skip, limit, after_id, filter),
+            lambda: self._songs(super(CachedSongService, self).get_songs(skip, limit, after_id, filter)),
+        )
+
+    def get_song_rows(self, fields: Sequence[str] = SONG_FIELDS, skip: int = 0, limit: int = 100,
+                      after_id: Optional[int] = None, filter: SongFilter = NO_FILTER) -> List[tuple]:
+        fields = tuple(fields)
+        return self.cache.get_or_load(
+            self.db, ("song_rows", fields, skip, limit, after_id, filter),
+            lambda: super(CachedSongService, self).get_song_rows(fields, skip, limit, after_id, filter),
+        )
+
+    def get_song_rows_by_artist(self, artist: str, match: MatchMode = "contains", fields: Sequence[str] = SONG_FIELDS,
+                                skip: int = 0, limit: int = 100) -> List[tuple]:
+        fields = tuple(fields)
+        return self.cache.get_or_load(
+            self.db, ("artist_rows", artist, match, fields, skip, limit),
+            lambda: super(CachedSongService, self).get_song_rows_by_artist(artist, match, fields, skip, limit),
+        )
+
+    def get_song_rows_by_genre(self, genre: str, match: MatchMode = "contains", fields: Sequence[str] = SONG_FIELDS,
+                               skip: int = 0, limit: int = 100) -> List[tuple]:
+        fields = tuple(fields)
+        return self.cache.get_or_load(
+            self.db, ("genre_rows", genre, match, fields, skip, limit),
+            lambda: super(CachedSongService, self).get_song_rows_by_genre(genre, match, fields, skip, limit),
+        )
+
+    def get_song_facets(self, filter: SongFilter = NO_FILTER, top_artists: int = 10) -> Facets:
+        return self.cache.get_or_load(
+            self.db, ("song_facets", filter, top_artists),
+            lambda: super(CachedSongService, self).get_song_facets(filter, top_artists),
+        )
+
+    def search_songs(self, query: str, skip: int = 0, limit: int = 50) -> List[SongResponse]:
+        return self.cache.get_or_load(
+            self.db, ("search_songs", query, skip, limit),
+            lambda: self._songs(super(CachedSongService, self).search_songs(query, skip, limit)),
+        )
+
+    def search(self, query: str, limit: int = 50, offset: int = 0,
+               filter: SongFilter = NO_FILTER, mode: SearchMode = "fulltext") -> List[SearchResult]:
+        """Ranked search results, as served by /api/search"""
+        def load():
+            search = SearchService(self.db).fuzzy if mode == "fuzzy" else SearchService(self.db).search
+            return search(query, limit=limit, offset=offset, where=filter.clauses())
+        return self.cache.get_or_load(self.db, ("search", query, limit, offset, filter, mode), load)
+
+    def search_facets(self, query: str, filter: SongFilter = NO_FILTER, top_artists: int = 10,
+                      mode: SearchMode = "fulltext") -> Facets:
+        """Facet counts over every match of an /api/search query"""
+        return self.cache.get_or_load(
+            self.db, ("search_facets", query, filter, top_artists, mode),
+            lambda: SearchService(self.db).facets(query, where=filter.clauses(), top_artists=top_artists, mode=mode),
+        )
+
+    def get_songs_by_artist(self, artist: str, match: MatchMode = "contains", skip: int = 0, limit: int = 100) -> List[SongResponse]:
+        return self.cache.get_or_load(
+            self.db, ("artist", artist, match, skip, limit),
+            lambda: self._songs(super(CachedSongService, self).get_songs_by_artist(artist, match, skip, limit)),
+        )
+
+    def get_songs_by_genre(self, genre: str, match: MatchMode = "contains", skip: int = 0, limit: int = 100) -> List[SongResponse]:
+        return self.cache.get_or_load(
+            self.db, ("genre", genre, match, skip, limit),
+            lambda: self._songs(super(CachedSongService, self).get_songs_by_genre(genre, match, skip, limit)),
+        )
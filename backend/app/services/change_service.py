@@ -0,0 +1,86 @@
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from ..config import settings
+from ..models.changes import ChangeLogState, SongChange
+from ..models.song import Song
+from .song_service import SONG_FIELDS
+
+if TYPE_CHECKING:
+    from .job_service import JobContext
+
+
+class ResyncRequired(ValueError):
+    """The client's sync position predates pruned tombstones; it must start over from 0"""
+
+
+class ChangeService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def compacted_through(self) -> int:
+        state = self.db.get(ChangeLogState, 1)
+        return state.compacted_through if state else 0
+
+    def changes(self, since: int = 0, limit: int = 1000) -> Tuple[List[dict], int, bool]:
+        """Changes after sequence number `since`, oldest first
+
+        Returns (changes, next_since, has_more). Each change is a dict with
+        `seq`, `id`, `deleted`, and the current `song` row (None for a
+        tombstone). Reads the log by its primary key, so the cost follows
+        the number of changes, not the library size.
+        """
+        if since and since < self.compacted_through():
+            raise ResyncRequired(f"Changes up to {self.compacted_through()} have been compacted; sync from 0")
+
+        rows = self.db.execute(
+            select(SongChange.seq, SongChange.song_id, SongChange.deleted, *[getattr(Song, field) for field in SONG_FIELDS])
+            .outerjoin(Song, Song.id == SongChange.song_id)
+            .where(SongChange.seq > since)
+            .order_by(SongChange.seq)
+            .limit(limit + 1)
+        ).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changes = [
+            {
+                "seq": seq,
+                "id": song_id,
+                "deleted": deleted,
+                "song": None if deleted else dict(zip(SONG_FIELDS, song)),
+            }
+            for seq, song_id, deleted, *song in rows
+        ]
+        return changes, rows[-1][0] if rows else since, has_more
+
+    def compact(self, retention_days: Optional[float] = None, job: Optional["JobContext"] = None) -> int:
+        """Prune delete tombstones older than the retention period; returns how many were removed
+
+        Clients whose last sync predates a pruned tombstone get
+        `ResyncRequired` and must sync from scratch.
+        """
+        if job is not None:
+            job.progress(0, "Pruning tombstones", force=True)
+        days = settings.changes_tombstone_retention_days if retention_days is None else retention_days
+        cutoff = {"modifier": f"-{days} days"}
+        through = self.db.execute(
+            text("SELECT max(seq) FROM song_changes WHERE deleted AND changed_at < datetime('now', :modifier)"),
+            cutoff,
+        ).scalar()
+        if job is not None:
+            job.check_cancelled()
+        if through is None:
+            return 0
+        pruned = self.db.execute(
+            text("DELETE FROM song_changes WHERE deleted AND seq <= :through"), {"through": through}
+        ).rowcount
+        self.db.execute(text("INSERT OR IGNORE INTO change_log_state (id) VALUES (1)"))
+        self.db.execute(
+            text("UPDATE change_log_state SET compacted_through = max(compacted_through, :through) WHERE id = 1"),
+            {"through": through},
+        )
+        if job is not None:
+            job.check_cancelled()
+        self.db.commit()
+        return pruned
@@ -0,0 +1,83 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Iterator, Optional
+import csv
+import io
+import json
+
+from ..models.song import Song
+from .song_service import key_filter
+
+EXPORT_COLUMNS = (
+    "id", "title", "artist", "album", "genre", "year", "duration",
+    "file_path", "artwork_url", "created_at", "updated_at",
+)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "json": "application/json",
+}
+
+
+def _row_dict(row) -> dict:
+    data = dict(zip(EXPORT_COLUMNS, row))
+    for field in ("created_at", "updated_at"):
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+class ExportService:
+    def __init__(self, db: Session, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+
+    def iter_batches(self, artist: Optional[str] = None, genre: Optional[str] = None, year: Optional[int] = None):
+        """Yield lists of song rows in id order through a server-side cursor
+
+        Artist and genre match ignoring case and accents, like SongFilter.
+        """
+        query = select(*(getattr(Song, column) for column in EXPORT_COLUMNS)).order_by(Song.id)
+        if artist is not None:
+            query = query.where(key_filter(Song.artist_key, artist, "exact"))
+        if genre is not None:
+            query = query.where(key_filter(Song.genre_key, genre, "exact"))
+        if year is not None:
+            query = query.where(Song.year == year)
+
+        result = self.db.execute(query.execution_options(yield_per=self.batch_size))
+        try:
+            yield from result.partitions()
+        finally:
+            result.close()
+
+    def export(self, format: str, **filters) -> Iterator[str]:
+        """Stream the filtered catalog as NDJSON, CSV, or a JSON array
+
+        Memory use is bounded by one batch of rows regardless of library size.
+        The session is closed once the stream is exhausted or abandoned.
+        """
+        try:
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_COLUMNS)
+                for batch in self.iter_batches(**filters):
+                    writer.writerows(_row_dict(row).values() for row in batch)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                if buffer.tell():
+                    yield buffer.getvalue()
+            elif format == "json":
+                separator = "["
+                for batch in self.iter_batches(**filters):
+                    yield separator + ",".join(json.dumps(_row_dict(row)) for row in batch)
+                    separator = ","
+                yield "[]" if separator == "[" else "]"
+            else:
+                for batch in self.iter_batches(**filters):
+                    yield "".join(json.dumps(_row_dict(row)) + "\n" for row in batch)
+        finally:
+            self.db.close()
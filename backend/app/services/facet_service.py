@@ -0,0 +1,71 @@
+from sqlalchemy import Select, case, func, literal, select, union_all
+from sqlalchemy.orm import Session
+from typing import Dict, List
+
+from ..models.facets import DURATION_BUCKETS, FacetCount, Facets
+from ..models.song import Song
+
+# Columns a filtered select must return for `FacetService.facets`
+FACET_COLUMNS = (Song.artist, Song.genre, Song.year, Song.duration)
+
+
+def _duration_bucket(column):
+    return case(
+        *[
+            (column < upper, literal(label))
+            for label, lower, upper in DURATION_BUCKETS if upper is not None
+        ],
+        else_=literal(DURATION_BUCKETS[-1][0]),
+    )
+
+
+class FacetService:
+    """Facet counts over a filtered set of songs, in a single statement
+
+    The filtered set is materialized once as a CTE and every facet is a
+    GROUP BY over it, combined with UNION ALL, so the songs table (or the
+    full-text index) is searched once whatever the number of facets.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def facets(self, filtered: Select, top_artists: int = 10) -> Facets:
+        """Count the songs selected by `filtered` per genre, decade, artist, and duration bucket
+
+        `filtered` must select `FACET_COLUMNS`.
+        """
+        songs = filtered.cte("filtered").prefix_with("MATERIALIZED")
+
+        def grouped(name: str, value, *where):
+            return (
+                select(literal(name).label("facet"), value.label("value"), func.count().label("count"))
+                .select_from(songs)
+                .where(*where)
+                .group_by(value)
+            )
+
+        decade = songs.c.year - songs.c.year % 10
+        artists = (
+            grouped("artist", songs.c.artist)
+            .order_by(func.count().desc(), songs.c.artist)
+            .limit(top_artists)
+            .subquery()
+        )
+        statement = union_all(
+            grouped("genre", songs.c.genre, songs.c.genre.isnot(None), songs.c.genre != ""),
+            grouped("decade", decade, songs.c.year.isnot(None)),
+            select(artists.c.facet, artists.c.value, artists.c["count"]),
+            grouped("duration", _duration_bucket(songs.c.duration), songs.c.duration.isnot(None)),
+        )
+
+        facets: Dict[str, List[FacetCount]] = {}
+        for name, value, count in self.db.execute(statement):
+            facets.setdefault(name, []).append(FacetCount(value=value, count=count))
+        order = {label: position for position, (label, _, _) in enumerate(DURATION_BUCKETS)}
+        return Facets(
+            genre=sorted(facets.get("genre", []), key=lambda facet: (-facet.count, facet.value)),
+            decade=sorted(facets.get("decade", []), key=lambda facet: facet.value),
+            artist=facets.get("artist", []),
+            duration=sorted(facets.get("duration", []), key=lambda facet: order[facet.value]),
+        )
@@ -0,0 +1,158 @@
+from concurrent.futures import Future
+from itertools import groupby
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from typing import Any, List, NamedTuple, Optional
+import logging
+import queue
+import threading
+import time
+
+from ..config import settings
+from ..metrics import db_write_batch_size
+from ..models.song import SongCreate, SongResponse, SongUpdate
+from .song_service import SongService
+from .suggest import suggest_index
+
+logger = logging.getLogger(__name__)
+
+
+class _Write(NamedTuple):
+    engine: Engine
+    kind: str  # "create" or "update"
+    args: tuple
+    future: Future
+
+
+class GroupCommitWriter:
+    """Coalesces concurrent single-song creates and updates into shared transactions
+
+    Callers block while one writer thread drains their writes: after the
+    first it waits up to `window` seconds for more, runs up to `max_batch`
+    in one transaction and commits once, so the batch takes SQLite's write
+    lock once and pays for one journal sync. Every caller gets its own
+    result or exception back. A write failing in the database rolls its
+    batch back, and the batch is retried one transaction per write so the
+    failure does not spread to its neighbours.
+    """
+
+    def __init__(self, window: float = settings.group_commit_window_ms / 1000,
+                 max_batch: int = settings.group_commit_max_batch):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+
+    def create_song(self, db: Session, song: SongCreate) -> SongResponse:
+        """`SongService.create_song`, committed together with concurrent writes to `db`'s database"""
+        return self._submit(db, "create", song)
+
+    def update_song(self, db: Session, song_id: int, song_update: SongUpdate) -> Optional[SongResponse]:
+        """`SongService.update_song`, committed together with concurrent writes to `db`'s database"""
+        return self._submit(db, "update", song_id, song_update)
+
+    def _submit(self, db: Session, kind: str, *args) -> Any:
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+            self._queue.put(_Write(db.get_bind(), kind, args, future))
+        return future.result()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            write = self._queue.get()
+            if write is None:
+                return
+            batch = [write]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    write = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if write is None:
+                    stopping = True  # once this batch is written
+                    break
+                batch.append(write)
+            for _, writes in groupby(batch, key=lambda write: write.engine):
+                self._flush(list(writes))
+
+    def _flush(self, batch: List[_Write]) -> None:
+        db_write_batch_size.observe(len(batch))
+        try:
+            with Session(bind=batch[0].engine) as db:
+                outcomes = self._apply(SongService(db), batch)
+                db.commit()
+        except Exception as exc:
+            if len(batch) > 1:
+                logger.warning("Group commit of %d writes failed (%s); retrying one by one", len(batch), exc)
+                for write in batch:
+                    self._flush([write])
+            else:
+                batch[0].future.set_exception(exc)
+            return
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+        for write, (result, error) in zip(batch, outcomes):
+            if error is not None:
+                write.future.set_exception(error)
+            elif result is None:
+                write.future.set_result(None)
+            else:
+                previous, row = result
+                if previous is not None:
+                    suggest_index.remove(*previous)
+                if write.kind == "create" or previous is not None:
+                    suggest_index.add(row.title, row.artist, row.album)
+                write.future.set_result(SongResponse.model_validate(row))
+
+    @staticmethod
+    def _apply(service: SongService, batch: List[_Write]) -> List[tuple]:
+        """(result, None) per write staged in the transaction, (None, error) for one rejected before any SQL ran
+
+        The batch's creates go in as one multi-row INSERT.
+        """
+        outcomes: List[tuple] = [None] * len(batch)
+        creates = [index for index, write in enumerate(batch) if write.kind == "create"]
+        if creates:
+            rows = service.insert_songs([batch[index].args[0] for index in creates])
+            for index, row in zip(creates, rows):
+                outcomes[index] = (None, row), None
+        for index, write in enumerate(batch):
+            if write.kind == "update":
+                try:
+                    outcomes[index] = service.update_song_row(*write.args), None
+                except ValueError as exc:
+                    outcomes[index] = None, exc
+        return outcomes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.group_commit,
+                "batches": self.batches,
+                "writes": self.writes,
+                "mean_batch": self.writes / self.batches if self.batches else 0.0,
+                "queued": self._queue.qsize(),
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+            }
+
+    def shutdown(self) -> None:
+        """Write what is queued, then stop the writer thread; the next write starts a new one"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+
+song_writer = GroupCommitWriter()
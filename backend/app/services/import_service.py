@@ -0,0 +1,167 @@
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from typing import AsyncIterator, Dict, List, Optional
+import codecs
+import csv
+import json
+import os
+import tempfile
+
+from ..models.song import Song, SongCreate
+from ..models.bulk import BulkImportError, BulkImportResponse
+from .suggest import suggest_index
+
+
+# Bytes buffered before each write when staging an upload to disk
+STAGE_BUFFER = 1024 * 1024
+
+
+async def stage_upload(chunks: AsyncIterator[bytes], directory: Optional[str] = None) -> str:
+    """Write a streamed body to a new temporary file for a background import; returns its path"""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="import-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            buffer = bytearray()
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) >= STAGE_BUFFER:
+                    await run_in_threadpool(file.write, bytes(buffer))
+                    buffer.clear()
+            await run_in_threadpool(file.write, bytes(buffer))
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed UTF-8 body into lines without buffering it whole
+
+    Lines end at "\n" only, with a "\r" before it dropped: str.splitlines()
+    would also split at U+2028, U+0085 and other characters JSON allows raw
+    inside strings.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield (line[:-1] if line.endswith("\r") else line) + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[object]:
+    """Yield one decoded JSON value per non-blank line"""
+    async for line in lines:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                yield exc
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, Optional[str]]]:
+    """Yield one dict per CSV record, keyed by the header row
+
+    Quoted fields may span lines: lines are joined until the quotes balance.
+    Empty cells become None so optional integer columns may be left blank.
+    """
+    header = None
+    record = ""
+    async for line in lines:
+        record += line
+        if record.count('"') % 2:
+            continue
+        if not record.strip():
+            record = ""
+            continue
+        values, record = next(csv.reader([record])), ""
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield {name: (value if value != "" else None) for name, value in zip(header, values)}
+    if record.strip():
+        yield ValueError("Unterminated quoted field")
+
+
+class ImportService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def validate(record) -> SongCreate:
+        """Validate one parsed record; raises ValueError with a readable message"""
+        if isinstance(record, Exception):
+            raise ValueError(f"Malformed row: {record}")
+        if not isinstance(record, dict):
+            raise ValueError("Row must be an object")
+        try:
+            return SongCreate.model_validate(record)
+        except ValidationError as exc:
+            raise ValueError("; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            ))
+
+    def insert_batch(self, songs: List[SongCreate]) -> None:
+        """Insert validated songs in one executemany statement and transaction"""
+        try:
+            self.db.execute(insert(Song), [song.model_dump() for song in songs])
+            self.db.commit()
+        except SQLAlchemyError:
+            self.db.rollback()
+            raise
+        for song in songs:
+            suggest_index.add(song.title, song.artist, song.album)
+
+    async def import_records(
+        self, records: AsyncIterator[object], batch_size: int = 1000, max_errors: int = 1000
+    ) -> BulkImportResponse:
+        """Validate streamed records and insert the valid ones batch by batch
+
+        Invalid rows, and every row of a batch the database rejects, are
+        reported without aborting the rest of the import. Inserts run in the
+        worker thread pool so parsing the stream never blocks on SQLite.
+        """
+        result = BulkImportResponse(inserted=0, failed=0)
+        batch: List[SongCreate] = []
+        batch_rows: List[int] = []
+
+        def fail(row: int, error: str):
+            result.failed += 1
+            if len(result.errors) < max_errors:
+                result.errors.append(BulkImportError(row=row, error=error))
+            else:
+                result.errors_truncated = True
+
+        async def flush():
+            try:
+                await run_in_threadpool(self.insert_batch, batch)
+                result.inserted += len(batch)
+            except SQLAlchemyError as exc:
+                for row in batch_rows:
+                    fail(row, f"Database error: {exc.__class__.__name__}")
+            batch.clear()
+            batch_rows.clear()
+
+        row = 0
+        async for record in records:
+            row += 1
+            try:
+                batch.append(self.validate(record))
+            except ValueError as exc:
+                fail(row, str(exc))
+                continue
+            batch_rows.append(row)
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+        return result
@@ -0,0 +1,346 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from sqlalchemy import case, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import func
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from ..config import settings
+from ..models.jobs import FINISHED_STATUSES, Job
+from .artwork import ArtworkService
+from .change_service import ChangeService
+from .import_service import ImportService, iter_csv_records, iter_lines, iter_ndjson_records
+from .scan_service import ScanService
+from .search_service import SearchService
+from .stats_service import StatsService
+from .suggest import suggest_index
+
+logger = logging.getLogger(__name__)
+
+# Progress is written at most this often (seconds); cancellation is noticed on a write
+PROGRESS_INTERVAL = 0.5
+
+# Bytes read per step of a background import
+IMPORT_CHUNK = 64 * 1024
+
+
+class JobCancelled(Exception):
+    """Raised inside a job by `JobContext.progress` once cancellation was requested"""
+
+
+class JobContext:
+    """Handed to a running job to report progress and notice cancellation
+
+    Progress goes through its own session, so a job must not report while
+    its work session holds an open write transaction: SQLite allows one
+    writer at a time.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], job_id: int):
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self._reported = 0.0
+
+    def progress(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        """Record progress (0 to 1); raises JobCancelled if the job was cancelled"""
+        now = time.monotonic()
+        if not force and now - self._reported < PROGRESS_INTERVAL:
+            return
+        self._reported = now
+        values = {"progress": min(max(fraction, 0.0), 1.0)}
+        if message is not None:
+            values["message"] = message
+        with self.session_factory() as db:
+            db.execute(update(Job).where(Job.id == self.job_id).values(**values))
+            cancelled = db.scalar(select(Job.cancel_requested).where(Job.id == self.job_id))
+            db.commit()
+        if cancelled:
+            raise JobCancelled()
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if the job was cancelled
+
+        Only reads, so unlike `progress` it may be called while the job's
+        work session holds a write transaction, which is then rolled back.
+        """
+        with self.session_factory() as db:
+            if db.scalar(select(Job.cancel_requested).where(Job.id == self.job_id)):
+                raise JobCancelled()
+
+
+# Job implementations: run(db, job, **params) -> JSON-serializable result
+
+def reindex_search(db: Session, job: JobContext) -> Dict[str, Any]:
+    return {"songs": SearchService(db).reindex(job=job)}
+
+
+def rebuild_stats(db: Session, job: JobContext) -> Dict[str, Any]:
+    return StatsService(db).rebuild(job=job).model_dump()
+
+
+def rebuild_suggest(db: Session, job: JobContext) -> Dict[str, Any]:
+    suggest_index.rebuild(db, job=job)
+    return suggest_index.stats()
+
+
+def compact_changes(db: Session, job: JobContext, retention_days: Optional[float] = None) -> Dict[str, Any]:
+    change_service = ChangeService(db)
+    pruned = change_service.compact(retention_days, job=job)
+    return {"pruned": pruned, "compacted_through": change_service.compacted_through()}
+
+
+def scan_library(db: Session, job: JobContext, full: bool = False) -> Dict[str, Any]:
+    if not settings.scan_roots:
+        raise ValueError("No scan roots configured; set SCAN_ROOTS")
+    return ScanService(db).scan(settings.scan_roots, full=full, job=job).model_dump()
+
+
+def cache_artwork(db: Session, job: JobContext) -> Dict[str, Any]:
+    return ArtworkService(db).prefetch(job=job)
+
+
+def import_file(db: Session, job: JobContext, path: str, format: str = "ndjson",
+                batch_size: int = 1000, max_errors: int = 1000) -> Dict[str, Any]:
+    """Import a staged upload; rows of batches committed before a cancellation are kept"""
+    size = os.path.getsize(path) or 1
+
+    async def chunks():
+        with open(path, "rb") as file:
+            while chunk := file.read(IMPORT_CHUNK):
+                job.progress(file.tell() / size, f"Read {file.tell()} of {size} bytes")
+                yield chunk
+
+    parse = iter_csv_records if format == "csv" else iter_ndjson_records
+    try:
+        report = asyncio.run(ImportService(db).import_records(
+            parse(iter_lines(chunks())), batch_size=batch_size, max_errors=max_errors
+        ))
+    finally:
+        os.remove(path)
+    return report.model_dump()
+
+
+class JobSpec(NamedTuple):
+    run: Callable[..., Any]
+    # "process" for CPU-bound work; "thread" for I/O-bound work and for jobs
+    # that update this process's memory, such as the typeahead index
+    pool: Literal["thread", "process"]
+    params: Tuple[str, ...] = ()
+
+
+JOB_KINDS: Dict[str, JobSpec] = {
+    # Tokenizes every song for both search indexes
+    "reindex-search": JobSpec(reindex_search, "process"),
+    "rebuild-stats": JobSpec(rebuild_stats, "thread"),
+    "rebuild-suggest": JobSpec(rebuild_suggest, "thread"),
+    "compact-changes": JobSpec(compact_changes, "thread", ("retention_days",)),
+    # Walks the configured roots; tags are read in the scanner's own process pool
+    "scan-library": JobSpec(scan_library, "thread", ("full",)),
+    "cache-artwork": JobSpec(cache_artwork, "thread"),
+    # Queued by POST /api/songs/bulk?background=true with a staged upload
+    "import": JobSpec(import_file, "thread", ("path", "format", "batch_size", "max_errors")),
+}
+
+
+def _finish(session_factory: Callable[[], Session], job_id: int, status: str, **values) -> None:
+    with session_factory() as db:
+        db.execute(
+            update(Job).where(Job.id == job_id)
+            .values(status=status, finished_at=func.now(), **values)
+        )
+        db.commit()
+
+
+def execute_job(session_factory: Callable[[], Session], job_id: int) -> None:
+    """Run queued job `job_id` to completion, recording its outcome on the row"""
+    with session_factory() as db:
+        # Claiming the row and honouring an early cancel is one statement
+        started = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued", Job.cancel_requested.is_(False))
+            .values(status="running", started_at=func.now())
+        ).rowcount
+        db.commit()
+        if not started:
+            return
+        job = db.get(Job, job_id)
+        kind, params = job.kind, dict(job.params)
+
+    context = JobContext(session_factory, job_id)
+    try:
+        with session_factory() as db:
+            result = JOB_KINDS[kind].run(db, context, **params)
+    except JobCancelled:
+        _finish(session_factory, job_id, "cancelled", message="Cancelled")
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed", job_id, kind)
+        _finish(session_factory, job_id, "failed", error=f"{exc.__class__.__name__}: {exc}")
+    else:
+        _finish(session_factory, job_id, "succeeded", progress=1.0, result=result)
+
+
+def _execute_in_process(database_url: str, job_id: int) -> None:
+    """Process pool entry point: a fresh engine, since connections cannot cross processes"""
+    from ..database import create_db_engine
+
+    engine = create_db_engine(settings.model_copy(update={"database_url": database_url}))
+    try:
+        execute_job(sessionmaker(bind=engine), job_id)
+    finally:
+        engine.dispose()
+
+
+class JobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create(self, kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+        """Insert a queued job; raises ValueError for an unknown kind or parameter"""
+        spec = JOB_KINDS.get(kind)
+        if spec is None:
+            raise ValueError(f"Unknown job kind: {kind}")
+        params = params or {}
+        unknown = sorted(set(params) - set(spec.params))
+        if unknown:
+            raise ValueError(f"Unknown parameters for {kind}: {', '.join(unknown)}")
+        job = Job(kind=kind, params=params, owner_pid=os.getpid())
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        return job
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self.db.get(Job, job_id)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first"""
+        query = select(Job).order_by(Job.id.desc()).limit(limit)
+        if status is not None:
+            query = query.where(Job.status == status)
+        return list(self.db.scalars(query))
+
+    def cancel(self, job_id: int) -> Optional[Job]:
+        """Request cancellation: a queued job never starts, a running one stops at its next progress report"""
+        self.db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status.not_in(FINISHED_STATUSES))
+            .values(
+                cancel_requested=True,
+                status=case((Job.status == "queued", "cancelled"), else_=Job.status),
+                finished_at=case((Job.status == "queued", func.now()), else_=Job.finished_at),
+            )
+        )
+        self.db.commit()
+        job = self.db.get(Job, job_id)
+        if job is not None:
+            self.db.refresh(job)
+        return job
+
+    def fail_interrupted(self) -> int:
+        """Mark unfinished jobs whose owning process is gone as failed; returns how many"""
+        owners = self.db.scalars(
+            select(Job.owner_pid).where(Job.status.not_in(FINISHED_STATUSES)).distinct()
+        ).all()
+        gone = [pid for pid in owners if not _process_alive(pid)]
+        if not gone:
+            return 0
+        failed = self.db.execute(
+            update(Job)
+            .where(Job.status.not_in(FINISHED_STATUSES), Job.owner_pid.in_(gone) | Job.owner_pid.is_(None))
+            .values(status="failed", error="Interrupted by a restart", finished_at=func.now())
+        ).rowcount
+        self.db.commit()
+        return failed
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    # Our own pid belongs to an earlier process when it is reused after a
+    # restart, e.g. pid 1 in a container; we have not queued anything yet.
+    if pid is None or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobRunner:
+    """Runs jobs on pools separate from the request thread pool
+
+    Thread jobs share the API's engine; process jobs open their own engine
+    in a worker started with `spawn`, so no connection or lock is inherited
+    across a fork. Jobs for an in-memory database, or all jobs when
+    `process_workers` is 0, run in threads.
+    """
+
+    def __init__(self, thread_workers: int = settings.job_thread_workers,
+                 process_workers: int = settings.job_process_workers):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="job")
+            return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(self.process_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._processes
+
+    def submit(self, db: Session, kind: str, params: Optional[Dict[str, Any]] = None) -> Job:
+        """Queue a job and hand it to a pool; raises ValueError like `JobService.create`"""
+        job = JobService(db).create(kind, params)
+        self.dispatch(db.get_bind(), job.id, JOB_KINDS[kind].pool)
+        return job
+
+    def dispatch(self, engine: Engine, job_id: int, pool: str = "thread") -> Future:
+        session_factory = sessionmaker(bind=engine)
+        database = engine.url.database
+        if pool == "process" and self.process_workers and database and database != ":memory:":
+            future = self._process_pool().submit(
+                _execute_in_process, engine.url.render_as_string(hide_password=False), job_id
+            )
+        else:
+            future = self._thread_pool().submit(execute_job, session_factory, job_id)
+        with self._lock:
+            self._active += 1
+
+        def done(future: Future) -> None:
+            with self._lock:
+                self._active -= 1
+            # execute_job records its own failures; this catches a dead worker process
+            if not future.cancelled() and future.exception() is not None:
+                _finish(session_factory, job_id, "failed", error=f"Worker failed: {future.exception()!r}")
+
+        future.add_done_callback(done)
+        return future
+
+    def active(self) -> int:
+        """Jobs handed to a pool and not finished yet"""
+        return self._active
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            pools, self._threads, self._processes = [self._threads, self._processes], None, None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+
+
+job_runner = JobRunner()
@@ -0,0 +1,50 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+
+from ..models.library import Artist, Album, Genre, ENTITY_REBUILD
+
+EntityKind = Literal["artist", "album", "genre"]
+EntitySort = Literal["name", "songs", "duration"]
+
+ENTITY_MODELS = {"artist": Artist, "album": Album, "genre": Genre}
+
+
+class LibraryService:
+    """Listings of the artist, album, and genre entities
+
+    Every listing reads only the entity tables; their counts are kept
+    current by triggers, so no query here touches `songs`.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def list(self, kind: EntityKind, sort: EntitySort = "name", skip: int = 0, limit: int = 100,
+             artist_id: Optional[int] = None) -> list:
+        model = ENTITY_MODELS[kind]
+        order_by = {
+            "name": (model.name, model.id),
+            "songs": (model.song_count.desc(), model.name, model.id),
+            "duration": (model.total_duration.desc(), model.name, model.id),
+        }[sort]
+        query = self.db.query(model)
+        if artist_id is not None and kind == "album":
+            query = query.filter(Album.artist_id == artist_id)
+        return query.order_by(*order_by).offset(skip).limit(limit).all()
+
+    def get_artists(self, sort: EntitySort = "name", skip: int = 0, limit: int = 100) -> List[Artist]:
+        return self.list("artist", sort, skip, limit)
+
+    def get_albums(self, sort: EntitySort = "name", skip: int = 0, limit: int = 100,
+                   artist_id: Optional[int] = None) -> List[Album]:
+        return self.list("album", sort, skip, limit, artist_id=artist_id)
+
+    def get_genres(self, sort: EntitySort = "name", skip: int = 0, limit: int = 100) -> List[Genre]:
+        return self.list("genre", sort, skip, limit)
+
+    def rebuild(self) -> None:
+        """Recreate every entity and song reference from the songs' name columns"""
+        for statement in ENTITY_REBUILD:
+            self.db.execute(text(statement))
+        self.db.commit()
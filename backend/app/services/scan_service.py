@@ -0,0 +1,220 @@
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import bindparam, delete, insert, select, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+import multiprocessing
+import os
+
+from ..config import settings
+from ..models.scan import ScanError, ScanReport, ScannedFile
+from ..models.song import SHADOW_KEYS, Song, normalized_keys
+from .song_service import SongService, chunked
+from .suggest import suggest_index
+from .tags import AUDIO_EXTENSIONS, Tags, try_read_tags
+
+if TYPE_CHECKING:
+    from .job_service import JobContext
+
+TAG_FIELDS = ("title", "artist", "album", "genre", "year", "duration")
+
+# Files whose songs are written per transaction
+SCAN_BATCH = 500
+
+# Fewer changed files than this are read without starting a process pool
+INLINE_FILES = 100
+
+# Paths handed to a tag-reading process at a time
+READ_CHUNK = 64
+
+MAX_REPORTED_ERRORS = 100
+
+_UPSERT_SCANNED = text("""
+    INSERT INTO scanned_files (path, root, mtime_ns, size, error)
+    VALUES (:path, :root, :mtime_ns, :size, :error)
+    ON CONFLICT (path) DO UPDATE SET
+        root = excluded.root, mtime_ns = excluded.mtime_ns, size = excluded.size,
+        error = excluded.error, scanned_at = CURRENT_TIMESTAMP
+""")
+
+_UPDATE_TAGS = (
+    update(Song.__table__)
+    .where(Song.__table__.c.id == bindparam("song_id"))
+    .values(
+        **{field: bindparam(field) for field in TAG_FIELDS + tuple(SHADOW_KEYS)},
+        updated_at=func.now(),
+    )
+)
+
+
+class FileStat(NamedTuple):
+    root: str
+    path: str
+    mtime_ns: int
+    size: int
+
+
+def walk_audio_files(root: str, unreadable: List[str]) -> Iterator[FileStat]:
+    """Audio files under `root`, appending directories that could not be listed to `unreadable`"""
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            unreadable.append(directory)
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS and entry.is_file():
+                        stat = entry.stat()
+                        yield FileStat(root, entry.path, stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    unreadable.append(entry.path)
+
+
+class ScanService:
+    """Creates, updates, and deletes songs from the audio files under scan roots
+
+    A walk lists every audio file and compares its size and modification
+    time with `scanned_files`; only new and changed files have their tags
+    read, in a process pool. Songs are upserted by `file_path` in batches,
+    one transaction each, and only rewritten when a tag changed. Songs whose
+    file is gone are deleted, unless their root or directory could not be
+    read, so an unmounted drive never empties the library.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def scan(self, roots: Sequence[str], full: bool = False, workers: Optional[int] = None,
+             job: Optional["JobContext"] = None) -> ScanReport:
+        """Scan `roots`; `full` rereads every file, `workers=0` reads tags in this process"""
+        roots = list(dict.fromkeys(os.path.abspath(root) for root in roots))
+        report = ScanReport(roots=roots)
+        changed: List[FileStat] = []
+        for root in roots:
+            if not os.path.isdir(root):
+                self._error(report, root, "Not a readable directory; nothing removed")
+                continue
+            changed.extend(self._walk(root, full, report, job))
+
+        if workers is None:
+            workers = settings.scan_workers or os.cpu_count() or 1
+        batch: List[Tuple[FileStat, Optional[Tags], Optional[str]]] = []
+        for done, (stat, (tags, error)) in enumerate(self._read(changed, workers), 1):
+            batch.append((stat, tags, error))
+            if len(batch) >= SCAN_BATCH:
+                self._apply(batch, report)
+                batch = []
+                if job is not None:
+                    job.progress(done / len(changed), f"Read {done} of {len(changed)} changed files")
+        if batch:
+            self._apply(batch, report)
+        return report
+
+    def _walk(self, root: str, full: bool, report: ScanReport, job: Optional["JobContext"]) -> List[FileStat]:
+        """Changed files under `root`; deletes the songs of files that are gone"""
+        known: Dict[str, Tuple[int, int]] = {
+            path: (mtime_ns, size)
+            for path, mtime_ns, size in self.db.execute(
+                select(ScannedFile.path, ScannedFile.mtime_ns, ScannedFile.size).where(ScannedFile.root == root)
+            )
+        }
+        self.db.rollback()  # end the read transaction before the long walk
+
+        changed, seen, unreadable = [], set(), []
+        for stat in walk_audio_files(root, unreadable):
+            report.files += 1
+            seen.add(stat.path)
+            if not full and known.get(stat.path) == (stat.mtime_ns, stat.size):
+                report.unchanged += 1
+            else:
+                changed.append(stat)
+            if job is not None and report.files % 1000 == 0:
+                job.progress(0, f"Found {report.files} audio files")
+
+        for directory in unreadable:
+            self._error(report, directory, "Could not be read; its files were kept")
+        kept = set(unreadable)
+        skipped = tuple(directory + os.sep for directory in unreadable)
+        gone = [path for path in known if path not in seen and path not in kept and not path.startswith(skipped)]
+        report.removed += self._remove(gone)
+        return changed
+
+    def _read(self, files: List[FileStat], workers: int) -> Iterator[Tuple[FileStat, Tuple[Optional[Tags], Optional[str]]]]:
+        paths = [stat.path for stat in files]
+        if workers <= 1 or len(paths) < INLINE_FILES:
+            yield from zip(files, map(try_read_tags, paths))
+            return
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            yield from zip(files, pool.map(try_read_tags, paths, chunksize=READ_CHUNK))
+        finally:
+            # Also reached when the consumer stops early, e.g. a cancelled job
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _apply(self, batch: List[Tuple[FileStat, Optional[Tags], Optional[str]]], report: ScanReport) -> None:
+        """Upsert one batch of files' songs by file_path, in one transaction"""
+        existing = {}
+        for chunk in chunked([stat.path for stat, _, _ in batch]):
+            for row in self.db.execute(
+                select(Song.id, Song.file_path, *[getattr(Song, field) for field in TAG_FIELDS])
+                .where(Song.file_path.in_(chunk))
+            ):
+                existing.setdefault(row.file_path, row)
+
+        inserts, updates, previous = [], [], []
+        for stat, tags, error in batch:
+            if tags is None:
+                report.failed += 1
+                self._error(report, stat.path, error)
+                continue
+            song = existing.get(stat.path)
+            if song is None:
+                inserts.append({**tags, "file_path": stat.path})
+            elif any(getattr(song, field) != tags[field] for field in TAG_FIELDS):
+                updates.append({"song_id": song.id, **tags, **normalized_keys(tags)})
+                previous.append((song.title, song.artist, song.album))
+        files = [
+            {"path": stat.path, "root": stat.root, "mtime_ns": stat.mtime_ns, "size": stat.size, "error": error}
+            for stat, _, error in batch
+        ]
+        try:
+            if inserts:
+                self.db.execute(insert(Song), inserts)
+            if updates:
+                self.db.execute(_UPDATE_TAGS, updates)
+            self.db.execute(_UPSERT_SCANNED, files)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        report.added += len(inserts)
+        report.updated += len(updates)
+
+        for terms in previous:
+            suggest_index.remove(*terms)
+        for tags in inserts + updates:
+            suggest_index.add(tags["title"], tags["artist"], tags["album"])
+
+    def _remove(self, paths: List[str]) -> int:
+        """Forget files that are gone and delete their songs; returns the number of songs deleted"""
+        if not paths:
+            return 0
+        ids: Set[int] = set()
+        for chunk in chunked(paths):
+            ids.update(self.db.scalars(select(Song.id).where(Song.file_path.in_(chunk))))
+            self.db.execute(delete(ScannedFile).where(ScannedFile.path.in_(chunk)))
+        # delete_songs commits the forgotten files with the deletes
+        return len(SongService(self.db).delete_songs(sorted(ids)))
+
+    @staticmethod
+    def _error(report: ScanReport, path: str, error: str) -> None:
+        if len(report.errors) < MAX_REPORTED_ERRORS:
+            report.errors.append(ScanError(path=path, error=error))
+        else:
+            report.errors_truncated = True
@@ -0,0 +1,185 @@
+from sqlalchemy import column, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from typing import TYPE_CHECKING, FrozenSet, List, Literal, Optional, Sequence, Tuple
+import re
+
+from ..models.facets import Facets
+from ..models.song import Song, SongResponse, normalize_key
+from ..models.search import FUZZY_TABLE, SEARCH_INDEXES, SEARCH_TABLE, SEARCH_WEIGHTS, SearchResult
+from .facet_service import FACET_COLUMNS, FacetService
+
+if TYPE_CHECKING:
+    from .job_service import JobContext
+
+_PHRASE = re.compile(r'"([^"]*)"')
+_WORD = re.compile(r"\w", re.UNICODE)
+
+SearchMode = Literal["fulltext", "fuzzy"]
+
+search_index = table(SEARCH_TABLE, column("rowid"))
+fuzzy_index = table(FUZZY_TABLE, column("rowid"))
+
+# Fuzzy search ranks at most this many trigram candidates, and keeps those
+# at least this similar to the query (the pg_trgm default threshold). Its
+# pages and facets cover only these candidates.
+FUZZY_CANDIDATES = 200
+FUZZY_THRESHOLD = 0.3
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Translate user input into a safe FTS5 MATCH expression.
+
+    Double-quoted parts become phrase queries, every other word becomes a
+    prefix query, and all parts must match. Returns None when the input has
+    nothing searchable in it.
+    """
+    terms = []
+    for phrase in _PHRASE.findall(query):
+        if _WORD.search(phrase):
+            terms.append('"%s"' % phrase.strip())
+    for word in _PHRASE.sub(" ", query).split():
+        if _WORD.search(word):
+            terms.append('"%s"*' % word.replace('"', ""))
+    return " ".join(terms) or None
+
+
+def trigrams(value: str) -> FrozenSet[str]:
+    """pg_trgm-style trigrams: per word, padded with two spaces in front and one behind"""
+    grams = set()
+    for word in normalize_key(value or "").split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def trigram_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Share of distinct trigrams the two sets have in common"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def build_fuzzy_query(query: str) -> Optional[str]:
+    """FTS5 MATCH expression matching rows sharing any trigram with `query`"""
+    grams = {
+        gram for word in normalize_key(query).split()
+        for gram in (word[i:i + 3] for i in range(len(word) - 2))
+    }
+    return " OR ".join('"%s"' % gram.replace('"', '""') for gram in sorted(grams)) or None
+
+
+class SearchService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def hits(self, query: str, limit: int = 50, offset: int = 0,
+             where: Sequence = ()) -> List[Tuple[Song, float, Optional[str]]]:
+        """Return (song, score, snippet) tuples, best BM25 match first
+
+        `where` holds extra clauses on `Song` narrowing the matches.
+        """
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        weights = ", ".join(str(weight) for weight in SEARCH_WEIGHTS)
+        score = literal_column(f"bm25({SEARCH_TABLE}, {weights})").label("score")
+        snippet = literal_column(
+            f"snippet({SEARCH_TABLE}, -1, '<mark>', '</mark>', '…', 12)"
+        ).label("snippet")
+        return (
+            self.db.query(Song, score, snippet)
+            .join(search_index, search_index.c.rowid == Song.id)
+            .filter(text(f"{SEARCH_TABLE} MATCH :match"), *where)
+            .params(match=match)
+            .order_by(score)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+    def search(self, query: str, limit: int = 50, offset: int = 0, where: Sequence = ()) -> List[SearchResult]:
+        """Search songs by title, artist, album, or genre"""
+        return [
+            SearchResult(
+                **SongResponse.model_validate(song).model_dump(),
+                score=-score,
+                snippet=snippet,
+            )
+            for song, score, snippet in self.hits(query, limit=limit, offset=offset, where=where)
+        ]
+
+    def fuzzy_hits(self, query: str, limit: int = 50, offset: int = 0,
+                   where: Sequence = ()) -> List[Tuple[Song, float]]:
+        """Return (song, similarity) pairs for songs whose title or artist resembles `query`
+
+        The trigram index yields the songs sharing the most (and rarest)
+        trigrams with the query; only those candidates are scored, so the
+        cost follows the candidate count rather than the library size.
+        Raises ValueError for an offset past the FUZZY_CANDIDATES window.
+        """
+        if offset >= FUZZY_CANDIDATES:
+            raise ValueError(f"Fuzzy search returns at most {FUZZY_CANDIDATES} results; offset must be below that")
+        match = build_fuzzy_query(query)
+        if match is None:
+            return []
+
+        candidates = (
+            self.db.query(Song)
+            .join(fuzzy_index, fuzzy_index.c.rowid == Song.id)
+            .filter(text(f"{FUZZY_TABLE} MATCH :match"), *where)
+            .params(match=match)
+            .order_by(literal_column(f"bm25({FUZZY_TABLE})"))
+            .limit(FUZZY_CANDIDATES)
+            .all()
+        )
+        wanted = trigrams(query)
+        scored = []
+        for song in candidates:
+            similarity = max(
+                trigram_similarity(wanted, trigrams(song.title)),
+                trigram_similarity(wanted, trigrams(song.artist)),
+            )
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((song, similarity))
+        scored.sort(key=lambda hit: (-hit[1], hit[0].id))
+        return scored[offset:offset + limit]
+
+    def fuzzy(self, query: str, limit: int = 50, offset: int = 0, where: Sequence = ()) -> List[SearchResult]:
+        """Typo-tolerant search by title or artist, most similar first"""
+        return [
+            SearchResult(**SongResponse.model_validate(song).model_dump(), score=round(similarity, 4))
+            for song, similarity in self.fuzzy_hits(query, limit=limit, offset=offset, where=where)
+        ]
+
+    def facets(self, query: str, where: Sequence = (), top_artists: int = 10,
+               mode: SearchMode = "fulltext") -> Facets:
+        """Facet counts over every match of `query`, not just one page"""
+        if mode == "fuzzy":
+            ids = [song.id for song, _ in self.fuzzy_hits(query, limit=FUZZY_CANDIDATES, where=where)]
+            filtered = select(*FACET_COLUMNS).where(Song.id.in_(ids))
+            return FacetService(self.db).facets(filtered, top_artists=top_artists)
+
+        match = build_match_query(query)
+        if match is None:
+            return Facets()
+        filtered = (
+            select(*FACET_COLUMNS)
+            .join(search_index, search_index.c.rowid == Song.id)
+            .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=match), *where)
+        )
+        return FacetService(self.db).facets(filtered, top_artists=top_artists)
+
+    def reindex(self, job: Optional["JobContext"] = None) -> int:
+        """Rebuild the full-text and trigram indexes from the songs table
+
+        Each step commits on its own, so a cancelled job leaves every index
+        either rebuilt or as it was.
+        """
+        steps = [(index, command) for index in SEARCH_INDEXES for command in ("rebuild", "optimize")]
+        for done, (index, command) in enumerate(steps):
+            if job is not None:
+                job.progress(done / len(steps), f"{command.capitalize()} {index}", force=True)
+            self.db.execute(text(f"INSERT INTO {index}({index}) VALUES ('{command}')"))
+            self.db.commit()
+        return self.db.query(Song).count()
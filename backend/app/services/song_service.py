@@ -1,31 +1,138 @@
-from sqlalchemy import create_engine, or_
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from typing import List, Optional
-import os
-
-from ..models.song import Song, SongCreate, SongUpdate
-
-# Database configuration
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_db():
-    """Dependency to get database session"""
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, make_transient_to_detached
+from typing import List, Literal, NamedTuple, Optional, Sequence, Tuple
+
+from ..database import DATABASE_URL, SessionLocal, engine, get_db  # re-exported for existing imports
+from ..models.song import ENTITY_REFERENCES, Song, SongCreate, SongResponse, SongUpdate, normalize_key, normalized_keys
+from ..models.facets import Facets
+from .facet_service import FACET_COLUMNS, FacetService
+from .search_service import SearchService
+from .suggest import suggest_index
+
+MatchMode = Literal["exact", "prefix", "contains"]
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """Least string above every string starting with `prefix`, in code point
+    (and UTF-8 byte) order; None when there is none
+
+    Trailing U+10FFFF cannot be incremented and are dropped, and the
+    successor of U+D7FF skips the surrogates, which cannot be encoded.
+    """
+    stripped = prefix.rstrip("\U0010FFFF")
+    if not stripped:
+        return None
+    last = ord(stripped[-1]) + 1
+    if 0xD800 <= last <= 0xDFFF:
+        last = 0xE000
+    return stripped[:-1] + chr(last)
+
+def key_filter(column, value: str, match: MatchMode):
+    """Case- and accent-insensitive filter on a normalized shadow key column
+
+    `exact` and `prefix` are index seeks (prefix as a key range); `contains`
+    still scans but no longer misses accented or differently cased names.
+    """
+    key = normalize_key(value)
+    if match == "exact":
+        return column == key
+    if match == "prefix":
+        if not key:
+            return column.isnot(None)
+        end = prefix_end(key)
+        return column >= key if end is None else and_(column >= key, column < end)
+    return column.contains(key, autoescape=True)
+
+class SongFilter(NamedTuple):
+    """Narrowing of the catalog by exact (case- and accent-insensitive) artist or
+    genre and by decade; hashable so it can be part of a cache key"""
+    artist: Optional[str] = None
+    genre: Optional[str] = None
+    decade: Optional[int] = None
+
+    def clauses(self) -> list:
+        clauses = []
+        if self.artist is not None:
+            clauses.append(key_filter(Song.artist_key, self.artist, "exact"))
+        if self.genre is not None:
+            clauses.append(key_filter(Song.genre_key, self.genre, "exact"))
+        if self.decade is not None:
+            clauses.append(Song.year.between(self.decade, self.decade + 9))
+        return clauses
+
+NO_FILTER = SongFilter()
+
+# Fields a song response can carry, in response order
+SONG_FIELDS: Tuple[str, ...] = tuple(SongResponse.model_fields)
+
+# Columns feeding the typeahead index
+SUGGEST_COLUMNS = (Song.title, Song.artist, Song.album)
+
+# Columns a single-song write reads back with RETURNING instead of a refresh.
+# The entity references are set by AFTER triggers, which RETURNING does not
+# see, so they are left to load on first access.
+RETURNED_COLUMNS = tuple(column for column in Song.__table__.c if column.key not in ENTITY_REFERENCES)
+
+# Built once: compiling an INSERT per call costs more than running it. Many
+# songs go in as one multi-row INSERT, their rows returned in input order.
+INSERT_SONGS = insert(Song.__table__).returning(*RETURNED_COLUMNS, sort_by_parameter_order=True)
+
+# Ids per IN (...) list, under SQLite's smallest bound-parameter limit
+ID_CHUNK = 900
+
+def chunked(ids: Sequence[int], size: int = ID_CHUNK):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
 
 class SongService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_songs(self, skip: int = 0, limit: int = 100) -> List[Song]:
-        """Get all songs with pagination"""
-        return self.db.query(Song).offset(skip).limit(limit).all()
+    def get_songs(self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None,
+                  filter: SongFilter = NO_FILTER) -> List[Song]:
+        """Get songs in id order, by offset or after a keyset position"""
+        query = self.db.query(Song).filter(*filter.clauses()).order_by(Song.id)
+        if after_id is not None:
+            query = query.filter(Song.id > after_id)
+        else:
+            query = query.offset(skip)
+        return query.limit(limit).all()
+    
+    def get_song_rows(self, fields: Sequence[str] = SONG_FIELDS, skip: int = 0, limit: int = 100,
+                      after_id: Optional[int] = None, filter: SongFilter = NO_FILTER) -> List[tuple]:
+        """`get_songs` as plain tuples of `fields`, selecting only those columns"""
+        return self._rows(fields, filter.clauses(), skip, limit, after_id)
+    
+    def get_song_rows_by_artist(self, artist: str, match: MatchMode = "contains", fields: Sequence[str] = SONG_FIELDS,
+                                skip: int = 0, limit: int = 100) -> List[tuple]:
+        """`get_songs_by_artist` as plain tuples of `fields`"""
+        return self._rows(fields, [key_filter(Song.artist_key, artist, match)], skip, limit)
+    
+    def get_song_rows_by_genre(self, genre: str, match: MatchMode = "contains", fields: Sequence[str] = SONG_FIELDS,
+                               skip: int = 0, limit: int = 100) -> List[tuple]:
+        """`get_songs_by_genre` as plain tuples of `fields`"""
+        return self._rows(fields, [key_filter(Song.genre_key, genre, match)], skip, limit)
+    
+    def _rows(self, fields: Sequence[str], where: list, skip: int, limit: int,
+              after_id: Optional[int] = None) -> List[tuple]:
+        query = select(*[getattr(Song, field) for field in fields]).where(*where).order_by(Song.id)
+        if after_id is not None:
+            query = query.where(Song.id > after_id)
+        else:
+            query = query.offset(skip)
+        return [tuple(row) for row in self.db.execute(query.limit(limit))]
+    
+    def get_song_rows_by_ids(self, ids: Sequence[int], fields: Sequence[str] = SONG_FIELDS) -> List[tuple]:
+        """Songs with the given ids as plain tuples of `fields`, in id order; missing ids are skipped"""
+        rows = []
+        for chunk in chunked(sorted(set(ids))):
+            rows.extend(self._rows(fields, [Song.id.in_(chunk)], 0, len(chunk)))
+        return rows
+    
+    def get_song_facets(self, filter: SongFilter = NO_FILTER, top_artists: int = 10) -> Facets:
+        """Facet counts over every song `get_songs` would page through"""
+        filtered = select(*FACET_COLUMNS).where(*filter.clauses())
+        return FacetService(self.db).facets(filtered, top_artists=top_artists)
     
     def get_song(self, song_id: int) -> Optional[Song]:
         """Get a song by ID"""
@@ -33,47 +140,145 @@ class SongService:
     
     def create_song(self, song: SongCreate) -> Song:
         """Create a new song"""
-        db_song = Song(**song.model_dump())
-        self.db.add(db_song)
+        row = self.insert_song(song)
         self.db.commit()
-        self.db.refresh(db_song)
-        return db_song
+        suggest_index.add(row.title, row.artist, row.album)
+        return self._returned_song(row)
     
     def update_song(self, song_id: int, song_update: SongUpdate) -> Optional[Song]:
-        """Update an existing song"""
-        db_song = self.get_song(song_id)
-        if db_song:
-            update_data = song_update.model_dump(exclude_unset=True)
-            for field, value in update_data.items():
-                setattr(db_song, field, value)
-            self.db.commit()
-            self.db.refresh(db_song)
-        return db_song
+        """Update an existing song; raises ValueError when title or artist is set to null"""
+        updated = self.update_song_row(song_id, song_update)
+        if updated is None:
+            return None
+        previous, row = updated
+        self.db.commit()
+        if previous is not None:
+            suggest_index.remove(*previous)
+            suggest_index.add(row.title, row.artist, row.album)
+        return self._returned_song(row)
+    
+    def insert_song(self, song: SongCreate) -> Row:
+        """INSERT one song without committing; returns its RETURNED_COLUMNS row"""
+        return self.insert_songs([song])[0]
+    
+    def insert_songs(self, songs: Sequence[SongCreate]) -> List[Row]:
+        """INSERT songs without committing; returns their RETURNED_COLUMNS rows in order"""
+        return self.db.execute(INSERT_SONGS, [song.model_dump() for song in songs]).all()
+    
+    def update_song_row(self, song_id: int, song_update: SongUpdate) -> Optional[Tuple[Optional[tuple], Row]]:
+        """UPDATE one song without committing
+
+        Returns None for a missing song, else the song's previous typeahead
+        terms (None when they did not change) and its RETURNED_COLUMNS row.
+        """
+        values = song_update.model_dump(exclude_unset=True)
+        for field in ("title", "artist"):
+            if field in values and values[field] is None:
+                raise ValueError(f"{field} cannot be null")
+        if not values:
+            row = self.db.execute(select(*RETURNED_COLUMNS).where(Song.id == song_id)).first()
+            return None if row is None else (None, row)
+        previous = None
+        if any(column.key in values for column in SUGGEST_COLUMNS):
+            previous = self.db.execute(select(*SUGGEST_COLUMNS).where(Song.id == song_id)).first()
+            if previous is None:
+                return None
+            previous = tuple(previous)
+        values.update(normalized_keys(values))
+        row = self.db.execute(
+            update(Song).where(Song.id == song_id).values(**values).returning(*RETURNED_COLUMNS),
+            execution_options={"synchronize_session": False},
+        ).first()
+        return None if row is None else (previous, row)
+    
+    def _returned_song(self, row: Row) -> Song:
+        """The session's Song for a committed RETURNING row, loaded without another SELECT"""
+        song = Song(**row._mapping)
+        make_transient_to_detached(song)
+        return self.db.merge(song, load=False)
     
     def delete_song(self, song_id: int) -> bool:
         """Delete a song"""
-        db_song = self.get_song(song_id)
+        db_song = self.db.get(Song, song_id)
         if db_song:
+            terms = (db_song.title, db_song.artist, db_song.album)
             self.db.delete(db_song)
             self.db.commit()
+            suggest_index.remove(*terms)
             return True
         return False
     
-    def search_songs(self, query: str) -> List[Song]:
-        """Search songs by title, artist, album, or genre"""
-        return self.db.query(Song).filter(
-            or_(
-                Song.title.contains(query),
-                Song.artist.contains(query),
-                Song.album.contains(query),
-                Song.genre.contains(query)
-            )
-        ).all()
-    
-    def get_songs_by_artist(self, artist: str) -> List[Song]:
-        """Get all songs by a specific artist"""
-        return self.db.query(Song).filter(Song.artist.ilike(f"%{artist}%")).all()
-    
-    def get_songs_by_genre(self, genre: str) -> List[Song]:
-        """Get all songs by a specific genre"""
-        return self.db.query(Song).filter(Song.genre.ilike(f"%{genre}%")).all()
+    def update_songs(self, ids: Sequence[int], song_update: SongUpdate) -> List[int]:
+        """Apply the same changes to every listed song in one transaction; returns the updated ids
+
+        Each chunk of ids is one set-based UPDATE ... WHERE id IN (...).
+        """
+        values = song_update.model_dump(exclude_unset=True)
+        for field in ("title", "artist"):
+            if field in values and values[field] is None:
+                raise ValueError(f"{field} cannot be null")
+        values.update(normalized_keys(values))
+        values["updated_at"] = func.now()
+        reindex = any(column.key in values for column in SUGGEST_COLUMNS)
+
+        previous, current = [], []
+        try:
+            for chunk in chunked(sorted(set(ids))):
+                if reindex:
+                    previous.extend(self.db.execute(select(*SUGGEST_COLUMNS).where(Song.id.in_(chunk))).all())
+                result = self.db.execute(
+                    update(Song).where(Song.id.in_(chunk)).values(**values).returning(Song.id, *SUGGEST_COLUMNS),
+                    execution_options={"synchronize_session": False},
+                )
+                current.extend(result.all())
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.expire_all()
+        if reindex:
+            for terms in previous:
+                suggest_index.remove(*terms)
+            for _, *terms in current:
+                suggest_index.add(*terms)
+        return [row[0] for row in current]
+    
+    def delete_songs(self, ids: Sequence[int]) -> List[int]:
+        """Delete every listed song in one transaction; returns the deleted ids"""
+        deleted = []
+        try:
+            for chunk in chunked(sorted(set(ids))):
+                result = self.db.execute(
+                    delete(Song).where(Song.id.in_(chunk)).returning(Song.id, *SUGGEST_COLUMNS),
+                    execution_options={"synchronize_session": False},
+                )
+                deleted.extend(result.all())
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.expire_all()
+        for _, title, artist, album in deleted:
+            suggest_index.remove(title, artist, album)
+        return [row[0] for row in deleted]
+    
+    def search_songs(self, query: str, skip: int = 0, limit: int = 50) -> List[Song]:
+        """Search songs by title, artist, album, or genre, best match first"""
+        hits = SearchService(self.db).hits(query, limit=limit, offset=skip)
+        return [song for song, _, _ in hits]
+    
+    def get_songs_by_artist(self, artist: str, match: MatchMode = "contains", skip: int = 0, limit: int = 100) -> List[Song]:
+        """Get songs by artist name, in id order"""
+        return (
+            self.db.query(Song)
+            .filter(key_filter(Song.artist_key, artist, match))
+            .order_by(Song.id).offset(skip).limit(limit).all()
+        )
+    
+    def get_songs_by_genre(self, genre: str, match: MatchMode = "contains", skip: int = 0, limit: int = 100) -> List[Song]:
+        """Get songs by genre name, in id order"""
+        return (
+            self.db.query(Song)
+            .filter(key_filter(Song.genre_key, genre, match))
+            .order_by(Song.id).offset(skip).limit(limit).all()
+        )
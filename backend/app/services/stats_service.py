@@ -0,0 +1,66 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import TYPE_CHECKING, List, Optional
+
+from ..models.library import ENTITY_REBUILD
+from ..models.song import Song
+from ..models.stats import (
+    LibraryStats, STATS_REBUILD,
+    LibraryStatsResponse, StatCountResponse, RecentSong,
+)
+from .library_service import LibraryService, EntityKind
+
+if TYPE_CHECKING:
+    from .job_service import JobContext
+
+
+class StatsService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def top(self, kind: EntityKind, limit: int = 1) -> List[StatCountResponse]:
+        """Most common artists, albums, or genres by song count"""
+        entities = LibraryService(self.db).list(kind, sort="songs", limit=limit)
+        return [StatCountResponse(name=entity.name, count=entity.song_count) for entity in entities]
+
+    def get_stats(self) -> LibraryStatsResponse:
+        """Read the maintained aggregates; cost does not depend on library size"""
+        totals = self.db.get(LibraryStats, 1) or LibraryStats(
+            song_count=0, artist_count=0, album_count=0, genre_count=0,
+            total_duration=0, duration_count=0, year_total=0, year_count=0,
+        )
+        top_artist = self.top("artist")
+        top_genres = self.top("genre", limit=20)
+        recent = self.db.query(Song.id, Song.title, Song.artist).order_by(Song.id.desc()).limit(5).all()
+
+        return LibraryStatsResponse(
+            total_songs=totals.song_count,
+            total_artists=totals.artist_count,
+            total_albums=totals.album_count,
+            total_genres=totals.genre_count,
+            total_duration=totals.total_duration,
+            average_song_duration=totals.total_duration // totals.song_count if totals.song_count else 0,
+            average_year=round(totals.year_total / totals.year_count) if totals.year_count else None,
+            top_artist=top_artist[0] if top_artist else None,
+            top_genre=top_genres[0] if top_genres else None,
+            top_genres=top_genres,
+            recent_additions=[RecentSong(id=id, title=title, artist=artist) for id, title, artist in recent],
+        )
+
+    def rebuild(self, job: Optional["JobContext"] = None) -> LibraryStatsResponse:
+        """Recompute the entities and every aggregate from the songs table
+
+        The entities and the aggregates are each rebuilt in one transaction;
+        a cancelled job rolls back the one in progress.
+        """
+        phases = [("entities", ENTITY_REBUILD), ("library statistics", STATS_REBUILD)]
+        for done, (name, statements) in enumerate(phases):
+            if job is not None:
+                job.progress(done / len(phases), f"Rebuilding {name}", force=True)
+            self.db.execute(text("INSERT OR IGNORE INTO library_stats (id) VALUES (1)"))
+            for statement in statements:
+                if job is not None:
+                    job.check_cancelled()
+                self.db.execute(text(statement))
+            self.db.commit()
+        return self.get_stats()
@@ -0,0 +1,203 @@
+from bisect import bisect_left, insort
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+import heapq
+import sys
+import threading
+
+from ..models.song import Song, normalize_key
+from ..models.suggest import Suggestion
+
+if TYPE_CHECKING:
+    from .job_service import JobContext
+
+# Suggestion types, in the order ties are broken
+SUGGEST_FIELDS = ("artist", "album", "title")
+
+# Every word of a term is a prefix entry point, up to this many words
+MAX_WORDS_PER_TERM = 8
+
+# Results for prefixes this short cover large ranges; they are memoized
+# until a term under the prefix changes.
+MEMOIZE_PREFIX_LENGTH = 2
+
+# Songs read per batch when rebuilding
+REBUILD_BATCH = 5000
+
+Term = Tuple[str, str]  # (type, text)
+ORDER = {kind: rank for rank, kind in enumerate(SUGGEST_FIELDS)}
+
+
+class PrefixIndex:
+    """In-memory typeahead index over song titles, artists, and albums
+
+    Each distinct term is stored once with the number of songs using it.
+    A sorted list of (key, type, text) entries, keyed by the normalized
+    term and by every later word in it, answers a prefix query with a
+    binary search and a scan of the matching range; no database access is
+    needed. The index is per process: writes made through `SongService` or
+    the bulk importer in this process update it, writes from elsewhere are
+    picked up by `rebuild()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._counts: Dict[Term, int] = {}
+        # (key, type, text, key is a later word rather than the term's start)
+        self._entries: List[Tuple[str, str, str, bool]] = []
+        # prefix -> (type, limit) -> suggestions
+        self._memo: Dict[str, Dict[Tuple[Optional[str], int], List[Suggestion]]] = {}
+        self._bytes = 0
+
+    @staticmethod
+    def terms(title: Optional[str], artist: Optional[str], album: Optional[str]) -> List[Term]:
+        values = {"title": title, "artist": artist, "album": album}
+        return [(kind, values[kind]) for kind in SUGGEST_FIELDS if values[kind] and values[kind].strip()]
+
+    @staticmethod
+    def _entries_for(term: Term) -> List[Tuple[str, str, str, bool]]:
+        words = normalize_key(term[1]).split()[:MAX_WORDS_PER_TERM]
+        return [(" ".join(words[start:]), term[0], term[1], start > 0) for start in range(len(words))]
+
+    @staticmethod
+    def _entry_size(entry: Tuple[str, str, str, bool]) -> int:
+        # tuple + key string + list slot; type and text strings are shared
+        return sys.getsizeof(entry) + sys.getsizeof(entry[0]) + 8
+
+    def _forget(self, term: Term) -> None:
+        """Drop the memoized results of every short prefix `term` is found under"""
+        if not self._memo:
+            return
+        for key, _, _, _ in self._entries_for(term):
+            for length in range(1, MEMOIZE_PREFIX_LENGTH + 1):
+                self._memo.pop(key[:length], None)
+
+    def _add_term(self, term: Term) -> None:
+        self._forget(term)  # its count ranks it, so any change can reorder results
+        count = self._counts.get(term, 0)
+        self._counts[term] = count + 1
+        if count:
+            return
+        self._bytes += sys.getsizeof(term[1])
+        for entry in self._entries_for(term):
+            insort(self._entries, entry)
+            self._bytes += self._entry_size(entry)
+
+    def _remove_term(self, term: Term) -> None:
+        count = self._counts.get(term, 0)
+        if count:
+            self._forget(term)
+        if count > 1:
+            self._counts[term] = count - 1
+            return
+        if not count:
+            return
+        del self._counts[term]
+        self._bytes -= sys.getsizeof(term[1])
+        for entry in self._entries_for(term):
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+                self._bytes -= self._entry_size(entry)
+
+    def add(self, title: Optional[str], artist: Optional[str], album: Optional[str]) -> None:
+        """Count one song's terms into the index"""
+        with self._lock:
+            for term in self.terms(title, artist, album):
+                self._add_term(term)
+
+    def remove(self, title: Optional[str], artist: Optional[str], album: Optional[str]) -> None:
+        """Remove one song's terms from the index"""
+        with self._lock:
+            for term in self.terms(title, artist, album):
+                self._remove_term(term)
+
+    def load(self, rows: Iterable[Tuple[Optional[str], Optional[str], Optional[str]]]) -> None:
+        """Replace the contents with the terms of `rows` of (title, artist, album)"""
+        counts: Dict[Term, int] = {}
+        for title, artist, album in rows:
+            for term in self.terms(title, artist, album):
+                counts[term] = counts.get(term, 0) + 1
+        entries = sorted(entry for term in counts for entry in self._entries_for(term))
+        size = sum(sys.getsizeof(text) for _, text in counts) + sum(self._entry_size(entry) for entry in entries)
+        with self._lock:
+            self._counts, self._entries, self._bytes = counts, entries, size
+            self._memo.clear()
+
+    def rebuild(self, db: Session, job: Optional["JobContext"] = None) -> int:
+        """Reload the index from the songs table; returns the number of distinct terms
+
+        For a job, songs are read in keyset batches so that progress can be
+        written between them; a cancelled job leaves the index unchanged.
+        """
+        if job is None:
+            rows = db.execute(select(Song.title, Song.artist, Song.album).execution_options(yield_per=REBUILD_BATCH))
+        else:
+            rows = self._batches(db, job)
+        self.load(rows)
+        return len(self._counts)
+
+    @staticmethod
+    def _batches(db: Session, job: "JobContext"):
+        total = db.scalar(select(func.count()).select_from(Song)) or 1
+        after, done = 0, 0
+        while True:
+            job.progress(done / total, f"Read {done} of {total} songs")
+            batch = db.execute(
+                select(Song.id, Song.title, Song.artist, Song.album)
+                .where(Song.id > after).order_by(Song.id).limit(REBUILD_BATCH)
+            ).all()
+            if not batch:
+                return
+            for _, title, artist, album in batch:
+                yield title, artist, album
+            after, done = batch[-1][0], done + len(batch)
+
+    def clear(self) -> None:
+        self.load(())
+
+    def suggest(self, query: str, limit: int = 10, type: Optional[str] = None) -> List[Suggestion]:
+        """Top `limit` terms starting with `query`, then terms with a later word starting with it"""
+        prefix = normalize_key(query)
+        if not prefix:
+            return []
+        memoize = len(prefix) <= MEMOIZE_PREFIX_LENGTH
+        with self._lock:
+            if memoize and (type, limit) in self._memo.get(prefix, {}):
+                return self._memo[prefix][type, limit]
+
+            # term -> whether only a later word matched
+            matches: Dict[Term, bool] = {}
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries):
+                key, kind, text, later_word = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                if type is None or kind == type:
+                    term = (kind, text)
+                    matches[term] = matches.get(term, True) and later_word
+                position += 1
+            # Terms that start with the prefix first, then the most used
+            best = heapq.nsmallest(
+                limit, matches,
+                key=lambda term: (matches[term], -self._counts[term], ORDER[term[0]], term[1]),
+            )
+            result = [Suggestion(text=text, type=kind, count=self._counts[(kind, text)]) for kind, text in best]
+            if memoize:
+                self._memo.setdefault(prefix, {})[type, limit] = result
+            return result
+
+    def stats(self) -> dict:
+        """Size of the index, for sizing workers"""
+        with self._lock:
+            return {
+                "terms": len(self._counts),
+                "entries": len(self._entries),
+                "memoized_prefixes": len(self._memo),
+                "memoized_results": sum(len(results) for results in self._memo.values()),
+                "approximate_bytes": self._bytes + sys.getsizeof(self._entries) + sys.getsizeof(self._counts),
+            }
+
+
+suggest_index = PrefixIndex()
@@ -0,0 +1,330 @@
+"""
+Audio tag readers for the library scanner
+
+mutagen is used when it is installed and reads every format it supports.
+Without it, built-in readers handle MP3 (ID3v2.2-2.4, ID3v1, duration from
+the Xing/Info/VBRI header or the bitrate), FLAC (Vorbis comments and
+STREAMINFO), and WAV (RIFF INFO); other formats are not scanned. Readers
+seek past artwork and audio data, so a file costs a few small reads.
+"""
+from typing import BinaryIO, Dict, Optional, Tuple
+import os
+import re
+import struct
+
+try:
+    import mutagen
+except ImportError:  # optional dependency
+    mutagen = None
+
+BUILTIN_EXTENSIONS = frozenset({".mp3", ".flac", ".wav"})
+MUTAGEN_EXTENSIONS = frozenset({
+    ".ogg", ".oga", ".opus", ".m4a", ".m4b", ".mp4", ".aac", ".wma", ".aif", ".aiff", ".ape", ".wv", ".mpc",
+})
+AUDIO_EXTENSIONS = BUILTIN_EXTENSIONS | MUTAGEN_EXTENSIONS if mutagen is not None else BUILTIN_EXTENSIONS
+
+UNKNOWN_ARTIST = "Unknown Artist"
+
+# Bytes searched after the ID3v2 tag for the first MPEG frame
+FRAME_SEARCH = 64 * 1024
+
+Tags = Dict[str, object]
+
+# ID3v1 genre numbers, also used as "(n)" references in ID3v2 TCON frames
+ID3V1_GENRES = (
+    "Blues", "Classic Rock", "Country", "Dance", "Disco", "Funk", "Grunge", "Hip-Hop", "Jazz", "Metal",
+    "New Age", "Oldies", "Other", "Pop", "R&B", "Rap", "Reggae", "Rock", "Techno", "Industrial",
+    "Alternative", "Ska", "Death Metal", "Pranks", "Soundtrack", "Euro-Techno", "Ambient", "Trip-Hop",
+    "Vocal", "Jazz+Funk", "Fusion", "Trance", "Classical", "Instrumental", "Acid", "House", "Game",
+    "Sound Clip", "Gospel", "Noise", "AlternRock", "Bass", "Soul", "Punk", "Space", "Meditative",
+    "Instrumental Pop", "Instrumental Rock", "Ethnic", "Gothic", "Darkwave", "Techno-Industrial",
+    "Electronic", "Pop-Folk", "Eurodance", "Dream", "Southern Rock", "Comedy", "Cult", "Gangsta", "Top 40",
+    "Christian Rap", "Pop/Funk", "Jungle", "Native American", "Cabaret", "New Wave", "Psychedelic", "Rave",
+    "Showtunes", "Trailer", "Lo-Fi", "Tribal", "Acid Punk", "Acid Jazz", "Polka", "Retro", "Musical",
+    "Rock & Roll", "Hard Rock",
+)
+
+# ID3v2 frames read, by tag field: (v2.3/v2.4 ids, v2.2 ids)
+ID3_FRAMES = {
+    "title": (("TIT2",), ("TT2",)),
+    "artist": (("TPE1", "TPE2"), ("TP1", "TP2")),
+    "album": (("TALB",), ("TAL",)),
+    "genre": (("TCON",), ("TCO",)),
+    "year": (("TDRC", "TYER", "TDOR"), ("TYE",)),
+    "length": (("TLEN",), ("TLE",)),
+}
+
+MPEG_BITRATES = {  # kbit/s for Layer III, by bitrate index
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MPEG_SAMPLE_RATES = (44100, 48000, 32000)
+
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).replace("\x00", " ").strip()
+    return value or None
+
+
+def _year(value) -> Optional[int]:
+    match = re.match(r"\s*(\d{4})", str(value)) if value is not None else None
+    return int(match.group(1)) if match else None
+
+
+def _genre(value: Optional[str]) -> Optional[str]:
+    """Resolve ID3 genre references: "(17)", "(17)Rock", and "17" become "Rock" """
+    value = _clean(value)
+    if value is None:
+        return None
+    match = re.fullmatch(r"\((\d+|RX|CR)\)(.*)", value)
+    if match:
+        if match.group(2).strip():
+            return match.group(2).strip()
+        value = match.group(1)
+    if value == "RX":
+        return "Remix"
+    if value == "CR":
+        return "Cover"
+    if value.isdigit():
+        number = int(value)
+        return ID3V1_GENRES[number] if number < len(ID3V1_GENRES) else None
+    return value
+
+
+def _song_tags(path: str, title=None, artist=None, album=None, genre=None, year=None, duration=None) -> Tags:
+    """Song fields from raw tag values; a missing title falls back to the file name"""
+    return {
+        "title": _clean(title) or os.path.splitext(os.path.basename(path))[0],
+        "artist": _clean(artist) or UNKNOWN_ARTIST,
+        "album": _clean(album),
+        "genre": _genre(genre),
+        "year": _year(year),
+        "duration": int(round(duration)) if duration else None,
+    }
+
+
+def _decode_text(data: bytes) -> Optional[str]:
+    if not data:
+        return None
+    encoding = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}.get(data[0], "latin-1")
+    text = data[1:].decode(encoding, errors="replace")
+    # ID3v2.4 separates multiple values with NULs; keep the first
+    return next((part for part in text.split("\x00") if part.strip()), None)
+
+
+def _synchsafe(data: bytes) -> int:
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _read_id3v2(file: BinaryIO) -> Tuple[Dict[str, str], int]:
+    """Text frames of an ID3v2 tag at the start of `file`, and the offset after the tag"""
+    header = file.read(10)
+    if len(header) < 10 or header[:3] != b"ID3":
+        return {}, 0
+    major, flags = header[3], header[5]
+    end = 10 + _synchsafe(header[6:10]) + (10 if major >= 4 and flags & 0x10 else 0)
+    frames: Dict[str, str] = {}
+    if major not in (2, 3, 4):
+        return frames, end
+
+    position = 10
+    if flags & 0x40 and major >= 3:  # extended header
+        size = file.read(4)
+        position += _synchsafe(size) if major == 4 else 4 + struct.unpack(">I", size)[0]
+    wanted = {frame for ids in ID3_FRAMES.values() for frame in ids[major == 2]}
+    id_size, header_size = (3, 6) if major == 2 else (4, 10)
+    while position + header_size <= end:
+        file.seek(position)
+        frame_header = file.read(header_size)
+        frame_id = frame_header[:id_size].decode("latin-1")
+        if len(frame_header) < header_size or not frame_id.strip("\x00") or not frame_id.isalnum():
+            break
+        raw_size = frame_header[id_size:id_size + (3 if major == 2 else 4)]
+        if major == 2:
+            size = int.from_bytes(raw_size, "big")
+        elif major == 4:
+            size = _synchsafe(raw_size)
+        else:
+            size = struct.unpack(">I", raw_size)[0]
+        position += header_size
+        if frame_id in wanted and frame_id not in frames and size:
+            frames[frame_id] = _decode_text(file.read(size))
+        position += size
+    return {frame_id: value for frame_id, value in frames.items() if value}, end
+
+
+def _id3_value(frames: Dict[str, str], field: str, v22: bool) -> Optional[str]:
+    return next((frames[frame] for frame in ID3_FRAMES[field][v22] if frames.get(frame)), None)
+
+
+def _mpeg_duration(file: BinaryIO, audio_start: int, audio_end: int) -> Optional[float]:
+    """Duration from the first Layer III frame: exact for VBR headers, estimated from the bitrate otherwise"""
+    file.seek(audio_start)
+    data = file.read(FRAME_SEARCH)
+    offset = -1
+    while True:
+        offset = data.find(b"\xff", offset + 1, len(data) - 4)
+        if offset < 0:
+            return None
+        if data[offset + 1] & 0xE0 != 0xE0:
+            continue
+        version_bits, layer_bits = (data[offset + 1] >> 3) & 3, (data[offset + 1] >> 1) & 3
+        bitrate_index, rate_index = data[offset + 2] >> 4, (data[offset + 2] >> 2) & 3
+        if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            continue
+        mpeg1 = version_bits == 3
+        sample_rate = MPEG_SAMPLE_RATES[rate_index] // (1 if mpeg1 else 2 if version_bits == 2 else 4)
+        samples_per_frame = 1152 if mpeg1 else 576
+        mono = data[offset + 3] >> 6 == 3
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+
+        xing = offset + 4 + side_info
+        if data[xing:xing + 4] in (b"Xing", b"Info"):
+            (xing_flags,) = struct.unpack(">I", data[xing + 4:xing + 8])
+            if xing_flags & 1:
+                (frames,) = struct.unpack(">I", data[xing + 8:xing + 12])
+                return frames * samples_per_frame / sample_rate
+        vbri = offset + 36
+        if data[vbri:vbri + 4] == b"VBRI":
+            (frames,) = struct.unpack(">I", data[vbri + 14:vbri + 18])
+            return frames * samples_per_frame / sample_rate
+
+        bitrate = MPEG_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+        return (audio_end - audio_start - offset) * 8 / bitrate
+
+
+def read_mp3(path: str, file: BinaryIO) -> Tags:
+    frames, audio_start = _read_id3v2(file)
+    file.seek(0, os.SEEK_END)
+    audio_end = file.tell()
+    v22 = any(len(frame_id) == 3 for frame_id in frames)
+    values = {field: _id3_value(frames, field, v22) for field in ID3_FRAMES}
+
+    if audio_end >= 128:
+        file.seek(audio_end - 128)
+        v1 = file.read(128)
+        if v1[:3] == b"TAG":
+            audio_end -= 128
+            text = lambda start, size: _clean(v1[start:start + size].split(b"\x00")[0].decode("latin-1"))
+            for field, start, size in (("title", 3, 30), ("artist", 33, 30), ("album", 63, 30), ("year", 93, 4)):
+                values[field] = values[field] or text(start, size)
+            if not values["genre"] and v1[127] < len(ID3V1_GENRES):
+                values["genre"] = ID3V1_GENRES[v1[127]]
+
+    duration = _mpeg_duration(file, audio_start, audio_end)
+    if duration is None and values["length"] and values["length"].isdigit():
+        duration = int(values["length"]) / 1000
+    return _song_tags(path, values["title"], values["artist"], values["album"], values["genre"], values["year"], duration)
+
+
+def read_flac(path: str, file: BinaryIO) -> Tags:
+    if file.read(4) != b"fLaC":
+        raise ValueError("Not a FLAC file")
+    comments: Dict[str, str] = {}
+    duration = None
+    last = False
+    while not last:
+        header = file.read(4)
+        if len(header) < 4:
+            break
+        last, block_type, size = bool(header[0] & 0x80), header[0] & 0x7F, int.from_bytes(header[1:], "big")
+        if block_type == 0:  # STREAMINFO
+            info = file.read(size)
+            packed = int.from_bytes(info[10:18], "big")
+            sample_rate, total_samples = packed >> 44, packed & ((1 << 36) - 1)
+            duration = total_samples / sample_rate if sample_rate else 0
+        elif block_type == 4:  # VORBIS_COMMENT, little-endian lengths
+            block = file.read(size)
+            (vendor_length,) = struct.unpack_from("<I", block, 0)
+            position = 4 + vendor_length
+            (count,) = struct.unpack_from("<I", block, position)
+            position += 4
+            for _ in range(count):
+                (length,) = struct.unpack_from("<I", block, position)
+                key, _, value = block[position + 4:position + 4 + length].decode("utf-8", errors="replace").partition("=")
+                comments.setdefault(key.upper(), value)
+                position += 4 + length
+        else:
+            file.seek(size, os.SEEK_CUR)
+    if duration is None:
+        raise ValueError("Missing FLAC STREAMINFO block")
+    return _song_tags(
+        path, comments.get("TITLE"), comments.get("ARTIST") or comments.get("ALBUMARTIST"), comments.get("ALBUM"),
+        comments.get("GENRE"), comments.get("DATE") or comments.get("YEAR"), duration,
+    )
+
+
+RIFF_INFO = {b"INAM": "title", b"IART": "artist", b"IPRD": "album", b"IGNR": "genre", b"ICRD": "year"}
+
+
+def read_wav(path: str, file: BinaryIO) -> Tags:
+    header = file.read(12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+    values: Dict[str, Optional[str]] = {}
+    byte_rate = data_size = None
+    while True:
+        chunk = file.read(8)
+        if len(chunk) < 8:
+            break
+        chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        padded = size + (size & 1)
+        if chunk_id == b"fmt ":
+            fmt = file.read(padded)
+            (byte_rate,) = struct.unpack_from("<I", fmt, 8)
+        elif chunk_id == b"LIST":
+            block = file.read(padded)
+            position = 4 if block[:4] == b"INFO" else len(block)
+            while position + 8 <= len(block):
+                sub_id, sub_size = block[position:position + 4], struct.unpack_from("<I", block, position + 4)[0]
+                if sub_id in RIFF_INFO:
+                    values[RIFF_INFO[sub_id]] = block[position + 8:position + 8 + sub_size].split(b"\x00")[0].decode("utf-8", errors="replace")
+                position += 8 + sub_size + (sub_size & 1)
+        else:
+            if chunk_id == b"data":
+                data_size = size
+            file.seek(padded, os.SEEK_CUR)
+    duration = data_size / byte_rate if data_size is not None and byte_rate else None
+    return _song_tags(path, duration=duration, **values)
+
+
+BUILTIN_READERS = {".mp3": read_mp3, ".flac": read_flac, ".wav": read_wav}
+
+
+def read_tags(path: str) -> Tags:
+    """Song fields (title, artist, album, genre, year, duration) from an audio file's tags
+
+    Raises ValueError for a file that cannot be read as audio.
+    """
+    if mutagen is not None:
+        try:
+            audio = mutagen.File(path, easy=True)
+        except mutagen.MutagenError as exc:
+            raise ValueError(str(exc)) from exc
+        if audio is None:
+            raise ValueError("Unrecognized audio format")
+        tags = audio.tags or {}
+        first = lambda key: (tags.get(key) or [None])[0]
+        return _song_tags(
+            path, first("title"), first("artist") or first("albumartist"), first("album"), first("genre"),
+            first("date"), getattr(audio.info, "length", None),
+        )
+
+    reader = BUILTIN_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError("Unsupported audio format")
+    try:
+        with open(path, "rb") as file:
+            return reader(path, file)
+    except (struct.error, IndexError, UnicodeDecodeError) as exc:
+        raise ValueError(f"Malformed tags: {exc}") from exc
+
+
+def try_read_tags(path: str) -> Tuple[Optional[Tags], Optional[str]]:
+    """(tags, None), or (None, error) for an unreadable file; safe to map over a process pool"""
+    try:
+        return read_tags(path), None
+    except (OSError, ValueError) as exc:
+        return None, str(exc)
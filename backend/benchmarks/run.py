@@ -0,0 +1,283 @@
+"""
+Micro-benchmarks for SongService, serialization, and the song routes
+
+Builds synthetic libraries, times every hot path, and either records the
+results as a baseline or compares them against one.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --sizes 10000 100000 1000000 --output benchmarks/baseline.json
+    python -m benchmarks.run --sizes 10000 --compare benchmarks/baseline.json --threshold 0.25
+
+Compare mode exits with status 1 when any benchmark's median time is more
+than `threshold` (a fraction) slower than its baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Keep the app's own engine off the developer database while benchmarking.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/music-library-bench-app.db")
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.main import app
+from app.models import Base, Song, SongCreate, SongResponse, SongUpdate
+from app.responses import dumps, rows_to_dicts
+from app.services import GroupCommitWriter, SongService, StatsService, get_db, song_cache
+from app.services.song_service import SONG_FIELDS
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+WORDS = (
+    "love night heart fire dream rain road blue light river home time girl "
+    "star summer wild gold city dance sun moon world ocean song lonely"
+).split()
+GENRES = (
+    "Rock Pop Jazz Blues Hip-Hop Electronic Classical Country Folk Metal "
+    "Punk Reggae Soul Funk R&B Indie Grunge Britpop House Trance"
+).split()
+
+
+def generate_library(url: str, size: int, seed: int = 42, batch: int = 10000) -> None:
+    """Create a database with `size` deterministic synthetic songs"""
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    artists = max(size // 10, 1)
+    with engine.begin() as connection:
+        for start in range(0, size, batch):
+            rows = []
+            for i in range(start, min(start + batch, size)):
+                artist = rng.randrange(artists)
+                rows.append({
+                    "title": " ".join(rng.choice(WORDS).title() for _ in range(rng.randint(1, 4))),
+                    "artist": f"Artist {artist}",
+                    "album": f"Album {artist}-{rng.randrange(5)}",
+                    "genre": rng.choice(GENRES),
+                    "year": rng.randint(1950, 2024),
+                    "duration": rng.randint(90, 600),
+                    "file_path": f"/music/{artist}/{i}.mp3",
+                })
+            connection.execute(insert(Song), rows)
+    engine.dispose()
+
+
+def measure(fn: Callable[[], object], setup: Optional[Callable[[], object]] = None,
+            min_time: float = 0.5, min_repeat: int = 3, max_repeat: int = 200) -> Dict[str, float]:
+    """Time `fn` repeatedly (running `setup` untimed before each call)"""
+    timings: List[float] = []
+    budget_end = time.perf_counter() + min_time
+    while len(timings) < max_repeat and (len(timings) < min_repeat or time.perf_counter() < budget_end):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "repeat": len(timings),
+    }
+
+
+def service_benchmarks(db: Session, size: int) -> Dict[str, Callable[[], object]]:
+    service = SongService(db)
+    middle = size // 2
+    new_song = SongCreate(title="Benchmark Song", artist="Benchmark Artist", genre="Rock")
+
+    def create_and_delete():
+        song = service.create_song(new_song)
+        service.delete_song(song.id)
+
+    def update():
+        service.update_song(middle, SongUpdate(duration=random.randint(90, 600)))
+
+    return {
+        "service.get_songs.first_page": lambda: service.get_songs(skip=0, limit=100),
+        "service.get_songs.deep_offset": lambda: service.get_songs(skip=max(size - 100, 0), limit=100),
+        "service.get_songs.deep_cursor": lambda: service.get_songs(limit=100, after_id=max(size - 100, 0)),
+        "service.get_song": lambda: service.get_song(middle),
+        "service.search_songs": lambda: service.search_songs("love night"),
+        "service.get_songs_by_artist": lambda: service.get_songs_by_artist("Artist 7"),
+        "service.get_songs_by_genre": lambda: service.get_songs_by_genre("Jazz"),
+        "service.create_and_delete_song": create_and_delete,
+        "service.update_song": update,
+        "stats.get_stats": lambda: StatsService(db).get_stats(),
+    }
+
+
+# Concurrent writers in the write benchmarks, and songs each one creates
+WRITERS = 16
+WRITES_PER_WRITER = 10
+
+
+def write_benchmarks(db: Session, factory: sessionmaker, writer: GroupCommitWriter):
+    """Concurrent creates, committed one by one and grouped; the setup deletes the previous run's songs"""
+    created: List[int] = []
+
+    def concurrent(create: Callable[[Session, SongCreate], object]) -> Callable[[], None]:
+        def run():
+            def work():
+                session = factory()
+                try:
+                    for index in range(WRITES_PER_WRITER):
+                        created.append(create(session, SongCreate(title=f"Bench {index}", artist="Bench")).id)
+                finally:
+                    session.close()
+            threads = [threading.Thread(target=work) for _ in range(WRITERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return run
+
+    def cleanup():
+        SongService(db).delete_songs(created)
+        created.clear()
+
+    benchmarks = {
+        "write.concurrent_creates": concurrent(lambda session, song: SongService(session).create_song(song)),
+        "write.concurrent_creates_grouped": concurrent(writer.create_song),
+    }
+    return benchmarks, cleanup
+
+
+def serialization_benchmarks(db: Session) -> Dict[str, Callable[[], object]]:
+    songs = SongService(db).get_songs(limit=1000)
+    adapter = TypeAdapter(List[SongResponse])
+    validated = adapter.validate_python(songs, from_attributes=True)
+    rows = SongService(db).get_song_rows(limit=1000)
+    return {
+        "serialize.validate_1000": lambda: adapter.validate_python(songs, from_attributes=True),
+        "serialize.dump_json_1000": lambda: adapter.dump_json(validated),
+        # The row path replaces both steps above
+        "serialize.rows_dumps_1000": lambda: dumps(rows_to_dicts(SONG_FIELDS, rows)),
+    }
+
+
+def route_benchmarks(client: TestClient, size: int) -> Dict[str, Callable[[], object]]:
+    middle = size // 2
+    paths = {
+        "route.GET /api/songs": "/api/songs?limit=100",
+        "route.GET /api/songs limit=1000": "/api/songs?limit=1000",
+        "route.GET /api/songs limit=1000 fields": "/api/songs?limit=1000&fields=id,title,artist",
+        "route.GET /api/songs/{id}": f"/api/songs/{middle}",
+        "route.GET /api/stats": "/api/stats",
+        "route.GET /api/search": "/api/search?q=love",
+        "route.GET /api/artists/{artist}/songs": "/api/artists/Artist%207/songs",
+        "route.GET /api/genres/{genre}/songs": "/api/genres/Jazz/songs",
+        "route.GET /api/songs/export?artist": "/api/songs/export?artist=Artist%207",
+    }
+    benchmarks = {name: (lambda path=path: client.get(path)) for name, path in paths.items()}
+
+    def create_update_delete():
+        song_id = client.post("/api/songs", json={"title": "Bench", "artist": "Bench"}).json()["id"]
+        client.put(f"/api/songs/{song_id}", json={"genre": "Rock"})
+        client.delete(f"/api/songs/{song_id}")
+
+    benchmarks["route.POST+PUT+DELETE /api/songs"] = create_update_delete
+    return benchmarks
+
+
+def run(sizes: List[int], workdir: str, min_time: float = 0.5) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark against a library of each size"""
+    results: Dict[str, Dict[str, float]] = {}
+    for size in sizes:
+        url = f"sqlite:///{os.path.join(workdir, f'bench-{size}.db')}"
+        if not os.path.exists(url[len("sqlite:///"):]):
+            print(f"Generating library of {size} songs...", file=sys.stderr)
+            generate_library(url, size)
+
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        def override_get_db():
+            db = factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        db = factory()
+        writer = GroupCommitWriter()
+        try:
+            client = TestClient(app)
+            writes, delete_written = write_benchmarks(db, factory, writer)
+            groups = [
+                (service_benchmarks(db, size), None),
+                (writes, delete_written),
+                (serialization_benchmarks(db), None),
+                # Clear the read cache so routes measure the database path.
+                (route_benchmarks(client, size), song_cache.clear),
+            ]
+            for benchmarks, setup in groups:
+                for name, fn in benchmarks.items():
+                    key = f"{size}:{name}"
+                    results[key] = measure(fn, setup=setup, min_time=min_time)
+                    print(f"{key:<60} {results[key]['median_s'] * 1000:10.3f} ms", file=sys.stderr)
+            delete_written()
+        finally:
+            writer.shutdown()
+            db.close()
+            app.dependency_overrides.pop(get_db, None)
+            engine.dispose()
+    return results
+
+
+def compare(baseline: Dict[str, Dict[str, float]], current: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """Names of benchmarks whose median regressed by more than `threshold`"""
+    regressions = []
+    for key, result in sorted(current.items()):
+        reference = baseline.get(key)
+        if reference is None or not reference["median_s"]:
+            continue
+        ratio = result["median_s"] / reference["median_s"]
+        marker = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{key:<60} {ratio:6.2f}x {marker}")
+        if marker:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Music Library micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Library sizes to generate")
+    parser.add_argument("--workdir", default=tempfile.gettempdir(), help="Where generated libraries are kept")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend per benchmark")
+    parser.add_argument("--output", help="Write results to this JSON baseline file")
+    parser.add_argument("--compare", help="Compare results against this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing, e.g. 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.workdir, min_time=args.min_time)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, handle, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
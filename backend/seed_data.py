@@ -78,38 +78,33 @@ SAMPLE_SONGS = [
 ]
 
 def add_sample_data(base_url: str = "http://localhost:8000") -> None:
-    """Add sample songs to the music library"""
+    """Add sample songs to the music library in one bulk import request"""
     print("🎵 Adding sample songs to Music Library...")
     
-    added_count = 0
-    failed_count = 0
+    body = "\n".join(json.dumps(song_data) for song_data in SAMPLE_SONGS)
+    try:
+        response = requests.post(
+            f"{base_url}/api/songs/bulk",
+            data=body.encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+    except requests.exceptions.ConnectionError:
+        print("❌ Could not connect to the backend server.")
+        print("   Make sure the backend is running on http://localhost:8000")
+        return
+    
+    if response.status_code != 200:
+        print(f"❌ Bulk import failed: {response.status_code}")
+        return
     
-    for song_data in SAMPLE_SONGS:
-        try:
-            response = requests.post(
-                f"{base_url}/api/songs",
-                json=song_data,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 201:
-                print(f"✅ Added: {song_data['title']} by {song_data['artist']}")
-                added_count += 1
-            else:
-                print(f"❌ Failed to add {song_data['title']}: {response.status_code}")
-                failed_count += 1
-                
-        except requests.exceptions.ConnectionError:
-            print("❌ Could not connect to the backend server.")
-            print("   Make sure the backend is running on http://localhost:8000")
-            return
-        except Exception as e:
-            print(f"❌ Error adding {song_data['title']}: {str(e)}")
-            failed_count += 1
+    report = response.json()
+    for error in report["errors"]:
+        song_data = SAMPLE_SONGS[error["row"] - 1]
+        print(f"❌ Failed to add {song_data.get('title')}: {error['error']}")
     
     print(f"\n📊 Summary:")
-    print(f"   ✅ Successfully added: {added_count} songs")
-    print(f"   ❌ Failed to add: {failed_count} songs")
+    print(f"   ✅ Successfully added: {report['inserted']} songs")
+    print(f"   ❌ Failed to add: {report['failed']} songs")
     print(f"   🎵 Total sample songs: {len(SAMPLE_SONGS)}")
 
 def check_server_status(base_url: str = "http://localhost:8000") -> bool:
@@ -0,0 +1,148 @@
+"""
+Tests for admission control, load shedding, and request deadlines
+"""
+import asyncio
+import time
+
+import anyio
+import httpx
+import pytest
+from sqlalchemy import text
+
+from app.admission import AdmissionLimit, admission_limits, current_deadline, enforce_deadlines, route_class
+from app.main import app
+from app.services import StatsService
+
+DELAY = 0.3
+RECURSIVE_COUNT = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) SELECT count(*) FROM c"
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    def set_limit(name, concurrency, queue, deadline=None):
+        monkeypatch.setitem(admission_limits, name, AdmissionLimit(name, concurrency, queue, deadline))
+    return set_limit
+
+
+@pytest.fixture
+def slow_stats(monkeypatch):
+    original = StatsService.get_stats
+
+    def get_stats(self):
+        time.sleep(DELAY)
+        return original(self)
+
+    monkeypatch.setattr(StatsService, "get_stats", get_stats)
+
+
+def fire(paths):
+    """GET every path concurrently; returns (status, elapsed, response) per path"""
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            results = [None] * len(paths)
+
+            async def fetch(index, path):
+                started = time.perf_counter()
+                response = await http.get(path)
+                results[index] = (response.status_code, time.perf_counter() - started, response)
+
+            async with anyio.create_task_group() as tasks:
+                for index, path in enumerate(paths):
+                    tasks.start_soon(fetch, index, path)
+            return results
+    return anyio.run(run)
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/api/songs/1", "point"),
+    ("PUT", "/api/songs/1", "point"),
+    ("POST", "/api/songs", "point"),
+    ("GET", "/api/songs", "scan"),
+    ("POST", "/api/songs/bulk", "bulk"),
+    ("GET", "/api/search", "scan"),
+    ("GET", "/api/stats", "scan"),
+    ("GET", "/api/songs/export", "bulk"),
+    ("GET", "/health", None),
+    ("GET", "/nowhere", None),
+])
+def test_route_classes(method, path, expected):
+    scope = {"type": "http", "method": method, "path": path, "root_path": "", "headers": [], "query_string": b""}
+    assert route_class(app.router.routes, scope)[0] == expected
+
+
+def test_full_queue_is_shed_while_point_reads_stay_fast(client, limits, slow_stats):
+    song_id = client.post("/api/songs", json={"title": "A", "artist": "B"}).json()["id"]
+    limits("scan", concurrency=1, queue=1)
+    results = fire(["/api/stats"] * 4 + [f"/api/songs/{song_id}"])
+
+    statuses = sorted(status for status, _, _ in results[:4])
+    assert statuses == [200, 200, 503, 503]
+    shed = next(response for status, _, response in results if status == 503)
+    assert shed.headers["retry-after"] == "1"
+    assert shed.json()["route_class"] == "scan"
+    # Shed at once rather than after the requests ahead of them
+    assert min(elapsed for status, elapsed, _ in results[:4] if status == 503) < DELAY
+    status, elapsed, _ = results[4]
+    assert status == 200 and elapsed < DELAY
+
+
+def test_queued_requests_are_shed_at_their_deadline(client, limits, slow_stats):
+    limits("scan", concurrency=1, queue=5, deadline=DELAY / 3)
+    results = fire(["/api/stats"] * 3)
+    assert sorted(status for status, _, _ in results) == [200, 503, 503]
+    assert max(elapsed for status, elapsed, _ in results if status == 503) < DELAY
+
+
+def test_running_statements_are_interrupted_at_the_deadline(client, engine, limits, monkeypatch):
+    enforce_deadlines(engine)
+    limits("scan", concurrency=2, queue=0, deadline=0.2)
+    monkeypatch.setattr(StatsService, "get_stats", lambda self: self.db.execute(text(RECURSIVE_COUNT)).scalar())
+
+    started = time.perf_counter()
+    response = client.get("/api/stats")
+    assert response.status_code == 503
+    assert "deadline" in response.json()["detail"]
+    assert time.perf_counter() - started < 2
+    assert admission_limits["scan"].stats()["active"] == 0
+
+
+def test_statements_outside_requests_are_not_interrupted(db, engine):
+    enforce_deadlines(engine)
+    token = current_deadline.set(None)
+    try:
+        assert db.execute(text(RECURSIVE_COUNT.replace("100000000", "200000"))).scalar() == 200000
+    finally:
+        current_deadline.reset(token)
+
+
+def test_limit_hands_slots_to_waiters_in_order():
+    async def run():
+        limit = AdmissionLimit("test", concurrency=1, queue=2)
+        assert await limit.acquire()
+        order = []
+
+        async def wait(name, timeout=None):
+            admitted = await limit.acquire(timeout)
+            order.append((name, admitted))
+            if admitted:
+                limit.release()
+
+        first = asyncio.create_task(wait("first"))
+        late = asyncio.create_task(wait("late", timeout=0.01))
+        await asyncio.sleep(0)
+        assert not await limit.acquire()  # the queue is full
+        await asyncio.sleep(0.05)
+        limit.release()
+        await asyncio.gather(first, late)
+        return order, limit.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == [("late", False), ("first", True)]
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+
+def test_admission_stats(client):
+    stats = client.get("/api/admin/admission").json()
+    assert set(stats) == {"point", "scan", "bulk"}
+    assert stats["bulk"]["deadline_ms"] is None
@@ -0,0 +1,298 @@
+"""
+Tests for the local artwork store and /api/songs/{id}/artwork
+"""
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from app.routes.conditional import byte_range
+from app.services import artwork_store
+from app.services.artwork import ArtworkStore, ArtworkUnavailable, HttpSource, LocalFileSource, image_type
+
+
+def png(width=2, height=2, color=(255, 0, 0)):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + bytes(color) * width for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+class CountingSource(LocalFileSource):
+    def __init__(self, root):
+        super().__init__(root)
+        self.fetched = []
+
+    def fetch(self, url):
+        self.fetched.append(url)
+        return super().fetch(url)
+
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    """The shared store, writing under tmp_path and fetching from tmp_path/images"""
+    directory = tmp_path / "images"
+    directory.mkdir()
+    source = CountingSource(str(directory))
+    monkeypatch.setattr(artwork_store, "root", str(tmp_path / "store"))
+    monkeypatch.setattr(artwork_store, "source", source)
+    monkeypatch.setattr(artwork_store, "_bytes", None)
+    return directory, source
+
+
+def add_song(client, artwork_url):
+    return client.post("/api/songs", json={"title": "T", "artist": "A", "artwork_url": artwork_url}).json()["id"]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=95-200", (95, 99)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-9", None),
+    ("bytes=abc", None),
+    ("bytes=9-0", None),
+])
+def test_byte_range(header, expected):
+    assert byte_range(header, 100) == expected
+
+
+def test_unsatisfiable_byte_range():
+    with pytest.raises(ValueError):
+        byte_range("bytes=100-", 100)
+    with pytest.raises(ValueError):
+        byte_range("bytes=-0", 100)
+
+
+def test_artwork_is_fetched_once_and_cached(client, images):
+    directory, source = images
+    (directory / "cover.png").write_bytes(png())
+    song_id = add_song(client, "https://images.example.com/cover.png")
+
+    response = client.get(f"/api/songs/{song_id}/artwork", params={"size": "original"})
+    assert response.status_code == 200 and response.content == png()
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == "public, no-cache"
+    etag = response.headers["etag"]
+
+    assert client.get(f"/api/songs/{song_id}/artwork", params={"size": "original"},
+                      headers={"If-None-Match": etag}).status_code == 304
+    assert source.fetched == ["https://images.example.com/cover.png"]
+
+
+def test_versioned_artwork_url_is_cached_long(client, images):
+    directory, _ = images
+    (directory / "a.png").write_bytes(png())
+    (directory / "b.png").write_bytes(png(color=(0, 0, 255)))
+    song_id = add_song(client, "https://images.example.com/a.png")
+    url = f"/api/songs/{song_id}/artwork?size=original"
+    version = client.get(url).headers["etag"].strip('"')
+
+    response = client.get(url, params={"v": version})
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    # A changed artwork_url is served at once, and the old version is no longer long-lived
+    client.put(f"/api/songs/{song_id}", json={"artwork_url": "https://images.example.com/b.png"})
+    response = client.get(url, params={"v": version})
+    assert response.content == png(color=(0, 0, 255))
+    assert response.headers["cache-control"] == "public, no-cache"
+    assert response.headers["etag"].strip('"') != version
+
+
+def test_byte_ranges(client, images):
+    directory, _ = images
+    (directory / "cover.png").write_bytes(png())
+    song_id = add_song(client, "https://images.example.com/cover.png")
+    url = f"/api/songs/{song_id}/artwork?size=original"
+    etag = client.get(url).headers["etag"]
+
+    response = client.get(url, headers={"Range": "bytes=0-7"})
+    assert response.status_code == 206 and response.content == b"\x89PNG\r\n\x1a\n"
+    assert response.headers["content-range"] == f"bytes 0-7/{len(png())}"
+    assert client.get(url, headers={"Range": "bytes=0-7", "If-Range": etag}).status_code == 206
+    assert client.get(url, headers={"Range": "bytes=0-7", "If-Range": '"stale"'}).status_code == 200
+    response = client.get(url, headers={"Range": "bytes=100000-"})
+    assert response.status_code == 416 and response.headers["content-range"] == f"bytes */{len(png())}"
+
+
+def test_identical_images_share_files(client, images):
+    directory, _ = images
+    (directory / "a.png").write_bytes(png())
+    (directory / "b.png").write_bytes(png())
+    first = client.get(f"/api/songs/{add_song(client, 'https://x.example/a.png')}/artwork?size=original")
+    second = client.get(f"/api/songs/{add_song(client, 'https://y.example/b.png')}/artwork?size=original")
+    assert first.headers["etag"] == second.headers["etag"]
+    stored = [name for _, _, names in os.walk(artwork_store.root) for name in names]
+    assert len([name for name in stored if name.endswith(".original")]) == 1
+
+
+def test_failed_fetch_is_remembered(client, images):
+    directory, source = images
+    (directory / "notes.txt").write_bytes(b"not an image")
+    missing = add_song(client, "https://x.example/missing.png")
+    text = add_song(client, "https://x.example/notes.txt")
+
+    for _ in range(2):
+        assert client.get(f"/api/songs/{missing}/artwork").status_code == 502
+    assert source.fetched == ["https://x.example/missing.png"]
+    assert "not a JPEG" in client.get(f"/api/songs/{text}/artwork").json()["detail"]
+    assert client.get(f"/api/songs/{add_song(client, None)}/artwork").status_code == 404
+
+
+def test_least_recently_served_files_are_evicted(tmp_path):
+    directory = tmp_path / "images"
+    directory.mkdir()
+    images = {name: png(width=width) for name, width in (("a", 10), ("b", 20), ("c", 30))}
+    for name, data in images.items():
+        (directory / f"{name}.png").write_bytes(data)
+    store = ArtworkStore(str(tmp_path / "store"), max_bytes=10**6,
+                         source=LocalFileSource(str(directory)))
+
+    digests = {}
+    for age, name in enumerate("abc"):
+        digests[name] = store.add(store.source.fetch(f"/{name}.png"))
+        path = store.path(digests[name], "original")
+        os.utime(path, (time.time() - 10000 + age * 10, time.time() - 10000 + age * 10))
+    # Serving "a" makes it the most recent, so "b" goes first
+    assert store.get(digests["a"], "original")
+    assert store.evict(target=len(images["a"]) + len(images["c"])) == 1
+    assert store.get(digests["b"], "original") is None
+    assert store.get(digests["a"], "original") and store.get(digests["c"], "original")
+    assert store.stats()["bytes"] == len(images["a"]) + len(images["c"])
+
+
+def test_eviction_skips_files_being_written(tmp_path):
+    store = ArtworkStore(str(tmp_path), max_bytes=10**6)
+    digest = store.add(png())
+    partial = os.path.join(os.path.dirname(store.path(digest, "original")), ".tmp-partial")
+    with open(partial, "wb") as file:
+        file.write(b"x" * 1000)
+    assert store.evict(target=0) == 1
+    assert os.path.exists(partial) and store.stats()["bytes"] == 0
+
+
+def test_artwork_evicted_after_resolving_is_fetched_again(client, images, monkeypatch):
+    from app.services.artwork import ArtworkService
+    directory, source = images
+    (directory / "cover.png").write_bytes(png())
+    song_id = add_song(client, "https://images.example.com/cover.png")
+    resolve = ArtworkService.resolve
+
+    def evicted_once(self, url, size="original"):
+        path, digest, served = resolve(self, url, size)
+        if len(source.fetched) == 1:
+            os.remove(path)
+        return path, digest, served
+
+    monkeypatch.setattr(ArtworkService, "resolve", evicted_once)
+    response = client.get(f"/api/songs/{song_id}/artwork", params={"size": "original"})
+    assert response.status_code == 200 and response.content == png()
+    assert len(source.fetched) == 2
+
+
+def test_prefetch_job(client, images):
+    from tests.test_jobs import wait
+    directory, source = images
+    (directory / "cover.png").write_bytes(png())
+    add_song(client, "https://x.example/cover.png")
+    add_song(client, "https://x.example/cover.png")
+    add_song(client, "https://x.example/gone.png")
+
+    job = wait(client, client.post("/api/jobs", json={"kind": "cache-artwork"}).json()["id"])
+    assert job["result"] == {"urls": 2, "fetched": 1, "failed": 1}
+    assert sorted(source.fetched) == ["https://x.example/cover.png", "https://x.example/gone.png"]
+
+
+def test_http_source_refuses_private_hosts():
+    with pytest.raises(ArtworkUnavailable):
+        HttpSource().fetch("http://127.0.0.1/cover.jpg")
+    with pytest.raises(ArtworkUnavailable):
+        HttpSource().fetch("file:///etc/passwd")
+    with pytest.raises(ArtworkUnavailable):
+        LocalFileSource("/tmp").fetch("https://x.example/../etc/passwd")
+
+
+class PublicTestHost(HttpSource):
+    """Treats artwork.test, which resolves to the local test server, as a public host"""
+
+    def allowed(self, host, ip):
+        return host == "artwork.test" or super().allowed(host, ip)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Local HTTP server for artwork.test; paths map to (status, headers, body)"""
+    responses = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status, headers, body = responses.get(self.path, (404, {}, b""))
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    getaddrinfo = socket.getaddrinfo
+    local = {"artwork.test", "internal.test"}
+    monkeypatch.setattr(socket, "getaddrinfo", lambda host, *args, **kwargs: getaddrinfo(
+        "127.0.0.1" if host in local else host, *args, **kwargs))
+    yield httpd.server_port, responses
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_http_source_follows_redirects_to_public_hosts(server):
+    port, responses = server
+    responses["/old.png"] = (301, {"Location": "/new.png"}, b"")
+    responses["/new.png"] = (200, {}, png())
+    assert PublicTestHost().fetch(f"http://artwork.test:{port}/old.png") == png()
+
+
+@pytest.mark.parametrize("location", [
+    "http://127.0.0.1:{port}/secret",
+    "http://internal.test:{port}/secret",
+    "http://169.254.169.254/latest/meta-data/",
+])
+def test_http_source_refuses_redirects_to_private_hosts(server, location):
+    port, responses = server
+    responses["/cover.png"] = (302, {"Location": location.format(port=port)}, b"")
+    responses["/secret"] = (200, {}, png())
+    with pytest.raises(ArtworkUnavailable, match="not a public address"):
+        PublicTestHost().fetch(f"http://artwork.test:{port}/cover.png")
+
+
+def test_http_source_limits_redirects(server):
+    port, responses = server
+    responses["/loop.png"] = (307, {"Location": "/loop.png"}, b"")
+    with pytest.raises(ArtworkUnavailable, match="redirects"):
+        PublicTestHost().fetch(f"http://artwork.test:{port}/loop.png")
+
+
+def test_thumbnails(tmp_path):
+    pytest.importorskip("PIL")
+    store = ArtworkStore(str(tmp_path), max_bytes=10**8)
+    digest = store.add(png(width=1000, height=500))
+    path, size = store.get(digest, "small")
+    assert size == "small"
+    with open(path, "rb") as file:
+        assert image_type(file.read(16)) == "image/jpeg"
+
+    from PIL import Image
+    assert Image.open(path).size == (128, 64)
+    os.remove(path)
+    assert store.get(digest, "small")[1] == "small"  # regenerated from the original
@@ -0,0 +1,60 @@
+"""
+Tests for the batch get, update, and delete endpoints
+"""
+from sqlalchemy import event
+
+from app.models import Artist
+from app.models.song import Song, SongCreate, SongUpdate
+from app.services import SongService, StatsService, suggest_index
+
+
+def create_songs(db, count):
+    service = SongService(db)
+    return [service.create_song(SongCreate(title=f"Song {i}", artist="Band", genre="Rock")).id for i in range(count)]
+
+
+def test_update_is_set_based_and_keeps_derived_data(db, engine):
+    ids = create_songs(db, 3)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    updated = SongService(db).update_songs(ids[:2] + [999], SongUpdate(artist="Björk", genre="Pop"))
+    assert sorted(updated) == ids[:2]
+    assert sum(statement.startswith("UPDATE songs") for statement in statements) == 1
+
+    rows = db.query(Song.artist, Song.artist_key, Song.updated_at).filter(Song.id.in_(ids[:2])).all()
+    assert all(row[:2] == ("Björk", "bjork") and row[2] is not None for row in rows)
+    assert {artist.name: artist.song_count for artist in db.query(Artist)} == {"Björk": 2, "Band": 1}
+    assert StatsService(db).get_stats().total_genres == 2
+    assert [s.text for s in suggest_index.suggest("bj")] == ["Björk"]
+
+
+def test_delete_spans_chunks_in_one_transaction(db):
+    ids = create_songs(db, 1000)
+    deleted = SongService(db).delete_songs(ids[:950])
+    assert len(deleted) == 950
+    assert db.query(Song).count() == 50
+    assert StatsService(db).get_stats().total_songs == 50
+    assert suggest_index.suggest("band")[0].count == 50
+
+
+def test_batch_endpoints(client):
+    ids = [client.post("/api/songs", json={"title": t, "artist": "X"}).json()["id"] for t in ("A", "B", "C")]
+
+    got = client.post("/api/songs/batch-get", params={"fields": "title"}, json={"ids": [ids[2], 42, ids[0], ids[2]]})
+    assert got.json() == {"songs": [{"id": ids[2], "title": "C"}, {"id": ids[0], "title": "A"}], "not_found": [42]}
+
+    patched = client.patch("/api/songs/batch", json={"ids": [ids[0], 42], "changes": {"year": 1999}})
+    assert patched.json() == {
+        "succeeded": 1, "not_found": 1,
+        "results": [{"id": ids[0], "status": "updated"}, {"id": 42, "status": "not_found"}],
+    }
+    assert client.get(f"/api/songs/{ids[0]}").json()["year"] == 1999
+    assert client.patch("/api/songs/batch", json={"ids": ids, "changes": {"title": None}}).status_code == 422
+
+    deleted = client.post("/api/songs/batch-delete", json={"ids": ids[1:]}).json()
+    assert [result["status"] for result in deleted["results"]] == ["deleted", "deleted"]
+    assert [song["id"] for song in client.get("/api/songs").json()] == [ids[0]]
+
+    assert client.post("/api/songs/batch-delete", json={"ids": []}).status_code == 422
+    assert client.post("/api/songs/batch-delete", json={"ids": list(range(5001))}).status_code == 422
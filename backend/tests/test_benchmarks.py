@@ -0,0 +1,23 @@
+"""
+Smoke tests for the benchmark suite and its regression check
+"""
+import json
+
+from benchmarks.run import compare, main
+
+
+def test_compare_flags_regressions_only():
+    baseline = {"10:a": {"median_s": 1.0}, "10:b": {"median_s": 1.0}}
+    current = {"10:a": {"median_s": 1.1}, "10:b": {"median_s": 1.5}, "10:new": {"median_s": 9.0}}
+    assert compare(baseline, current, threshold=0.25) == ["10:b"]
+
+
+def test_record_then_compare(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    args = ["--sizes", "50", "--workdir", str(tmp_path), "--min-time", "0"]
+    assert main(args + ["--output", str(baseline)]) == 0
+    results = json.loads(baseline.read_text())["results"]
+    assert "50:service.get_songs.deep_cursor" in results
+    assert results["50:route.GET /api/songs"]["repeat"] >= 3
+    # A huge allowance cannot fail on timing noise.
+    assert main(args + ["--compare", str(baseline), "--threshold", "1000"]) == 0
@@ -0,0 +1,80 @@
+"""
+Tests for the streaming bulk import endpoint
+"""
+import json
+
+from app.services import StatsService, SearchService
+
+
+def ndjson(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows)
+
+
+def chunked(body: str, size: int = 7):
+    data = body.encode("utf-8")
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_ndjson_import_reports_bad_rows(client):
+    body = ndjson(
+        {"title": "Imagine", "artist": "John Lennon", "year": 1971},
+        {"title": "No artist"},
+        "{not json",
+        "",
+        {"title": "Wonderwall", "artist": "Oasis", "duration": "258"},
+    )
+    response = client.post("/api/songs/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2
+    assert report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert "artist" in report["errors"][0]["error"]
+
+    titles = [song["title"] for song in client.get("/api/songs").json()]
+    assert titles == ["Imagine", "Wonderwall"]
+
+
+def test_unicode_line_separators_inside_values(client):
+    titles = ["Line\u2028Separator", "Next\x85Line", "Para\u2029graph\x0c"]
+    body = "\r\n".join(json.dumps({"title": title, "artist": "X"}, ensure_ascii=False) for title in titles)
+    response = client.post("/api/songs/bulk", content=b"".join(chunked(body, 5)),
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["inserted"] == 3 and response.json()["failed"] == 0
+    assert [song["title"] for song in client.get("/api/songs").json()] == titles
+
+
+def test_csv_import_streamed_in_small_chunks(client, db):
+    body = (
+        "title,artist,album,genre,year,duration\r\n"
+        'Café,Énergie,"Live, Vol. 1",House,,300\r\n'
+        '"Multi\nline",Band,,Rock,1999,\r\n'
+        "Bad year,Band,,Rock,nineteen,10\r\n"
+    )
+    response = client.post(
+        "/api/songs/bulk",
+        params={"batch_size": 1},
+        content=chunked(body),
+        headers={"Content-Type": "text/csv"},
+    )
+    report = response.json()
+    assert report["inserted"] == 2
+    assert [error["row"] for error in report["errors"]] == [3]
+
+    songs = client.get("/api/songs").json()
+    assert songs[0]["album"] == "Live, Vol. 1"
+    assert songs[0]["year"] is None
+    assert songs[1]["title"] == "Multi\nline"
+
+    # Core inserts still go through the search and stats triggers.
+    assert StatsService(db).get_stats().total_songs == 2
+    assert [r.title for r in SearchService(db).search("cafe")] == ["Café"]
+
+
+def test_error_report_is_bounded(client):
+    body = ndjson(*[{"title": "No artist"} for _ in range(5)])
+    report = client.post("/api/songs/bulk", params={"max_errors": 2}, content=body).json()
+    assert report["failed"] == 5
+    assert len(report["errors"]) == 2
+    assert report["errors_truncated"] is True
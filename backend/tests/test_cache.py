@@ -0,0 +1,76 @@
+"""
+Tests for the version-tagged read cache
+"""
+import time
+
+from sqlalchemy import insert
+
+from app.models.song import Song, SongCreate, SongUpdate
+from app.services import CachedSongService, SongService
+from app.services.cache import LRUCache, VersionedCache, get_library_version
+
+
+def test_lru_eviction_by_entries_and_items():
+    cache = LRUCache(max_entries=2, max_items=5, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    cache.set("big", [1, 2, 3, 4])  # weighs 4 items
+    assert cache.stats()["items"] <= 5
+    cache.set("too-big", list(range(6)))  # never cached
+    assert cache.get("too-big") is None
+    assert cache.evictions >= 2
+
+
+def test_ttl_expiry():
+    cache = LRUCache(ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_triggers_bump_library_version(db):
+    start = get_library_version(db)
+    song = SongService(db).create_song(SongCreate(title="A", artist="B"))
+    SongService(db).update_song(song.id, SongUpdate(title="C"))
+    SongService(db).delete_song(song.id)
+    assert get_library_version(db) == start + 3
+
+
+def test_reads_are_cached_until_a_write(db):
+    cache = VersionedCache(ttl=60)
+    service = CachedSongService(db, cache=cache)
+    song = service.create_song(SongCreate(title="Imagine", artist="John Lennon"))
+
+    assert [s.title for s in service.get_songs()] == ["Imagine"]
+    assert service.get_song(song.id).title == "Imagine"
+    service.get_songs()
+    service.get_song(song.id)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    service.update_song(song.id, SongUpdate(title="Jealous Guy"))
+    assert service.get_song(song.id).title == "Jealous Guy"
+    assert [s.title for s in service.get_songs()] == ["Jealous Guy"]
+    assert cache.stats()["entries"] == 2  # entries from the old version were purged
+
+
+def test_writes_outside_the_service_invalidate(db):
+    cache = VersionedCache(ttl=60)
+    service = CachedSongService(db, cache=cache)
+    service.create_song(SongCreate(title="Imagine", artist="John Lennon"))
+    assert len(service.get_songs_by_artist("Lennon")) == 1
+
+    db.execute(insert(Song), [{"title": "Woman", "artist": "John Lennon"}])
+    db.commit()
+    assert len(service.get_songs_by_artist("Lennon")) == 2
+
+
+def test_cache_stats_endpoint(client):
+    before = client.get("/api/admin/cache").json()
+    client.get("/api/songs")
+    client.get("/api/songs")
+    stats = client.get("/api/admin/cache").json()
+    assert stats["hits"] - before["hits"] == 1
+    assert stats["misses"] - before["misses"] == 1
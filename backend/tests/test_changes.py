@@ -0,0 +1,97 @@
+"""
+Tests for the change log behind /api/changes
+"""
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from app.cli import main as cli_main
+from app.models import Base
+from app.models.song import Song, SongCreate, SongUpdate
+from app.services import ChangeService, SongService
+from app.services.change_service import ResyncRequired
+
+
+def summary(changes):
+    return [(change["id"], change["deleted"]) for change in changes]
+
+
+def test_log_keeps_latest_change_per_song(db):
+    service = SongService(db)
+    a = service.create_song(SongCreate(title="A", artist="X")).id
+    b = service.create_song(SongCreate(title="B", artist="X")).id
+    changes, since, has_more = ChangeService(db).changes()
+    assert summary(changes) == [(a, False), (b, False)] and not has_more
+
+    service.update_song(b, SongUpdate(title="B2"))
+    service.delete_song(a)
+    db.execute(insert(Song), [{"title": "C", "artist": "Y"}])
+    db.commit()
+    changes, next_since, _ = ChangeService(db).changes(since=since)
+    assert summary(changes) == [(b, False), (a, True), (b + 1, False)]
+    assert changes[0]["song"]["title"] == "B2" and changes[1]["song"] is None
+    assert ChangeService(db).changes(since=next_since)[0] == []
+
+
+def test_pages_and_derived_updates(db):
+    service = SongService(db)
+    for i in range(5):
+        service.create_song(SongCreate(title=f"S{i}", artist="X"))
+    changes, since, has_more = ChangeService(db).changes(limit=3)
+    assert len(changes) == 3 and has_more
+    changes, since, has_more = ChangeService(db).changes(since=since, limit=3)
+    assert len(changes) == 2 and not has_more
+    # Rebuilding the entity references is not a change to the songs.
+    from app.services import LibraryService
+    LibraryService(db).rebuild()
+    assert ChangeService(db).changes(since=since)[0] == []
+
+
+def test_compaction_prunes_old_tombstones(db):
+    service = SongService(db)
+    ids = [service.create_song(SongCreate(title=t, artist="X")).id for t in "ABC"]
+    _, synced, _ = ChangeService(db).changes()
+    service.delete_song(ids[0])
+    service.delete_song(ids[1])
+    db.execute(text("UPDATE song_changes SET changed_at = datetime('now', '-40 days') WHERE song_id = :id"), {"id": ids[0]})
+    db.commit()
+
+    assert ChangeService(db).compact(retention_days=30) == 1
+    assert ChangeService(db).compact(retention_days=30) == 0
+    with pytest.raises(ResyncRequired):
+        ChangeService(db).changes(since=synced)
+    changes, _, _ = ChangeService(db).changes()
+    assert summary(changes) == [(ids[2], False), (ids[1], True)]
+
+
+def test_existing_songs_are_seeded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE songs (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, artist VARCHAR NOT NULL, "
+            "album VARCHAR, genre VARCHAR, year INTEGER, duration INTEGER, file_path VARCHAR, "
+            "artwork_url VARCHAR, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO songs (title, artist) VALUES ('A', 'X'), ('B', 'Y')"))
+
+    Base.metadata.create_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT seq, song_id FROM song_changes")).all() == [(1, 1), (2, 2)]
+    engine.dispose()
+
+
+def test_changes_endpoint(client):
+    first = client.post("/api/songs", json={"title": "A", "artist": "X"}).json()
+    response = client.get("/api/changes").json()
+    assert response["changes"][0]["song"] == first
+    since = response["next_since"]
+
+    client.delete(f"/api/songs/{first['id']}")
+    response = client.get("/api/changes", params={"since": since}).json()
+    assert response == {
+        "changes": [{"seq": since + 1, "id": first["id"], "deleted": True, "song": None}],
+        "next_since": since + 1,
+        "has_more": False,
+    }
+
+    assert client.post("/api/admin/changes/compact").json() == {"pruned": 0, "compacted_through": 0}
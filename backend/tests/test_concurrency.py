@@ -0,0 +1,43 @@
+"""
+Tests that blocking database work does not stall the event loop
+"""
+import time
+
+import anyio
+import httpx
+
+from app.main import app
+from app.services import SongService
+
+DELAY = 0.3
+REQUESTS = 5
+
+
+def test_slow_requests_run_concurrently(client, monkeypatch):
+    song_id = client.post("/api/songs", json={"title": "Slow", "artist": "Artist"}).json()["id"]
+    original_get_song = SongService.get_song
+
+    def slow_get_song(self, song_id):
+        time.sleep(DELAY)  # simulate a slow query holding the worker thread
+        return original_get_song(self, song_id)
+
+    monkeypatch.setattr(SongService, "get_song", slow_get_song)
+
+    async def fire():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            async def fetch(path, statuses):
+                statuses.append((await http.get(path)).status_code)
+
+            statuses = []
+            started = time.perf_counter()
+            async with anyio.create_task_group() as tasks:
+                for _ in range(REQUESTS):
+                    tasks.start_soon(fetch, f"/api/songs/{song_id}", statuses)
+                tasks.start_soon(fetch, "/health", statuses)
+            return statuses, time.perf_counter() - started
+
+    statuses, elapsed = anyio.run(fire)
+    assert statuses.count(200) == REQUESTS + 1
+    # Serialized on the event loop this would take REQUESTS * DELAY.
+    assert elapsed < REQUESTS * DELAY / 2
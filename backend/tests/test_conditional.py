@@ -0,0 +1,55 @@
+"""
+Tests for ETag / If-None-Match handling on read endpoints
+"""
+import pytest
+
+from app.routes.conditional import etag_matches
+from app.services import SongService
+
+READ_PATHS = ["/api/songs?limit=10", "/api/songs/{id}", "/api/stats", "/api/search?q=imag"]
+
+
+@pytest.fixture
+def song_id(client):
+    return client.post("/api/songs", json={"title": "Imagine", "artist": "John Lennon"}).json()["id"]
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+@pytest.mark.parametrize("path", READ_PATHS)
+def test_not_modified_until_a_write(client, song_id, path):
+    path = path.format(id=song_id)
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    client.put(f"/api/songs/{song_id}", json={"genre": "Pop"})
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_etag_depends_on_query(client, song_id):
+    assert client.get("/api/songs?limit=1").headers["etag"] != client.get("/api/songs?limit=2").headers["etag"]
+
+
+def test_not_modified_skips_the_query(client, song_id, monkeypatch):
+    etag = client.get(f"/api/songs/{song_id}").headers["etag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("query ran for a 304")
+
+    monkeypatch.setattr(SongService, "get_song", fail)
+    assert client.get(f"/api/songs/{song_id}", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,46 @@
+"""
+Tests for settings and the shared engine's SQLite profile
+"""
+from sqlalchemy import text
+
+from app import database
+from app.config import Settings
+from app.database import create_db_engine
+
+
+def test_profile_pragmas_with_overrides():
+    settings = Settings(db_profile="production", sqlite_mmap_size=0)
+    pragmas = settings.sqlite_pragmas
+    assert pragmas["journal_mode"] == "WAL"
+    assert pragmas["synchronous"] == "NORMAL"
+    assert pragmas["mmap_size"] == 0
+    assert Settings().sqlite_pragmas == {"busy_timeout": 5000}
+
+
+def test_settings_from_environment(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "8")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    settings = Settings()
+    assert settings.db_pool_capacity == 10
+    assert settings.worker_threads == 10
+    monkeypatch.setenv("THREADPOOL_SIZE", "4")
+    assert Settings().worker_threads == 4
+
+
+def test_production_engine_applies_pragmas(tmp_path):
+    settings = Settings(database_url=f"sqlite:///{tmp_path / 'prod.db'}", db_profile="production", db_pool_size=3)
+    engine = create_db_engine(settings)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    assert engine.pool.size() == 3
+    engine.dispose()
+
+
+def test_single_shared_engine():
+    from app import main
+    from app.services import song_service
+
+    assert main.engine is database.engine
+    assert song_service.engine is database.engine
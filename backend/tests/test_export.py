@@ -0,0 +1,56 @@
+"""
+Tests for the streaming catalog export
+"""
+import csv
+import io
+import json
+
+from app.services.export_service import ExportService
+
+SONGS = [
+    {"title": "Imagine", "artist": "John Lennon", "genre": "Pop", "year": 1971},
+    {"title": "Hotel California", "artist": "Eagles", "genre": "Rock", "year": 1976},
+    {"title": "Stairway to Heaven", "artist": "Led Zeppelin", "genre": "Rock", "year": 1971},
+]
+
+
+def load(client):
+    body = "\n".join(json.dumps(song) for song in SONGS)
+    client.post("/api/songs/bulk", content=body)
+
+
+def test_ndjson_export(client):
+    load(client)
+    response = client.get("/api/songs/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == [song["title"] for song in SONGS]
+    assert rows[0]["created_at"]
+
+
+def test_csv_export_with_filters(client):
+    load(client)
+    response = client.get("/api/songs/export", params={"format": "csv", "genre": "Rock", "year": 1971})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["Stairway to Heaven"]
+
+
+def test_json_export(client):
+    load(client)
+    assert [row["artist"] for row in client.get("/api/songs/export?format=json&artist=Eagles").json()] == ["Eagles"]
+    assert client.get("/api/songs/export?format=json&artist=Nobody").json() == []
+
+
+def test_export_filters_ignore_case_and_accents(client):
+    client.post("/api/songs/bulk", content='{"title": "Café", "artist": "Énergie", "genre": "Ambient"}')
+    for params in ({"artist": "energie"}, {"genre": "AMBIENT"}):
+        rows = client.get("/api/songs/export", params={"format": "json", **params}).json()
+        assert [row["title"] for row in rows] == ["Café"]
+        assert [song["title"] for song in client.get("/api/songs", params=params).json()] == ["Café"]
+
+
+def test_export_reads_in_batches(client, db):
+    load(client)
+    batches = list(ExportService(db, batch_size=2).iter_batches())
+    assert [len(batch) for batch in batches] == [2, 1]
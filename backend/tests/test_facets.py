@@ -0,0 +1,90 @@
+"""
+Tests for facet counts on song listings and search
+"""
+import pytest
+from sqlalchemy import event
+
+from app.models.song import SongCreate
+from app.services import CachedSongService, SearchService, SongService
+from app.services.song_service import SongFilter
+
+
+@pytest.fixture
+def songs(db):
+    service = SongService(db)
+    rows = [
+        ("Bohemian Rhapsody", "Queen", "Rock", 1975, 354),
+        ("Under Pressure", "Queen", "Rock", 1981, 248),
+        ("Radio Ga Ga", "Queen", "Pop", 1984, 343),
+        ("Wonderwall", "Oasis", "Britpop", 1995, 258),
+        ("Song 2", "Blur", "Britpop", 1997, 122),
+        ("Intro", "Björk", None, None, 60),
+    ]
+    return [
+        service.create_song(SongCreate(title=t, artist=a, genre=g, year=y, duration=d))
+        for t, a, g, y, d in rows
+    ]
+
+
+def values(facets):
+    return [(facet.value, facet.count) for facet in facets]
+
+
+def test_catalog_facets(db, songs):
+    facets = SongService(db).get_song_facets()
+    assert values(facets.genre) == [("Britpop", 2), ("Rock", 2), ("Pop", 1)]
+    assert values(facets.decade) == [(1970, 1), (1980, 2), (1990, 2)]
+    assert values(facets.artist) == [("Queen", 3), ("Björk", 1), ("Blur", 1), ("Oasis", 1)]
+    assert values(facets.duration) == [("0-120", 1), ("120-240", 1), ("240-360", 4)]
+
+
+def test_facets_follow_filters(db, songs):
+    service = SongService(db)
+    queen = SongFilter(artist="QUEEN")
+    assert [song.title for song in service.get_songs(filter=queen)] == ["Bohemian Rhapsody", "Under Pressure", "Radio Ga Ga"]
+    assert values(service.get_song_facets(queen).genre) == [("Rock", 2), ("Pop", 1)]
+
+    eighties = SongFilter(decade=1980)
+    assert values(service.get_song_facets(eighties, top_artists=1).artist) == [("Queen", 2)]
+    assert values(service.get_song_facets(SongFilter(genre="britpop", decade=1990)).decade) == [(1990, 2)]
+
+
+def test_search_facets_cover_all_matches(db, songs):
+    search = SearchService(db)
+    assert len(search.search("queen", limit=1)) == 1
+    assert values(search.facets("queen").genre) == [("Rock", 2), ("Pop", 1)]
+    assert values(search.facets("queen", where=SongFilter(genre="pop").clauses()).genre) == [("Pop", 1)]
+    assert search.facets("!!!").genre == []
+
+
+def test_facets_are_one_statement(db, engine, songs):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    SongService(db).get_song_facets()
+    assert len(statements) == 1
+    assert "MATERIALIZED" in statements[0] and "UNION ALL" in statements[0]
+
+
+def test_cached_facets_follow_writes(db, songs):
+    service = CachedSongService(db)
+    assert values(service.get_song_facets().decade)[0] == (1970, 1)
+    service.create_song(SongCreate(title="Imagine", artist="John Lennon", year=1971))
+    assert values(service.get_song_facets().decade)[0] == (1970, 2)
+
+
+def test_endpoints_return_facets_on_request(client):
+    for title, artist, genre, year in [("Wonderwall", "Oasis", "Britpop", 1995), ("Creep", "Radiohead", "Rock", 1992)]:
+        client.post("/api/songs", json={"title": title, "artist": artist, "genre": genre, "year": year})
+
+    plain = client.get("/api/songs", params={"genre": "rock"})
+    assert [song["title"] for song in plain.json()] == ["Creep"]
+
+    page = client.get("/api/songs", params={"facets": "true"}).json()
+    assert len(page["items"]) == 2
+    assert page["facets"]["decade"] == [{"value": 1990, "count": 2}]
+
+    found = client.get("/api/search", params={"q": "wonder", "facets": "true"}).json()
+    assert [song["title"] for song in found["items"]] == ["Wonderwall"]
+    assert found["facets"]["artist"] == [{"value": "Oasis", "count": 1}]
+
+    assert client.get("/api/songs", params={"decade": 1995}).status_code == 422
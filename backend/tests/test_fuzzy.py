@@ -0,0 +1,115 @@
+"""
+Tests for typo-tolerant search over the trigram index
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.models import Base
+from app.models.song import SongCreate, SongUpdate
+from app.services import SearchService, SongService
+from app.services.search_service import build_fuzzy_query, trigram_similarity, trigrams
+
+
+@pytest.fixture
+def songs(db):
+    service = SongService(db)
+    rows = [
+        ("Smells Like Teen Spirit", "Nirvana"),
+        ("Come as You Are", "Nirvana"),
+        ("Stairway to Heaven", "Led Zeppelin"),
+        ("Jóga", "Björk"),
+        ("Paranoid Android", "Radiohead"),
+    ]
+    return [service.create_song(SongCreate(title=t, artist=a)) for t, a in rows]
+
+
+def titles(hits):
+    return [song.title for song, _ in hits]
+
+
+def test_trigram_similarity():
+    assert trigram_similarity(trigrams("Nirvana"), trigrams("nirvana")) == 1.0
+    assert trigram_similarity(trigrams("Nirvanna"), trigrams("Nirvana")) > 0.5
+    assert trigram_similarity(trigrams("Nirvana"), trigrams("Radiohead")) == 0.0
+    assert build_fuzzy_query("ab c") is None
+    assert build_fuzzy_query('a"b') == '"a""b"'
+    assert build_fuzzy_query("Zepelin") == '"eli" OR "epe" OR "lin" OR "pel" OR "zep"'
+
+
+def test_misspelled_artists_are_found(db, songs):
+    search = SearchService(db)
+    assert titles(search.fuzzy_hits("Nirvanna")) == ["Smells Like Teen Spirit", "Come as You Are"]
+    assert titles(search.fuzzy_hits("Led Zepelin")) == ["Stairway to Heaven"]
+    assert titles(search.fuzzy_hits("bjork")) == ["Jóga"]
+    assert titles(search.fuzzy_hits("joga")) == ["Jóga"]
+    assert titles(search.fuzzy_hits("stairway heven")) == ["Stairway to Heaven"]
+    assert search.fuzzy_hits("xyzzy") == []
+
+
+def test_index_follows_writes(db, songs):
+    service = SongService(db)
+    search = SearchService(db)
+    service.update_song(songs[4].id, SongUpdate(title="Karma Police"))
+    assert titles(search.fuzzy_hits("karma polise")) == ["Karma Police"]
+    assert search.fuzzy_hits("paranoid andriod") == []
+    service.delete_song(songs[0].id)
+    assert titles(search.fuzzy_hits("Nirvanna")) == ["Come as You Are"]
+
+
+def test_existing_database_is_indexed(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE songs (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, artist VARCHAR NOT NULL, "
+            "album VARCHAR, genre VARCHAR, year INTEGER, duration INTEGER, file_path VARCHAR, "
+            "artwork_url VARCHAR, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO songs (title, artist) VALUES ('Creep', 'Radiohead')"))
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        found = connection.execute(text("SELECT rowid FROM songs_trigram WHERE songs_trigram MATCH 'dio'"))
+        assert found.scalars().all() == [1]
+    engine.dispose()
+
+
+def test_trigram_index_of_raw_titles_is_rebuilt(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        for suffix in ("ai", "ad", "au"):
+            connection.execute(text(f"DROP TRIGGER songs_trigram_{suffix}"))
+        connection.execute(text("DROP TABLE songs_trigram"))
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE songs_trigram USING fts5(title, artist_key, "
+            "content='songs', content_rowid='id', tokenize='trigram')"
+        ))
+        connection.execute(text("INSERT INTO songs (title, artist, title_key) VALUES ('Jóga', 'Björk', 'joga')"))
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        found = connection.execute(text("SELECT rowid FROM songs_trigram WHERE songs_trigram MATCH 'jog'"))
+        assert found.scalars().all() == [1]
+    engine.dispose()
+
+
+def test_fuzzy_offset_past_candidates_is_rejected(client):
+    response = client.get("/api/search", params={"q": "nirvana", "mode": "fuzzy", "offset": 200})
+    assert response.status_code == 400 and "200" in response.json()["detail"]
+    assert client.get("/api/search", params={"q": "nirvana", "offset": 200}).json() == []
+
+
+def test_fuzzy_search_endpoint(client):
+    client.post("/api/songs", json={"title": "Wonderwall", "artist": "Oasis", "genre": "Britpop"})
+    client.post("/api/songs", json={"title": "Creep", "artist": "Radiohead", "genre": "Rock"})
+
+    assert client.get("/api/search", params={"q": "Wonderwal"}).json()[0]["title"] == "Wonderwall"
+    assert client.get("/api/search", params={"q": "Wondervall"}).json() == []
+
+    fuzzy = client.get("/api/search", params={"q": "Wondervall", "mode": "fuzzy"}).json()
+    assert [song["title"] for song in fuzzy] == ["Wonderwall"]
+    assert 0 < fuzzy[0]["score"] < 1
+
+    page = client.get("/api/search", params={"q": "radiohaed", "mode": "fuzzy", "facets": "true"}).json()
+    assert [song["title"] for song in page["items"]] == ["Creep"]
+    assert page["facets"]["genre"] == [{"value": "Rock", "count": 1}]
@@ -0,0 +1,126 @@
+"""
+Tests for RETURNING-based song writes and the group-commit writer
+"""
+import threading
+
+import pytest
+from sqlalchemy import event, select
+
+from app.config import settings
+from app.models import Song, SongCreate, SongUpdate
+from app.services import GroupCommitWriter, SongService, song_writer, suggest_index
+
+
+@pytest.fixture
+def writer():
+    writer = GroupCommitWriter(window=0.05, max_batch=8)
+    yield writer
+    writer.shutdown()
+
+
+@pytest.fixture
+def group_commit(monkeypatch):
+    monkeypatch.setattr(settings, "group_commit", True)
+    yield
+    song_writer.shutdown()
+
+
+def count_commits(engine):
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(1))
+    return commits
+
+
+def in_parallel(count, write):
+    results = [None] * count
+    start = threading.Barrier(count)
+
+    def run(index):
+        start.wait()
+        try:
+            results[index] = write(index)
+        except Exception as exc:
+            results[index] = exc
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_writes_read_back_with_returning(db, engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2].split()[0]))
+    service = SongService(db)
+    song = service.create_song(SongCreate(title="Imagine", artist="John Lennon"))
+    assert statements == ["INSERT"]
+    assert (song.id, song.title, song.artist_key) == (1, "Imagine", "john lennon")
+
+    statements.clear()
+    assert service.update_song(song.id, SongUpdate(year=1971)).year == 1971
+    assert statements == ["UPDATE"]
+    assert song.updated_at is not None
+    # Entity references are set by triggers after RETURNING, so they load on access
+    assert song.artist_id is not None
+
+    assert service.update_song(999, SongUpdate(year=1971)) is None
+    assert service.update_song(999, SongUpdate(title="X")) is None
+    assert service.update_song(song.id, SongUpdate()).title == "Imagine"
+    with pytest.raises(ValueError):
+        service.update_song(song.id, SongUpdate(artist=None))
+
+
+def test_concurrent_writes_share_commits(db, engine, writer):
+    commits = count_commits(engine)
+    songs = in_parallel(16, lambda index: writer.create_song(db, SongCreate(title=f"Song {index}", artist="X")))
+    assert sorted(song.id for song in songs) == list(range(1, 17))
+    assert [song.title for song in songs] == [f"Song {index}" for index in range(16)]
+    assert len(commits) < 16 and writer.batches == len(commits)
+    assert writer.stats()["writes"] == 16
+
+    updated = in_parallel(8, lambda index: writer.update_song(db, songs[index].id, SongUpdate(title=f"New {index}")))
+    assert [song.title for song in updated] == [f"New {index}" for index in range(8)]
+    assert suggest_index.suggest("new", limit=20)
+    assert not suggest_index.suggest("song 0", limit=20)
+
+
+def test_failures_stay_with_their_writes(db, writer, monkeypatch):
+    song = SongService(db).create_song(SongCreate(title="A", artist="X"))
+    insert_songs = SongService.insert_songs
+
+    def failing_insert(self, songs):
+        if any(song.title == "Bad" for song in songs):
+            raise RuntimeError("insert failed")
+        return insert_songs(self, songs)
+
+    monkeypatch.setattr(SongService, "insert_songs", failing_insert)
+    writes = [
+        lambda: writer.create_song(db, SongCreate(title="Good", artist="X")),
+        lambda: writer.create_song(db, SongCreate(title="Bad", artist="X")),
+        lambda: writer.update_song(db, song.id, SongUpdate(title=None)),
+        lambda: writer.update_song(db, 999, SongUpdate(title="Z")),
+        lambda: writer.update_song(db, song.id, SongUpdate(album="B")),
+    ]
+    results = in_parallel(len(writes), lambda index: writes[index]())
+    assert results[0].title == "Good"
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], ValueError)
+    assert results[3] is None
+    assert results[4].album == "B"
+    assert sorted(db.scalars(select(Song.title))) == ["A", "Good"]
+
+
+def test_routes_use_the_writer(client, group_commit):
+    response = client.post("/api/songs", json={"title": "Imagine", "artist": "John Lennon"})
+    assert response.status_code == 201
+    song = response.json()
+    assert song["id"] == 1 and song["updated_at"] is None
+
+    response = client.put("/api/songs/1", json={"year": 1971})
+    assert response.status_code == 200 and response.json()["year"] == 1971
+    assert client.get("/api/songs/1").json()["year"] == 1971
+    assert client.put("/api/songs/2", json={"year": 1971}).status_code == 404
+    assert client.put("/api/songs/1", json={"title": None}).status_code == 422
+    assert song_writer.stats()["writes"] >= 3
@@ -0,0 +1,163 @@
+"""
+Tests for background jobs
+"""
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Job
+from app.models.song import SongCreate
+from app.services import JobService, SongService
+from app.services.job_service import JobCancelled, JobContext, JobRunner, execute_job
+
+
+def wait(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_runs_in_background(client):
+    client.post("/api/songs", json={"title": "A", "artist": "X", "duration": 100})
+    response = client.post("/api/jobs", json={"kind": "rebuild-stats"})
+    assert response.status_code == 202
+    assert response.json()["status"] in ("queued", "running", "succeeded")
+
+    job = wait(client, response.json()["id"])
+    assert job["status"] == "succeeded" and job["progress"] == 1.0
+    assert job["result"]["total_songs"] == 1 and job["started_at"] and job["finished_at"]
+    assert [listed["id"] for listed in client.get("/api/jobs", params={"status": "succeeded"}).json()] == [job["id"]]
+
+
+def test_invalid_jobs_are_rejected(client):
+    assert client.post("/api/jobs", json={"kind": "format-disk"}).status_code == 422
+    response = client.post("/api/jobs", json={"kind": "rebuild-stats", "params": {"fast": True}})
+    assert response.status_code == 422 and "fast" in response.json()["detail"]
+    # Imports only come from staged uploads
+    assert client.post("/api/jobs", json={"kind": "import", "params": {"path": "/etc/passwd"}}).status_code == 422
+    assert client.get("/api/jobs/999").status_code == 404
+
+
+def test_cancelled_job_never_starts(client, db, session_factory):
+    job = JobService(db).create("rebuild-stats")
+    cancelled = client.post(f"/api/jobs/{job.id}/cancel").json()
+    assert cancelled["status"] == "cancelled" and cancelled["cancel_requested"]
+    execute_job(session_factory, job.id)
+    assert client.get(f"/api/jobs/{job.id}").json()["result"] is None
+    assert client.post(f"/api/jobs/{job.id}/cancel").status_code == 409
+
+
+def test_running_job_stops_at_progress_report(db, session_factory):
+    job = JobService(db).create("rebuild-stats")
+    context = JobContext(session_factory, job.id)
+    context.progress(0.25, "Started", force=True)
+    JobService(db).cancel(job.id)
+    with pytest.raises(JobCancelled):
+        context.progress(0.5, force=True)
+    db.refresh(job)
+    assert (job.progress, job.message, job.cancel_requested) == (0.5, "Started", True)
+
+
+@pytest.mark.parametrize("kind, first_message", [
+    ("reindex-search", "Rebuild songs_fts"),
+    ("rebuild-stats", "Rebuilding entities"),
+    ("rebuild-suggest", "Read 0 of 3 songs"),
+    ("compact-changes", "Pruning tombstones"),
+])
+def test_maintenance_jobs_report_progress_and_honour_cancel(db, session_factory, monkeypatch, kind, first_message):
+    for title in "ABC":
+        SongService(db).create_song(SongCreate(title=title, artist="X", duration=100))
+    job = JobService(db).create(kind)
+    reports = []
+    progress = JobContext.progress
+
+    def cancel_after_first_report(self, fraction, message=None, force=False):
+        progress(self, fraction, message, force=True)
+        reports.append(message)
+        if len(reports) == 1:
+            with session_factory() as other:
+                JobService(other).cancel(self.job_id)
+
+    monkeypatch.setattr(JobContext, "progress", cancel_after_first_report)
+    execute_job(session_factory, job.id)
+    db.refresh(job)
+    assert reports[0] == first_message
+    assert (job.status, job.result) == ("cancelled", None)
+
+
+def test_cancelled_stats_rebuild_rolls_back(db, session_factory, monkeypatch):
+    SongService(db).create_song(SongCreate(title="A", artist="X", duration=100))
+    db.execute(text("UPDATE artists SET song_count = 99"))
+    db.commit()
+    job = JobService(db).create("rebuild-stats")
+    checks = []
+
+    def cancel_on_second_statement(self):
+        checks.append(1)
+        if len(checks) == 2:
+            raise JobCancelled()
+
+    monkeypatch.setattr(JobContext, "check_cancelled", cancel_on_second_statement)
+    execute_job(session_factory, job.id)
+    db.refresh(job)
+    assert job.status == "cancelled"
+    assert db.execute(text("SELECT song_count FROM artists")).scalar() == 99
+
+
+def test_failure_is_recorded(db, session_factory):
+    job = JobService(db).create("import", {"path": "/nonexistent/upload.ndjson"})
+    execute_job(session_factory, job.id)
+    db.refresh(job)
+    assert (job.status, job.result) == ("failed", None)
+    assert job.error.startswith("FileNotFoundError")
+
+
+def test_background_import(client, tmp_path, monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "job_upload_dir", str(tmp_path / "uploads"))
+    body = '{"title": "A", "artist": "X"}\n{"title": "No artist"}\n{"title": "B", "artist": "Y"}\n'
+    response = client.post("/api/songs/bulk", params={"background": True}, content=body)
+    assert response.status_code == 202 and response.json()["kind"] == "import"
+
+    job = wait(client, response.json()["id"])
+    assert job["status"] == "succeeded"
+    assert (job["result"]["inserted"], job["result"]["failed"]) == (2, 1)
+    assert os.listdir(tmp_path / "uploads") == []
+    assert [song["title"] for song in client.get("/api/songs").json()] == ["A", "B"]
+
+
+def test_process_job(engine, db):
+    SongService(db).create_song(SongCreate(title="Halo", artist="Beyoncé"))
+    runner = JobRunner(thread_workers=1, process_workers=1)
+    try:
+        # The reindex runs in a spawned worker process
+        job = runner.submit(db, "reindex-search")
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline and runner.active():
+            time.sleep(0.05)
+    finally:
+        runner.shutdown(wait=True)
+    db.refresh(job)
+    assert job.status == "succeeded" and job.result == {"songs": 1}
+
+
+def test_interrupted_jobs_fail_on_startup(db):
+    service = JobService(db)
+    orphaned = service.create("rebuild-stats")
+    alive = service.create("rebuild-stats")
+    orphaned.owner_pid = None
+    alive.owner_pid = os.getppid()
+    db.commit()
+
+    assert service.fail_interrupted() == 1
+    db.refresh(orphaned)
+    db.refresh(alive)
+    assert (orphaned.status, orphaned.error) == ("failed", "Interrupted by a restart")
+    assert alive.status == "queued"
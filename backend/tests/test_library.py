@@ -0,0 +1,114 @@
+"""
+Tests for the artist, album, and genre entities and their listings
+"""
+from sqlalchemy import create_engine, insert, text
+
+from app.models import Base, Artist, Album, Genre
+from app.models.song import Song, SongCreate, SongUpdate
+from app.services import LibraryService, SongService, StatsService
+
+
+def add_songs(db):
+    service = SongService(db)
+    return [
+        service.create_song(SongCreate(title="One", artist="Queen", album="Innuendo", genre="Rock", duration=200)),
+        service.create_song(SongCreate(title="Two", artist="Queen", album="Jazz", genre="Rock", duration=100)),
+        service.create_song(SongCreate(title="Three", artist="Oasis", album="Jazz", genre="Britpop", duration=50)),
+    ]
+
+
+def counts(db, model):
+    return {entity.name: (entity.song_count, entity.total_duration) for entity in db.query(model)}
+
+
+def test_writes_maintain_entities(db):
+    songs = add_songs(db)
+    assert counts(db, Artist) == {"Queen": (2, 300), "Oasis": (1, 50)}
+    assert counts(db, Genre) == {"Rock": (2, 300), "Britpop": (1, 50)}
+    # Albums belong to an artist, so the two "Jazz" albums are distinct.
+    albums = db.query(Album.name, Artist.name, Album.song_count).join(Artist, Artist.id == Album.artist_id)
+    assert sorted(albums) == [("Innuendo", "Queen", 1), ("Jazz", "Oasis", 1), ("Jazz", "Queen", 1)]
+
+    db.refresh(songs[0])
+    queen = db.query(Artist).filter_by(name="Queen").one()
+    assert songs[0].artist_id == queen.id
+    assert db.get(Album, songs[0].album_id).artist_id == queen.id
+
+    service = SongService(db)
+    service.update_song(songs[1].id, SongUpdate(artist="Oasis", duration=60))
+    assert counts(db, Artist) == {"Queen": (1, 200), "Oasis": (2, 110)}
+    service.delete_song(songs[0].id)
+    assert counts(db, Artist) == {"Oasis": (2, 110)}
+    assert counts(db, Genre) == {"Rock": (1, 60), "Britpop": (1, 50)}
+    assert [album.name for album in db.query(Album)] == ["Jazz"]
+
+
+def test_core_inserts_are_linked(db):
+    db.execute(insert(Song), [{"title": f"T{i}", "artist": "Bulk", "genre": "Noise", "duration": 10} for i in range(5)])
+    db.commit()
+    assert counts(db, Artist) == {"Bulk": (5, 50)}
+    assert db.query(Song).filter(Song.artist_id.is_(None)).count() == 0
+
+
+def test_listings_sort_and_paginate(db):
+    add_songs(db)
+    service = LibraryService(db)
+    assert [artist.name for artist in service.get_artists()] == ["Oasis", "Queen"]
+    assert [artist.name for artist in service.get_artists(sort="songs")] == ["Queen", "Oasis"]
+    assert [genre.name for genre in service.get_genres(sort="duration", limit=1)] == ["Rock"]
+    oasis = service.get_artists(limit=1)[0]
+    assert [(album.name, album.artist_id) for album in service.get_albums(artist_id=oasis.id)] == [("Jazz", oasis.id)]
+
+
+def test_rebuild_repairs_entities(db):
+    add_songs(db)
+    expected = counts(db, Artist)
+    db.execute(text("UPDATE artists SET song_count = 0"))
+    db.execute(text("DELETE FROM genres"))
+    db.commit()
+    stats = StatsService(db).rebuild()
+    assert counts(db, Artist) == expected
+    assert (stats.total_artists, stats.total_albums, stats.total_genres) == (2, 3, 2)
+
+
+def test_existing_database_is_migrated(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE songs (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, artist VARCHAR NOT NULL, "
+            "album VARCHAR, genre VARCHAR, year INTEGER, duration INTEGER, file_path VARCHAR, "
+            "artwork_url VARCHAR, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"
+        ))
+        connection.execute(text("CREATE TABLE stat_counts (kind VARCHAR, name VARCHAR, song_count INTEGER)"))
+        connection.execute(text(
+            "INSERT INTO songs (title, artist, album, genre, duration) VALUES "
+            "('A', 'Blur', 'Parklife', 'Britpop', 100), ('B', 'Blur', 'Parklife', 'Britpop', 20)"
+        ))
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        tables = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        assert "stat_counts" not in tables
+        assert connection.execute(text("SELECT name, song_count, total_duration FROM artists")).all() == [("Blur", 2, 120)]
+        assert connection.execute(text("SELECT count(*) FROM songs WHERE album_id IS NULL")).scalar() == 0
+        assert connection.execute(text(
+            "SELECT artist_count, album_count, genre_count, song_count FROM library_stats"
+        )).one() == (1, 1, 1, 2)
+    engine.dispose()
+
+
+def test_listing_endpoints(client):
+    client.post("/api/songs", json={"title": "Wonderwall", "artist": "Oasis", "genre": "Britpop", "duration": 258})
+    client.post("/api/songs", json={"title": "Song 2", "artist": "Blur", "album": "Blur", "genre": "Britpop", "duration": 122})
+
+    response = client.get("/api/artists", params={"sort": "duration"})
+    assert response.status_code == 200
+    assert [(a["name"], a["song_count"], a["total_duration"]) for a in response.json()] == [("Oasis", 1, 258), ("Blur", 1, 122)]
+    assert client.get("/api/genres").json()[0] == {
+        "id": 1, "name": "Britpop", "song_count": 2, "total_duration": 380,
+    }
+    assert [album["name"] for album in client.get("/api/albums").json()] == ["Blur"]
+    assert client.get("/api/artists", params={"sort": "popularity"}).status_code == 422
+
+    etag = response.headers["ETag"]
+    assert client.get("/api/artists", params={"sort": "duration"}, headers={"If-None-Match": etag}).status_code == 304
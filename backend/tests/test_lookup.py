@@ -0,0 +1,98 @@
+"""
+Tests for normalized artist/genre lookups
+"""
+import pytest
+from sqlalchemy import create_engine, insert, text
+
+from app.models import Base
+from app.models.song import Song, SongCreate, SongUpdate, normalize_key
+from app.services import SongService
+from app.services.song_service import key_filter, prefix_end
+
+
+@pytest.fixture
+def songs(db):
+    service = SongService(db)
+    rows = [
+        ("Bachianas", "Heitor Villa-Lobos", "Classical"),
+        ("Vogue", "Madonna", "Pop"),
+        ("Hung Up", "MADONNA", "Dance Pop"),
+        ("Jóga", "Björk", "Électronique"),
+        ("Army of Me", "Bjork", "Electronic"),
+    ]
+    return [service.create_song(SongCreate(title=t, artist=a, genre=g)) for t, a, g in rows]
+
+
+def test_normalize_key():
+    assert normalize_key("  Björk ") == "bjork"
+    assert normalize_key("Straße") == "strasse"
+    assert normalize_key("Led   Zeppelin") == "led zeppelin"
+    assert normalize_key(None) is None
+
+
+def test_exact_prefix_and_contains(db, songs):
+    service = SongService(db)
+    assert [s.title for s in service.get_songs_by_artist("madonna", match="exact")] == ["Vogue", "Hung Up"]
+    assert [s.title for s in service.get_songs_by_artist("BJÖRK", match="exact")] == ["Jóga", "Army of Me"]
+    assert [s.title for s in service.get_songs_by_genre("elec", match="prefix")] == ["Jóga", "Army of Me"]
+    assert [s.title for s in service.get_songs_by_genre("pop")] == ["Vogue", "Hung Up"]
+    assert service.get_songs_by_artist("100%", match="contains") == []
+
+
+def test_prefix_end():
+    assert prefix_end("mad") == "mae"
+    assert prefix_end("a\ud7ff") == "a\ue000"
+    assert prefix_end("a\U0010ffff\U0010ffff") == "b"
+    assert prefix_end("\U0010ffff") is None
+
+
+@pytest.mark.parametrize("artist", ["x\U0010ffff", "x\ud7ff"])
+def test_prefix_of_highest_code_points(db, artist):
+    SongService(db).create_song(SongCreate(title="T", artist=artist + "yz"))
+    for prefix in (artist, artist[-1]):
+        assert db.query(Song).filter(key_filter(Song.artist_key, prefix, "prefix")).count() == (prefix == artist)
+
+
+def test_exact_and_prefix_use_the_index(db, songs):
+    for match, value in [("exact", "madonna"), ("prefix", "mad")]:
+        query = db.query(Song).filter(key_filter(Song.artist_key, value, match))
+        sql = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+        assert "ix_songs_artist_key" in plan
+
+
+def test_keys_follow_updates(db, songs):
+    service = SongService(db)
+    service.update_song(songs[1].id, SongUpdate(artist="Cher"))
+    assert [s.title for s in service.get_songs_by_artist("cher", match="exact")] == ["Vogue"]
+    assert db.get(Song, songs[1].id).artist_key == "cher"
+
+
+def test_pagination(db, songs):
+    service = SongService(db)
+    assert [s.title for s in service.get_songs_by_artist("o", skip=1, limit=2)] == ["Vogue", "Hung Up"]
+
+
+def test_lookup_routes(client):
+    client.post("/api/songs/bulk", content='{"title": "Jóga", "artist": "Björk", "genre": "Electronic"}')
+    assert client.get("/api/artists/bjork/songs", params={"match": "exact"}).json()[0]["title"] == "Jóga"
+    assert client.get("/api/genres/ELECTRO/songs", params={"match": "prefix", "limit": 1}).json()[0]["title"] == "Jóga"
+    assert client.get("/api/artists/bjork/songs", params={"match": "fuzzy"}).status_code == 422
+
+
+def test_existing_database_is_upgraded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE songs (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, artist VARCHAR NOT NULL, "
+            "album VARCHAR, genre VARCHAR, year INTEGER, duration INTEGER, file_path VARCHAR, "
+            "artwork_url VARCHAR, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO songs (title, artist, genre) VALUES ('Jóga', 'Björk', 'Pop')"))
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT artist_key, genre_key, title_key FROM songs")).one() == ("bjork", "pop", "joga")
+        indexes = {row[1] for row in connection.execute(text("PRAGMA index_list(songs)"))}
+        assert {"ix_songs_artist_key", "ix_songs_genre_key"} <= indexes
+    engine.dispose()
@@ -0,0 +1,45 @@
+"""
+Tests for the Prometheus metrics endpoint and its collectors
+"""
+import pytest
+
+from app import metrics
+from app.metrics import Histogram, instrument_engine
+
+
+@pytest.fixture
+def instrumented(engine):
+    instrument_engine(engine)
+    return engine
+
+
+def test_histogram_rendering():
+    histogram = Histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.1, "/a")
+    histogram.observe(3.0, "/a")
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{route="/a"} 3' in lines
+
+
+def test_request_metrics_by_route_template(client, instrumented):
+    song_id = client.post("/api/songs", json={"title": "Imagine", "artist": "John Lennon"}).json()["id"]
+    template = "/api/songs/{song_id}"
+    requests_before = metrics.http_requests_total.value("GET", template, "200")
+    queries_before = metrics.db_queries_per_request.sum(template)
+
+    client.get(f"/api/songs/{song_id}")
+    client.get("/api/songs/999999")
+
+    assert metrics.http_requests_total.value("GET", template, "200") == requests_before + 1
+    assert metrics.http_requests_total.value("GET", template, "404") >= 1
+    assert metrics.db_queries_per_request.sum(template) > queries_before
+
+    body = client.get("/metrics").text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert 'http_requests_total{method="GET",route="/api/songs/{song_id}",status="200"}' in body
+    assert "db_pool_checkout_wait_seconds_count" in body
+    assert "http_requests_in_flight 1" in body  # the scrape itself
@@ -0,0 +1,54 @@
+"""
+Tests for keyset (cursor) pagination on GET /api/songs
+"""
+import pytest
+
+from app.services.pagination import encode_cursor, decode_cursor
+
+
+def create_songs(client, count):
+    return [
+        client.post("/api/songs", json={"title": f"Song {i}", "artist": "Artist"}).json()["id"]
+        for i in range(count)
+    ]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    for bad in ["", "not-a-cursor", encode_cursor(1)[:-2] + "!!"]:
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_walk_catalog_with_link_header(client):
+    ids = create_songs(client, 7)
+
+    seen = []
+    response = client.get("/api/songs", params={"limit": 3})
+    while True:
+        assert response.status_code == 200
+        seen.extend(song["id"] for song in response.json())
+        if "next" not in response.links:
+            break
+        response = client.get(response.links["next"]["url"])
+    assert seen == ids
+
+
+def test_cursor_is_stable_under_concurrent_inserts(client):
+    ids = create_songs(client, 4)
+    first = client.get("/api/songs", params={"limit": 2})
+    client.post("/api/songs", json={"title": "Late arrival", "artist": "Artist"})
+
+    second = client.get(first.links["next"]["url"])
+    assert [song["id"] for song in second.json()] == ids[2:]
+
+
+def test_skip_limit_still_supported(client):
+    ids = create_songs(client, 5)
+    response = client.get("/api/songs", params={"skip": 1, "limit": 2})
+    assert [song["id"] for song in response.json()] == ids[1:3]
+
+
+def test_invalid_cursor(client):
+    response = client.get("/api/songs", params={"cursor": "garbage"})
+    assert response.status_code == 400
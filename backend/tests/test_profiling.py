@@ -0,0 +1,74 @@
+"""
+Tests for on-demand request profiling and slow-query plan capture
+"""
+import cProfile
+
+import pytest
+
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from app import profiling
+from app.profiling import ProfilingMiddleware, instrument_engine
+
+
+@pytest.fixture(autouse=True)
+def clear_buffers():
+    profiling.recent_profiles.clear()
+    profiling.slow_queries.clear()
+
+
+def test_unprofiled_requests_are_not_recorded(client, engine):
+    instrument_engine(engine, slow_query_ms=10_000)
+    response = client.get("/api/songs")
+    assert "x-profile-id" not in response.headers
+    assert client.get("/api/admin/profiles").json() == []
+
+
+def test_profile_requested_by_header(client, engine):
+    instrument_engine(engine, slow_query_ms=10_000)
+    client.post("/api/songs", json={"title": "Imagine", "artist": "John Lennon"})
+    response = client.get("/api/search", params={"q": "imag"}, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = int(response.headers["x-profile-id"])
+
+    summary = client.get("/api/admin/profiles").json()[0]
+    assert summary["id"] == profile_id
+    assert summary["route"] == "/api/search"
+    assert summary["sql_statements"] >= 1
+
+    detail = client.get(f"/api/admin/profiles/{profile_id}").json()
+    assert any("songs_fts" in statement["statement"] for statement in detail["statements"])
+    assert "search_songs" in detail["profile"]  # the handler ran under cProfile
+
+
+@pytest.mark.parametrize("slow_request_ms, kept", [(10_000, False), (0, True)])
+def test_sampled_profile_is_named_only_when_kept(slow_request_ms, kept):
+    app = ProfilingMiddleware(PlainTextResponse("ok"), sample_rate=1.0, slow_request_ms=slow_request_ms)
+    response = TestClient(app).get("/")
+    profiles = profiling.recent_profiles.items()
+    assert ("x-profile-id" in response.headers) is kept
+    assert [profile.id for profile in profiles] == ([int(response.headers["x-profile-id"])] if kept else [])
+
+
+def test_async_handlers_and_nested_profilers_are_not_profiled(client):
+    response = client.get("/api/admin/cache", headers={"X-Profile": "1"})
+    detail = client.get(f"/api/admin/profiles/{response.headers['x-profile-id']}").json()
+    assert detail["route"] == "/api/admin/cache" and detail["profile"] is None
+
+    profile = profiling.RequestProfile("GET", "/", requested=True)
+    outer = cProfile.Profile()
+    assert outer.runcall(profiling._run_profiled, profile, sum, [1, 2]) == 3
+    assert profile.profile is None
+
+
+def test_slow_queries_get_a_query_plan(client, engine):
+    instrument_engine(engine, slow_query_ms=0)
+    client.get("/api/genres/Rock/songs")
+    captured = client.get("/api/admin/slow-queries").json()
+    by_genre = next(query for query in captured if "songs.genre" in query["statement"])
+    assert by_genre["plan"] and "SCAN" in " ".join(by_genre["plan"]).upper()
+
+
+def test_missing_profile(client):
+    assert client.get("/api/admin/profiles/123456").status_code == 404
@@ -0,0 +1,174 @@
+"""
+Tests for the audio library scanner, against generated tag fixtures
+"""
+import os
+import struct
+
+import pytest
+
+from app.models import ScannedFile
+from app.services import SongService, suggest_index
+from app.services.scan_service import ScanService
+from app.services.tags import UNKNOWN_ARTIST, read_tags
+
+
+def synchsafe(size):
+    return bytes((size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def mp3(title=None, artist=None, album=None, genre=None, year=None, frames=100, version=3, xing=True, artwork=0):
+    """ID3v2 tag, then 128 kbit/s 44.1 kHz MPEG-1 Layer III frames, the first carrying a Xing header"""
+    body = b""
+    for frame_id, value in (("TIT2", title), ("TPE1", artist), ("TALB", album), ("TCON", genre), ("TYER", year)):
+        if value is not None:
+            data = b"\x03" + str(value).encode("utf-8")
+            size = synchsafe(len(data)) if version == 4 else struct.pack(">I", len(data))
+            body += frame_id.encode() + size + b"\x00\x00" + data
+    if artwork:
+        data = b"\x00image/jpeg\x00\x03\x00" + b"\xff" * artwork
+        body += b"APIC" + (synchsafe(len(data)) if version == 4 else struct.pack(">I", len(data))) + b"\x00\x00" + data
+    tag = b"ID3" + bytes((version, 0, 0)) + synchsafe(len(body)) + body
+
+    frame_size = 417  # 144 * 128000 / 44100
+    header = b"\xff\xfb\x90\x00"  # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo
+    first = header + b"\x00" * 32 + (b"Xing" + struct.pack(">II", 1, frames) if xing else b"")
+    audio = first.ljust(frame_size, b"\x00") + (header + b"\x00" * (frame_size - 4)) * (frames - 1)
+    return tag + audio
+
+
+def flac(samples=44100 * 61, **comments):
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\x00" * 6
+    streaminfo += ((44100 << 44) | (1 << 41) | (15 << 36) | samples).to_bytes(8, "big") + b"\x00" * 16
+    entries = [f"{key.upper()}={value}".encode("utf-8") for key, value in comments.items()]
+    vorbis = struct.pack("<I", 4) + b"test" + struct.pack("<I", len(entries))
+    vorbis += b"".join(struct.pack("<I", len(entry)) + entry for entry in entries)
+    picture = b"\x00" * 1000
+    blocks = [(0, streaminfo), (6, picture), (4, vorbis)]
+    data = b"fLaC"
+    for position, (block_type, block) in enumerate(blocks):
+        last = 0x80 if position == len(blocks) - 1 else 0
+        data += bytes([last | block_type]) + len(block).to_bytes(3, "big") + block
+    return data + b"\xff\xf8" + b"\x00" * 100
+
+
+def wav(seconds=3, **info):
+    byte_rate = 8000 * 2
+    fmt = struct.pack("<HHIIHH", 1, 1, 8000, byte_rate, 2, 16)
+    ids = {"title": b"INAM", "artist": b"IART", "album": b"IPRD", "genre": b"IGNR", "year": b"ICRD"}
+    entries = b""
+    for key, value in info.items():
+        value = str(value).encode("utf-8") + b"\x00"
+        entries += ids[key] + struct.pack("<I", len(value)) + value + (b"\x00" if len(value) % 2 else b"")
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if entries:
+        chunks += b"LIST" + struct.pack("<I", len(entries) + 4) + b"INFO" + entries
+    chunks += b"data" + struct.pack("<I", byte_rate * seconds) + b"\x00" * (byte_rate * seconds)
+    return b"RIFF" + struct.pack("<I", len(chunks) + 4) + b"WAVE" + chunks
+
+
+def write(path, data, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_read_mp3(tmp_path, version):
+    path = write(tmp_path / "a.mp3", mp3("Héroes", "David Bowie", "Heroes", "(17)", "1977", version=version, artwork=5000))
+    assert read_tags(path) == {
+        "title": "Héroes", "artist": "David Bowie", "album": "Heroes", "genre": "Rock", "year": 1977, "duration": 3,
+    }
+
+
+def test_read_mp3_without_tags_or_vbr_header(tmp_path):
+    # 1000 CBR frames of 417 bytes at 128 kbit/s are 26 seconds
+    path = write(tmp_path / "Untitled Track.mp3", mp3(frames=1000, xing=False))
+    assert read_tags(path) == {
+        "title": "Untitled Track", "artist": UNKNOWN_ARTIST, "album": None, "genre": None, "year": None, "duration": 26,
+    }
+
+
+def test_read_flac_and_wav(tmp_path):
+    path = write(tmp_path / "a.flac", flac(title="Clair de lune", artist="Debussy", genre="Classical", date="1905-01-01"))
+    assert read_tags(path) == {
+        "title": "Clair de lune", "artist": "Debussy", "album": None, "genre": "Classical", "year": 1905, "duration": 61,
+    }
+    path = write(tmp_path / "b.wav", wav(title="Tone", artist="Lab", year=2020))
+    assert read_tags(path)["title"] == "Tone" and read_tags(path)["duration"] == 3
+
+
+def test_incremental_rescan(tmp_path, db):
+    root = tmp_path / "music"
+    first = write(root / "Bowie" / "heroes.mp3", mp3("Heroes", "David Bowie", year=1977), mtime=1_000_000)
+    second = write(root / "Debussy" / "clair.flac", flac(title="Clair de lune", artist="Debussy"), mtime=1_000_000)
+    write(root / "cover.jpg", b"not audio")
+    broken = write(root / "broken.flac", b"fLaC\x00", mtime=1_000_000)
+
+    report = ScanService(db).scan([str(root)], workers=0)
+    assert (report.files, report.added, report.failed) == (3, 2, 1)
+    assert report.errors[0].path == broken
+    songs = {song.file_path: song for song in SongService(db).get_songs()}
+    assert songs[first].title == "Heroes" and songs[second].duration == 61
+    assert [suggestion.text for suggestion in suggest_index.suggest("debu")] == ["Debussy"]
+
+    report = ScanService(db).scan([str(root)], workers=0)
+    assert (report.unchanged, report.added, report.updated, report.removed) == (3, 0, 0, 0)
+
+    # A changed tag is written; a touched file with the same tags is not
+    write(root / "Bowie" / "heroes.mp3", mp3("“Heroes”", "David Bowie", year=1977), mtime=2_000_000)
+    os.utime(second, (2_000_000, 2_000_000))
+    report = ScanService(db).scan([str(root)], workers=0)
+    assert (report.unchanged, report.updated) == (1, 1)
+    assert db.get(ScannedFile, second).mtime_ns == 2_000_000 * 10**9
+    db.expire_all()
+    assert {song.title for song in SongService(db).get_songs()} == {"“Heroes”", "Clair de lune"}
+
+    os.remove(second)
+    report = ScanService(db).scan([str(root)], workers=0)
+    assert report.removed == 1
+    assert [song.file_path for song in SongService(db).get_songs()] == [first]
+    assert suggest_index.suggest("debu") == []
+
+
+def test_missing_root_removes_nothing(tmp_path, db):
+    root = tmp_path / "music"
+    write(root / "a.wav", wav(title="A", artist="X"))
+    ScanService(db).scan([str(root)], workers=0)
+    os.rename(root, tmp_path / "unmounted")
+
+    report = ScanService(db).scan([str(root)], workers=0)
+    assert report.removed == 0 and "nothing removed" in report.errors[0].error
+    assert len(SongService(db).get_songs()) == 1
+
+
+def test_existing_song_is_matched_by_file_path(tmp_path, db):
+    from app.models.song import SongCreate
+    path = write(tmp_path / "a.wav", wav(title="Tagged", artist="X"))
+    song = SongService(db).create_song(SongCreate(title="Typed in", artist="X", file_path=path))
+
+    report = ScanService(db).scan([str(tmp_path)], workers=0)
+    assert (report.added, report.updated) == (0, 1)
+    db.expire_all()
+    assert SongService(db).get_song(song.id).title == "Tagged"
+
+
+def test_tags_read_in_process_pool(tmp_path, db, monkeypatch):
+    monkeypatch.setattr("app.services.scan_service.INLINE_FILES", 2)
+    for number in range(4):
+        write(tmp_path / f"{number}.mp3", mp3(f"Track {number}", "Band"))
+    report = ScanService(db).scan([str(tmp_path)], workers=2)
+    assert report.added == 4
+    assert sorted(song.title for song in SongService(db).get_songs()) == [f"Track {number}" for number in range(4)]
+
+
+def test_scan_job(client, tmp_path, monkeypatch):
+    from app.config import settings
+    from tests.test_jobs import wait
+    write(tmp_path / "a.wav", wav(title="A", artist="X"))
+    monkeypatch.setattr(settings, "scan_roots", [str(tmp_path)])
+    monkeypatch.setattr(settings, "scan_workers", 1)
+
+    job = wait(client, client.post("/api/jobs", json={"kind": "scan-library"}).json()["id"])
+    assert job["status"] == "succeeded" and job["result"]["added"] == 1
@@ -0,0 +1,89 @@
+"""
+Tests for the FTS5 full-text search engine
+"""
+from sqlalchemy import text
+
+from app.models.song import SongCreate, SongUpdate
+from app.services import SongService, SearchService
+from app.services.search_service import build_match_query
+
+
+def add_songs(db):
+    service = SongService(db)
+    return [
+        service.create_song(SongCreate(title="Bohemian Rhapsody", artist="Queen", album="A Night at the Opera", genre="Rock")),
+        service.create_song(SongCreate(title="Rock and Roll", artist="Led Zeppelin", album="Led Zeppelin IV", genre="Rock")),
+        service.create_song(SongCreate(title="Under Pressure", artist="Queen & David Bowie", genre="Rock")),
+        service.create_song(SongCreate(title="Café del Mar", artist="Energy 52", genre="Trance")),
+    ]
+
+
+def test_build_match_query():
+    assert build_match_query("queen") == '"queen"*'
+    assert build_match_query('"night at the" opera') == '"night at the" "opera"*'
+    assert build_match_query("  - ; ") is None
+    assert build_match_query('ro"ck') == '"rock"*'
+
+
+def test_prefix_query(db):
+    add_songs(db)
+    titles = [song.title for song, _, _ in SearchService(db).hits("boh")]
+    assert titles == ["Bohemian Rhapsody"]
+
+
+def test_phrase_query(db):
+    add_songs(db)
+    assert [r.title for r in SearchService(db).search('"night at the opera"')] == ["Bohemian Rhapsody"]
+    assert SearchService(db).search('"opera night"') == []
+
+
+def test_title_match_ranks_above_genre_match(db):
+    add_songs(db)
+    results = SearchService(db).search("rock")
+    assert results[0].title == "Rock and Roll"
+    assert len(results) == 3
+    assert results[0].score >= results[1].score
+    assert "<mark>Rock</mark>" in results[0].snippet
+
+
+def test_accent_insensitive(db):
+    add_songs(db)
+    assert [r.title for r in SearchService(db).search("cafe")] == ["Café del Mar"]
+
+
+def test_limit_and_offset(db):
+    add_songs(db)
+    service = SearchService(db)
+    everything = [r.id for r in service.search("rock")]
+    assert [r.id for r in service.search("rock", limit=2)] == everything[:2]
+    assert [r.id for r in service.search("rock", limit=2, offset=2)] == everything[2:]
+
+
+def test_index_follows_updates_and_deletes(db):
+    songs = add_songs(db)
+    service = SongService(db)
+    service.update_song(songs[0].id, SongUpdate(title="Killer Queen"))
+    assert SearchService(db).search("bohemian") == []
+    assert [r.id for r in SearchService(db).search("killer")] == [songs[0].id]
+
+    service.delete_song(songs[0].id)
+    assert SearchService(db).search("killer") == []
+
+
+def test_reindex_restores_index(db):
+    add_songs(db)
+    db.execute(text("INSERT INTO songs_fts(songs_fts) VALUES ('delete-all')"))
+    db.commit()
+    assert SearchService(db).search("queen") == []
+
+    assert SearchService(db).reindex() == 4
+    assert len(SearchService(db).search("queen")) == 2
+
+
+def test_search_endpoint(client):
+    client.post("/api/songs", json={"title": "Wonderwall", "artist": "Oasis", "genre": "Britpop"})
+    response = client.get("/api/search", params={"q": "wonder", "limit": 5})
+    assert response.status_code == 200
+    data = response.json()
+    assert data[0]["title"] == "Wonderwall"
+    assert "score" in data[0] and "snippet" in data[0]
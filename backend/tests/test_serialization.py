@@ -0,0 +1,47 @@
+"""
+Tests for the row-based JSON path and field projection
+"""
+from datetime import datetime
+from sqlalchemy import event
+
+from app import responses
+from app.models.song import SongCreate, SongResponse
+from app.services import SongService
+
+
+def test_rows_match_the_model_serialization(db, client):
+    song = SongService(db).create_song(SongCreate(title="Imagine", artist="John Lennon", year=1971))
+    expected = SongResponse.model_validate(song).model_dump(mode="json")
+    assert client.get("/api/songs").json() == [expected]
+    assert client.get("/api/artists/john lennon/songs").json() == [expected]
+
+
+def test_fields_are_pushed_down(db, engine, client):
+    SongService(db).create_song(SongCreate(title="Imagine", artist="John Lennon", file_path="/music/imagine.mp3"))
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    response = client.get("/api/songs", params={"fields": "title, artist,title"})
+    assert response.json() == [{"id": 1, "title": "Imagine", "artist": "John Lennon"}]
+    select = next(statement for statement in statements if "FROM songs" in statement)
+    assert "file_path" not in select and "artwork_url" not in select
+
+    response = client.get("/api/genres/rock/songs", params={"fields": "id,path"})
+    assert response.status_code == 400
+    assert "path" in response.json()["detail"]
+
+
+def test_projection_keeps_link_header(client):
+    for title in ("A", "B", "C"):
+        client.post("/api/songs", json={"title": title, "artist": "X"})
+    first = client.get("/api/songs", params={"limit": 2, "fields": "title"})
+    assert first.headers["ETag"]
+    second = client.get(first.links["next"]["url"])
+    assert second.json() == [{"id": 3, "title": "C"}]
+
+
+def test_stdlib_fallback_encodes_the_same(monkeypatch):
+    content = [{"id": 1, "title": "Jóga", "created_at": datetime(2024, 5, 1, 12, 30)}]
+    fast = responses.dumps(content)
+    monkeypatch.setattr(responses, "orjson", None)
+    assert responses.dumps(content) == fast == '[{"id":1,"title":"Jóga","created_at":"2024-05-01T12:30:00"}]'.encode()
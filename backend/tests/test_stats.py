@@ -0,0 +1,68 @@
+"""
+Tests for the incrementally maintained library statistics
+"""
+from sqlalchemy import text
+
+from app.models.song import SongCreate, SongUpdate
+from app.services import SongService, StatsService
+
+
+def add_songs(db):
+    service = SongService(db)
+    return [
+        service.create_song(SongCreate(title="One", artist="Queen", album="Innuendo", genre="Rock", year=1991, duration=200)),
+        service.create_song(SongCreate(title="Two", artist="Queen", album="Jazz", genre="Rock", year=1978, duration=100)),
+        service.create_song(SongCreate(title="Three", artist="Oasis", genre="Britpop")),
+    ]
+
+
+def test_empty_library(db):
+    stats = StatsService(db).get_stats()
+    assert stats.total_songs == 0
+    assert stats.average_song_duration == 0
+    assert stats.top_artist is None
+
+
+def test_counters_follow_creates(db):
+    add_songs(db)
+    stats = StatsService(db).get_stats()
+    assert (stats.total_songs, stats.total_artists, stats.total_albums, stats.total_genres) == (3, 2, 2, 2)
+    assert stats.total_duration == 300
+    assert stats.average_song_duration == 100
+    assert stats.average_year == 1984
+    assert stats.top_artist.model_dump() == {"name": "Queen", "count": 2}
+    assert stats.top_genre.name == "Rock"
+    assert [song.title for song in stats.recent_additions] == ["Three", "Two", "One"]
+
+
+def test_counters_follow_updates_and_deletes(db):
+    songs = add_songs(db)
+    service = SongService(db)
+    service.update_song(songs[1].id, SongUpdate(artist="Oasis", duration=50))
+    stats = StatsService(db).get_stats()
+    assert stats.top_artist.model_dump() == {"name": "Oasis", "count": 2}
+    assert stats.total_duration == 250
+
+    service.delete_song(songs[0].id)
+    stats = StatsService(db).get_stats()
+    assert (stats.total_songs, stats.total_artists, stats.total_albums) == (2, 1, 1)
+    assert stats.total_duration == 50
+
+
+def test_rebuild_matches_incremental(db):
+    add_songs(db)
+    expected = StatsService(db).get_stats()
+    db.execute(text("UPDATE library_stats SET song_count = 99, artist_count = 0"))
+    db.execute(text("DELETE FROM artists"))
+    db.commit()
+    assert StatsService(db).rebuild() == expected
+
+
+def test_stats_endpoint(client):
+    client.post("/api/songs", json={"title": "Wonderwall", "artist": "Oasis", "duration": 258})
+    response = client.get("/api/stats")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_songs"] == 1
+    assert data["total_duration"] == 258
+    assert data["top_artist"] == {"name": "Oasis", "count": 1}
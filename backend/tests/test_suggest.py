@@ -0,0 +1,95 @@
+"""
+Tests for the in-memory typeahead index
+"""
+from app.models.song import SongCreate, SongUpdate
+from app.services import PrefixIndex, SongService, suggest_index
+
+
+def texts(suggestions):
+    return [(suggestion.type, suggestion.text, suggestion.count) for suggestion in suggestions]
+
+
+def test_prefix_ranking():
+    index = PrefixIndex()
+    index.load([
+        ("Bohemian Rhapsody", "Queen", "A Night at the Opera"),
+        ("Another One Bites the Dust", "Queen", "The Game"),
+        ("Queen of the Night", "Whitney Houston", None),
+        ("Jóga", "Björk", "Homogenic"),
+    ])
+    assert texts(index.suggest("que")) == [("artist", "Queen", 2), ("title", "Queen of the Night", 1)]
+    # Whole-term matches come before matches on a later word.
+    assert texts(index.suggest("the")) == [
+        ("album", "The Game", 1),
+        ("album", "A Night at the Opera", 1),
+        ("title", "Another One Bites the Dust", 1),
+        ("title", "Queen of the Night", 1),
+    ]
+    assert texts(index.suggest("the", limit=1)) == [("album", "The Game", 1)]
+    assert texts(index.suggest("BJO")) == [("artist", "Björk", 1)]
+    assert texts(index.suggest("qu", type="title")) == [("title", "Queen of the Night", 1)]
+    assert index.suggest("  ") == []
+
+
+def test_incremental_updates_match_a_rebuild():
+    index = PrefixIndex()
+    index.add("Imagine", "John Lennon", "Imagine")
+    index.add("Jealous Guy", "John Lennon", "Imagine")
+    assert texts(index.suggest("ima")) == [("album", "Imagine", 2), ("title", "Imagine", 1)]
+    index.remove("Imagine", "John Lennon", "Imagine")
+    assert texts(index.suggest("ima")) == [("album", "Imagine", 1)]
+    assert texts(index.suggest("jo")) == [("artist", "John Lennon", 1)]
+
+    rebuilt = PrefixIndex()
+    rebuilt.load([("Jealous Guy", "John Lennon", "Imagine")])
+    sizes = lambda stats: (stats["terms"], stats["entries"], stats["approximate_bytes"])
+    assert sizes(index.stats()) == sizes(rebuilt.stats())
+    index.remove("Jealous Guy", "John Lennon", "Imagine")
+    assert index.stats()["entries"] == 0
+
+
+def test_writes_forget_only_affected_short_prefixes():
+    index = PrefixIndex()
+    index.load([("Imagine", "John Lennon", None), ("Jealous Guy", "John Lennon", None)])
+    assert texts(index.suggest("j")) == [("artist", "John Lennon", 2), ("title", "Jealous Guy", 1)]
+    assert texts(index.suggest("im")) == [("title", "Imagine", 1)]
+    assert texts(index.suggest("l")) == [("artist", "John Lennon", 2)]
+
+    index.add("Julia", "The Beatles", None)
+    assert sorted(index._memo) == ["im", "l"]  # only "j" is under a new term
+    assert texts(index.suggest("j")) == [("artist", "John Lennon", 2), ("title", "Jealous Guy", 1), ("title", "Julia", 1)]
+    index.remove("Imagine", "John Lennon", None)
+    assert "im" not in index._memo and index.suggest("im") == []
+    assert texts(index.suggest("l")) == [("artist", "John Lennon", 1)]
+
+
+def test_song_service_writes_update_the_index(db):
+    service = SongService(db)
+    song = service.create_song(SongCreate(title="Wonderwall", artist="Oasis"))
+    assert texts(suggest_index.suggest("won")) == [("title", "Wonderwall", 1)]
+    service.update_song(song.id, SongUpdate(title="Champagne Supernova"))
+    assert suggest_index.suggest("won") == []
+    assert texts(suggest_index.suggest("super")) == [("title", "Champagne Supernova", 1)]
+    service.delete_song(song.id)
+    assert suggest_index.suggest("oas") == []
+
+    service.create_song(SongCreate(title="Song 2", artist="Blur"))
+    suggest_index.clear()
+    suggest_index.rebuild(db)
+    assert texts(suggest_index.suggest("blu")) == [("artist", "Blur", 1)]
+
+
+def test_suggest_endpoint(client):
+    client.post("/api/songs", json={"title": "Wonderwall", "artist": "Oasis"})
+    client.post("/api/songs/bulk", content=b'{"title": "Wonder", "artist": "Ariana Grande"}\n')
+    response = client.get("/api/suggest", params={"q": "Wond", "limit": 5})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"text": "Wonder", "type": "title", "count": 1},
+        {"text": "Wonderwall", "type": "title", "count": 1},
+    ]
+    assert response.headers["Server-Timing"].startswith("suggest;dur=")
+
+    stats = client.get("/api/admin/suggest").json()
+    assert stats["terms"] == 4
+    assert stats["approximate_bytes"] > 0
@@ -1,4 +1,5 @@
 import React, { useState } from 'react';
+import { musicAPI } from '../services/api';
 
 const SongList = ({ songs, onDelete, onUpdate }) => {
   const [editingSong, setEditingSong] = useState(null);
@@ -136,7 +137,8 @@ const SongList = ({ songs, onDelete, onUpdate }) => {
                 <div className="flex items-start space-x-4">
                   {song.artwork_url ? (
                     <img
-                      src={song.artwork_url}
+                      src={musicAPI.artworkUrl(song.id, 'small')}
+                      loading="lazy"
                       alt={`${song.title} artwork`}
                       className="w-16 h-16 rounded-lg object-cover flex-shrink-0"
                       onError={(e) => {
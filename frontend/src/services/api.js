@@ -9,6 +9,17 @@ const api = axios.create({
   },
 });
 
+// A busy server sheds requests with 503 and Retry-After; reads are retried once
+api.interceptors.response.use(undefined, async (error) => {
+  const { config, response } = error;
+  if (response?.status !== 503 || config.method !== 'get' || config._retried) {
+    throw error;
+  }
+  const seconds = Number(response.headers['retry-after']) || 1;
+  await new Promise((resolve) => setTimeout(resolve, seconds * 1000));
+  return api({ ...config, _retried: true });
+});
+
 export const musicAPI = {
   // Get all songs
   getSongs: (skip = 0, limit = 100) => 
@@ -30,10 +41,42 @@ export const musicAPI = {
   deleteSong: (id) => 
     api.delete(`/songs/${id}`),
   
+  // Batch operations on a selection of songs
+  getSongsByIds: (ids) =>
+    api.post('/songs/batch-get', { ids }),
+  
+  updateSongs: (ids, changes) =>
+    api.patch('/songs/batch', { ids, changes }),
+  
+  deleteSongs: (ids) =>
+    api.post('/songs/batch-delete', { ids }),
+  
+  // Songs changed since a sync position (next_since of the previous call)
+  getChanges: (since = 0, limit = 1000) =>
+    api.get(`/changes?since=${since}&limit=${limit}`),
+  
+  // Background maintenance jobs; poll getJob until status is no longer queued or running
+  createJob: (kind, params = {}) =>
+    api.post('/jobs', { kind, params }),
+  
+  getJob: (id) =>
+    api.get(`/jobs/${id}`),
+  
+  cancelJob: (id) =>
+    api.post(`/jobs/${id}/cancel`),
+  
+  // Locally stored artwork; size is small, medium, large, or original
+  artworkUrl: (id, size = 'medium') =>
+    `${API_BASE_URL}/songs/${id}/artwork?size=${size}`,
+  
   // Search songs
   searchSongs: (query) => 
     api.get(`/search?q=${encodeURIComponent(query)}`),
   
+  // Typeahead suggestions for titles, artists, and albums
+  suggest: (query, limit = 10) =>
+    api.get(`/suggest?q=${encodeURIComponent(query)}&limit=${limit}`),
+  
   // Get songs by artist
   getSongsByArtist: (artist) => 
     api.get(`/artists/${encodeURIComponent(artist)}/songs`),